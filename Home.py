@@ -1,12 +1,11 @@
 import streamlit as st
-from PIL import Image
+from utils.inicializacao import carregar_logo
 
 # 1. Configurando página
 st.set_page_config(page_title='Home', layout="wide")
 
 # 2. Adicionando logomarca
-imagem = Image.open('logo.png')
-st.sidebar.image(imagem, width=250)
+st.sidebar.image(carregar_logo(), width=250)        # decodificada e redimensionada uma vez por processo
 
 # 3. Adicionando autor
 st.sidebar.markdown('#### Created by Thiago Fantin')
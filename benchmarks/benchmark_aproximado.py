@@ -0,0 +1,129 @@
+#======================================================================================================================
+# BENCHMARK - MODO APROXIMADO
+#======================================================================================================================
+#
+# Compara as consultas exatas do backend configurado (CURRY_BACKEND) com as do modo aproximado (esboços por dia,
+# utils/esbocos.py) nas contagens de entregadores distintos (total e por semana) e nos percentis do tempo de entrega e
+# da avaliação por cidade e tráfego, com os filtros completos e com um recorte menor.
+#
+# Cada consulta é criada de novo a cada chamada, como numa execução da página; os dados, o cubo e os esboços já estão
+# nos caches compartilhados. O tempo é o melhor de --repeticoes execuções. O erro é relativo (%) nas contagens e
+# absoluto (min ou ponto de avaliação) nos percentis, o maior entre os grupos de cada consulta.
+#
+# Uso (a partir da raiz do projeto):
+#     python -m benchmarks.benchmark_aproximado --linhas 100000 1000000
+#     python -m benchmarks.benchmark_aproximado --linhas 10000000 --semente 42     # pedidos sintéticos
+#     CURRY_BACKEND=sqlite python -m benchmarks.benchmark_aproximado               # consultas exatas no banco
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import argparse
+import os
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.benchmark_limpeza import ampliar_csv
+from benchmarks.gerador_pedidos import gerar_csv
+from utils.config import BACKEND
+from utils.consultas import CONSULTAS, ConsultaAproximada
+from utils.dados import CAMINHO_DADOS
+from utils.inicializacao import contexto_streamlit
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+TODOS_TRAFEGOS = ['Low', 'Medium', 'High', 'Jam']
+
+# Filtros comparados: data limite e tipos de tráfego ('completo' é o padrão da barra lateral das páginas; 'vazio' é a
+# primeira data do slider, exclusiva, sem nenhum pedido)
+FILTROS = {
+    'completo': (pd.Timestamp(2022, 4, 6), TODOS_TRAFEGOS),
+    'recorte': (pd.Timestamp(2022, 3, 15), ['Low', 'Jam']),
+    'vazio': (pd.Timestamp(2022, 2, 11), TODOS_TRAFEGOS),
+}
+
+CONSULTAS_COMPARADAS = {
+    'entregadores_total': lambda consulta: consulta.entregadores_distintos(),
+    'entregadores_semana': lambda consulta: consulta.entregadores_distintos(por_semana=True),
+    'percentis_tempo': lambda consulta: consulta.percentis(['City', 'Road_traffic_density'], 'tempo'),
+    'percentis_avaliacao': lambda consulta: consulta.percentis(['City', 'Road_traffic_density'], 'avaliacao'),
+}
+
+#======================================================================================================================
+# Funções do Benchmark
+#======================================================================================================================
+
+# 1. Melhor tempo de 'repeticoes' execuções e o resultado da última
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return resultado, min(tempos)
+
+# 2. Maior erro do resultado aproximado: relativo nas contagens e absoluto nos percentis (mesmas dimensões, na mesma
+#    ordem, nos dois resultados). Os dois resultados de uma seleção vazia devem ser vazios (ou zero), com erro zero.
+def erro(exato, aproximado):
+    if isinstance(exato, pd.DataFrame):
+        colunas = exato.columns[exato.columns.str.match(r'p\d+$')]
+        diferencas = np.abs(aproximado[colunas].to_numpy() - exato[colunas].to_numpy())
+    else:
+        exato, aproximado = np.asarray(exato, dtype='float64'), np.asarray(aproximado, dtype='float64')
+        diferencas = np.abs(aproximado - exato) / np.maximum(exato, 1) * 100
+    return float(np.max(diferencas, initial=0.0))
+
+# 3. Tempo e erro de cada consulta exata e aproximada com cada filtro, sobre o CSV em 'caminho'
+def comparar(caminho, repeticoes):
+    exata = CONSULTAS[BACKEND]
+    linhas = []
+    for filtro, (data_limite, trafego) in FILTROS.items():
+        for nome, consultar in CONSULTAS_COMPARADAS.items():
+            criar_exata = lambda: exata(data_limite, trafego, caminho)
+            consultar(criar_exata())                                     # carga dos caches compartilhados
+            consultar(ConsultaAproximada(criar_exata(), caminho))
+            resultado_exato, tempo_exato = medir(lambda: consultar(criar_exata()), repeticoes)
+            resultado_aproximado, tempo_aproximado = medir(
+                lambda: consultar(ConsultaAproximada(criar_exata(), caminho)), repeticoes)
+            linhas.append({'filtro': filtro, 'consulta': nome, 'exato_s': tempo_exato,
+                           'aproximado_s': tempo_aproximado, 'ganho': tempo_exato / tempo_aproximado,
+                           'erro': erro(resultado_exato, resultado_aproximado)})
+    return pd.DataFrame(linhas).set_index(['filtro', 'consulta'])
+
+#======================================================================================================================
+# Execução
+#======================================================================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do modo aproximado contra as consultas exatas.')
+    parser.add_argument('--origem', default=CAMINHO_DADOS, help='CSV no formato do train.csv')
+    parser.add_argument('--linhas', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--semente', type=int, default=None,
+                        help='gera pedidos sintéticos com esta semente em vez de ampliar a origem')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    from streamlit.logger import set_log_level
+    set_log_level('error')
+    warnings.simplefilter('ignore', FutureWarning)
+    contexto_streamlit('benchmark')                                     # sem ele os caches do Streamlit não guardam
+
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in args.linhas:
+            caminho = os.path.join(pasta, f'pedidos_{linhas}.csv')
+            if args.semente is None:
+                ampliar_csv(args.origem, linhas, caminho)
+            else:
+                gerar_csv(caminho, linhas, args.semente)
+            print(f'\n{linhas:,} linhas (backend {BACKEND})')
+            print(comparar(caminho, args.repeticoes).round(4).to_string())
+
+if __name__ == '__main__':
+    main()
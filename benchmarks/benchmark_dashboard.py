@@ -0,0 +1,342 @@
+#======================================================================================================================
+# BENCHMARK - DASHBOARD COMPLETO (SEM SERVIDOR STREAMLIT)
+#======================================================================================================================
+#
+# Mede, para datasets de 10 mil a 10 milhões de linhas, o tempo e o pico de memória de cada etapa do dashboard:
+# leitura, limpeza, preparação, snapshot, banco SQLite, acréscimo de um lote de pedidos, estruturas compartilhadas
+# (índice, cubo, camada geográfica), filtros da barra lateral, cada análise das três páginas e a materialização dos
+# indicadores.
+#
+# As páginas são executadas sem servidor, dentro de uma pasta temporária com o dataset ampliado em dataset/train.csv,
+# com um contexto de execução do Streamlit que descarta as mensagens (sem ele os caches do Streamlit nunca acertam).
+# Depois da primeira execução, cada análise é chamada de novo com o cache de resultados vazio, com os mesmos argumentos
+# usados pela página (filtros padrão: última data e todos os tipos de tráfego), e a página inteira é executada de novo
+# (com CURRY_PAINEIS_PARALELOS, as análises são calculadas em paralelo antes do desenho). Por último, os indicadores
+# dos filtros padrão são materializados e cada página é executada de novo com o cache de resultados vazio, servida pelo
+# arquivo.
+#
+# O tempo é o melhor de --repeticoes execuções; o pico de memória é medido numa execução separada com tracemalloc
+# (alocações do pandas/numpy; a memória do Arrow no snapshot não entra na conta).
+#
+# O baseline (benchmarks/baseline_dashboard.json) depende da máquina e não é versionado: ele é gravado uma vez, antes
+# de qualquer mudança, com --gravar-baseline. Sem baseline para algum dos tamanhos pedidos, o benchmark termina com
+# erro sem medir.
+#
+# Uso (a partir da raiz do projeto):
+#     python -m benchmarks.benchmark_dashboard --linhas 10000 100000 1000000 --gravar-baseline   # uma vez, antes
+#     python -m benchmarks.benchmark_dashboard --linhas 10000 100000 1000000     # falha se houver regressão
+#     python -m benchmarks.benchmark_dashboard --linhas 10000000 --semente 42      # pedidos sintéticos
+#     CURRY_BACKEND=sqlite python -m benchmarks.benchmark_dashboard                # páginas consultando o banco
+#     CURRY_PAINEIS_PARALELOS=4 python -m benchmarks.benchmark_dashboard           # painéis calculados em paralelo
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import argparse
+import itertools
+import json
+import os
+import runpy
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from benchmarks.benchmark_limpeza import ampliar_csv
+from benchmarks.gerador_pedidos import gerar_csv, gerar_lote
+from utils.banco import BancoPedidos, caminho_banco, construir_banco
+from utils.config import MODO_APROXIMADO
+from utils.cubo import construir_cubo, fatiar_cubo
+from utils.dados import CAMINHO_DADOS, enriquecer_dados, ler_csv, limpar_dados
+from utils.esquema import tipar_dados
+from utils.filtros import IndiceFiltros
+from utils.mapa import CamadaGeo
+from utils.ranking import RankingEntregadores
+from utils.inicializacao import contexto_streamlit
+from utils.ingestao import ingerir
+from utils.lotes import acrescentar_lote, caminho_lotes
+from utils.materializacao import TODOS_TRAFEGOS, caminho_materializacao, datas_limite, materializar
+from utils.snapshot import (AGREGADOS, caminho_agregado, caminho_snapshot, carregar_metadados, gravar_snapshot,
+                            ler_snapshot)
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+CAMINHO_BASELINE = os.path.join(RAIZ, 'benchmarks', 'baseline_dashboard.json')
+
+# Pedidos de cada lote acrescentado ao dataset, num dia novo e com entregadores novos (o tempo do acréscimo não deve
+# crescer com o tamanho do dataset)
+LINHAS_LOTE = 1000
+
+PAGINAS = {
+    'empresa': os.path.join(RAIZ, 'pages', '1_visao_empresa.py'),
+    'entregadores': os.path.join(RAIZ, 'pages', '2_visao_entregadores.py'),
+    'restaurantes': os.path.join(RAIZ, 'pages', '3_visao_restaurantes.py'),
+}
+
+# Análises de cada página, chamadas com as variáveis globais da página já executada (ns)
+ANALISES = {
+    'empresa': {
+        'pedidos_por_dia': lambda ns: ns['pedidos_por_dia'](ns['consulta']),
+        'pedidos_por_trafego': lambda ns: ns['pedidos_por_trafego'](ns['consulta']),
+        'volume_de_pedidos': lambda ns: ns['volume_de_pedidos'](ns['consulta']),
+        'pedidos_semana': lambda ns: ns['pedidos_semana'](ns['consulta']),
+        'entregas_por_entregador': lambda ns: ns['entregas_por_entregador'](ns['consulta']),
+        'mapa_cidades': lambda ns: ns['mapa_cidades'](ns['datas'], ns['trafego'], 'centroides'),
+    },
+    'entregadores': {
+        'idade': lambda ns: ns['idade'](ns['consulta']),
+        'condicao_veiculo': lambda ns: ns['condicao_veiculo'](ns['consulta']),
+        'avaliacao_media_entregador': lambda ns: ns['avaliacao_media_entregador'](ns['consulta'], ns['col1']),
+        'avaliacao_media_e_std_trafego': lambda ns: ns['avaliacao_media_e_std'](ns['consulta'], 'tráfego'),
+        'avaliacao_media_e_std_clima': lambda ns: ns['avaliacao_media_e_std'](ns['consulta'], 'clima'),
+        'percentis_avaliacao': lambda ns: ns['percentis_avaliacao'](ns['consulta']),
+        'top_entregadores': lambda ns: [ns['top_entregadores'](a, tipo) for a, tipo in zip(
+            ns['consulta'].ranking().calcular(), ['rapidos', 'lentos'])],
+    },
+    'restaurantes': {
+        'entregadores_unicos': lambda ns: ns['entregadores_unicos'](ns['consulta']),
+        'distancia_media': lambda ns: ns['distancia_media'](ns['consulta']),
+        'tempo_medio_festival': lambda ns: [ns['tempo_medio_festival'](ns['consulta'], f) for f in (True, False)],
+        'tempo_medio_por_cidade': lambda ns: ns['tempo_medio_por_cidade'](ns['consulta']),
+        'tempo_media_por_pedido_cidade': lambda ns: ns['tempo_media_por_pedido_cidade'](ns['consulta']),
+        'tempo_medio_cidade_perc': lambda ns: ns['tempo_medio_cidade_perc'](ns['consulta']),
+        'std_cidade_trafego': lambda ns: ns['std_cidade_trafego'](ns['consulta']),
+        'percentis_tempo_cidade_trafego': lambda ns: ns['percentis_tempo_cidade_trafego'](ns['consulta']),
+    },
+}
+
+# Os painéis de percentis só são mostrados no modo aproximado
+if not MODO_APROXIMADO:
+    del ANALISES['entregadores']['percentis_avaliacao'], ANALISES['restaurantes']['percentis_tempo_cidade_trafego']
+
+#======================================================================================================================
+# Medição
+#======================================================================================================================
+
+# 1. Melhor tempo de 'repeticoes' execuções e pico de memória (MB) de uma execução com tracemalloc.
+#    'preparar' roda antes de cada execução, fora da medição (por exemplo, para esvaziar os caches).
+def medir(funcao, repeticoes, preparar=None):
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+        del resultado
+
+    if preparar:
+        preparar()
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'tempo_s': min(tempos), 'memoria_mb': pico / 2**20}
+
+# 2. Esvazia os caches das análises, para que cada chamada calcule o resultado, e recomeça a execução do script (as
+#    análises com widgets, como a tabela paginada, registram as mesmas chaves a cada chamada)
+def esvaziar_caches():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    from utils.mapa import _mapa_html
+    from utils.resultados import cache_resultados
+    cache_resultados().limpar()
+    _mapa_html.clear()
+    contexto = get_script_run_ctx()
+    if contexto is not None:
+        contexto.reset()
+
+# 3. Etapas de carga: cada uma recebe a saída da anterior
+def medir_carga(caminho, repeticoes):
+    etapas = {}
+    bruto = ler_csv(caminho)
+    etapas['leitura'] = medir(lambda: ler_csv(caminho), repeticoes)
+    df, _ = limpar_dados(bruto)
+    etapas['limpeza'] = medir(lambda: limpar_dados(bruto), repeticoes)
+    del bruto
+
+    df = df.sort_values('Order_Date', kind='stable')
+    etapas['enriquecimento'] = medir(lambda: enriquecer_dados(df), repeticoes)
+    df = enriquecer_dados(df)
+    etapas['tipagem'] = medir(lambda: tipar_dados(df), repeticoes)
+    df = tipar_dados(df)
+
+    etapas['ingestao_em_blocos'] = medir(lambda: ingerir(caminho, max(len(df) // 10, 1)), repeticoes)
+    etapas['snapshot_gravacao'] = medir(lambda: gravar_snapshot(df, caminho), repeticoes)
+    etapas['snapshot_leitura'] = medir(lambda: ler_snapshot(caminho), repeticoes)
+    meta = carregar_metadados(caminho)
+    etapas['banco_construcao'] = medir(lambda: construir_banco(caminho, meta), repeticoes)
+
+    etapas['indice'] = medir(lambda: IndiceFiltros(df), repeticoes)
+    etapas['cubo'] = medir(lambda: construir_cubo(df), repeticoes)
+    etapas['camada_geo'] = medir(lambda: CamadaGeo(df), repeticoes)
+    etapas['ranking'] = medir(lambda: RankingEntregadores(df), repeticoes)
+
+    indice, cubo = IndiceFiltros(df), construir_cubo(df)
+    data_limite, trafego = df['Order_Date'].max(), ['Low', 'Medium', 'High']
+    etapas['filtro'] = medir(lambda: indice.filtrar(data_limite, trafego), repeticoes)
+    etapas['filtro_cubo'] = medir(lambda: fatiar_cubo(cubo, data_limite, trafego), repeticoes)
+    banco = BancoPedidos(caminho_banco(caminho))
+    etapas['agrupamento_banco'] = medir(lambda: banco.agregar(data_limite, trafego, ['City'], 'tempo'), repeticoes)
+
+    # Cada acréscimo medido recebe um lote novo, no dia seguinte ao último dos dados
+    lote, numeros = os.path.join(os.path.dirname(caminho), 'lote.csv'), itertools.count(1)
+    def gerar_proximo_lote():
+        numero = next(numeros)
+        gerar_lote(lote, LINHAS_LOTE, numero, data_limite + pd.Timedelta(days=numero))
+    etapas['lote_acrescimo'] = medir(lambda: acrescentar_lote(lote, caminho), repeticoes, gerar_proximo_lote)
+    return etapas
+
+# 4. Primeira execução de cada página (carga fria dos caches), cada análise e a página inteira com o cache de
+#    resultados vazio
+def medir_paginas(repeticoes):
+    etapas = {}
+    contexto = contexto_streamlit('benchmark')
+    for pagina, caminho in PAGINAS.items():
+        contexto.reset()
+        inicio = time.perf_counter()
+        ns = runpy.run_path(caminho, run_name='__main__')
+        etapas[f'{pagina}.primeira_execucao'] = {'tempo_s': time.perf_counter() - inicio, 'memoria_mb': None}
+        for analise, chamar in ANALISES[pagina].items():
+            etapas[f'{pagina}.{analise}'] = medir(lambda: chamar(ns), repeticoes, preparar=esvaziar_caches)
+        etapas[f'{pagina}.execucao'] = medir(lambda: runpy.run_path(caminho, run_name='__main__'), repeticoes,
+                                             preparar=esvaziar_caches)
+    return etapas
+
+# 5. Materialização dos indicadores com os filtros padrão (uma combinação de filtros, as três páginas e os modos do
+#    mapa) e execução de cada página com o cache de resultados vazio, servida pelo arquivo materializado
+def medir_materializacao(repeticoes):
+    etapas = {}
+    destino = caminho_materializacao(CAMINHO_DADOS)
+    filtros = (datas_limite()[-1:], [TODOS_TRAFEGOS])
+
+    def remover():
+        if os.path.exists(destino):
+            os.remove(destino)
+
+    etapas['materializacao_combinacao'] = medir(lambda: materializar(CAMINHO_DADOS, *filtros), repeticoes,
+                                                preparar=remover)
+    for pagina, caminho in PAGINAS.items():
+        etapas[f'{pagina}.materializada'] = medir(lambda: runpy.run_path(caminho, run_name='__main__'), repeticoes,
+                                                  preparar=esvaziar_caches)
+    return etapas
+
+# 6. Todas as etapas para um dataset de 'linhas' linhas (ampliado a partir da origem, ou sintético se a semente for
+#    informada), numa pasta temporária com o layout do projeto
+def executar(origem, linhas, repeticoes, semente=None):
+    origem = os.path.abspath(origem)
+    pasta_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.makedirs(os.path.join(pasta, 'dataset'))
+        shutil.copy(os.path.join(RAIZ, 'logo.png'), pasta)
+        caminho = os.path.join(pasta, CAMINHO_DADOS)
+        if semente is None:
+            ampliar_csv(origem, linhas, caminho)
+        else:
+            gerar_csv(caminho, linhas, semente)
+        os.chdir(pasta)
+        try:
+            etapas = medir_carga(caminho, repeticoes)
+            # As páginas partem do CSV, sem o snapshot e o banco gravados acima
+            for arquivo in (caminho_snapshot(caminho), caminho_snapshot(caminho) + '.json', caminho_banco(caminho),
+                            *(caminho_agregado(caminho, nome) for nome in AGREGADOS)):
+                if os.path.exists(arquivo):
+                    os.remove(arquivo)
+            shutil.rmtree(caminho_lotes(caminho), ignore_errors=True)
+            etapas.update(medir_paginas(repeticoes))
+            etapas.update(medir_materializacao(repeticoes))
+        finally:
+            os.chdir(pasta_original)
+    return etapas
+
+#======================================================================================================================
+# Baseline
+#======================================================================================================================
+
+# 1. Etapas mais lentas ou com mais memória que o baseline além da tolerância (ignorando diferenças menores que 'folga')
+def regressoes(atual, baseline, tolerancia, folga_s=0.02, folga_mb=1.0):
+    encontradas = []
+    for linhas, etapas in atual.items():
+        for etapa, medida in etapas.items():
+            base = baseline.get(linhas, {}).get(etapa)
+            if base is None:
+                continue
+            for chave, folga in (('tempo_s', folga_s), ('memoria_mb', folga_mb)):
+                if medida[chave] is None or base.get(chave) is None:
+                    continue
+                if medida[chave] > base[chave] * (1 + tolerancia) and medida[chave] - base[chave] > folga:
+                    encontradas.append((linhas, etapa, chave, base[chave], medida[chave]))
+    return encontradas
+
+#======================================================================================================================
+# Execução
+#======================================================================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de todas as etapas e análises do dashboard.')
+    parser.add_argument('--origem', default=CAMINHO_DADOS, help='CSV no formato do train.csv')
+    parser.add_argument('--linhas', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--semente', type=int, default=None,
+                        help='gera pedidos sintéticos com esta semente em vez de ampliar a origem')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--baseline', default=CAMINHO_BASELINE, help='arquivo JSON com os resultados de referência')
+    parser.add_argument('--gravar-baseline', action='store_true', help='grava os resultados como o novo baseline')
+    parser.add_argument('--tolerancia', type=float, default=0.3, help='piora relativa aceita em relação ao baseline')
+    args = parser.parse_args()
+
+    # Sem baseline para os tamanhos medidos não há com o que comparar: falha antes de medir, em vez de apenas mostrar
+    # os números (o baseline é gravado uma vez por máquina, com --gravar-baseline)
+    if not args.gravar_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as arquivo:
+                baseline = json.load(arquivo)
+        faltando = [linhas for linhas in args.linhas if str(linhas) not in baseline]
+        if faltando:
+            print(f'Sem baseline para {", ".join(f"{linhas:,}" for linhas in faltando)} linhas em {args.baseline}; '
+                  f'grave-o antes com --gravar-baseline.')
+            sys.exit(2)
+
+    from streamlit.logger import set_log_level
+    set_log_level('error')
+    warnings.simplefilter('ignore', FutureWarning)
+
+    resultados = {}
+    for linhas in args.linhas:
+        resultados[str(linhas)] = executar(args.origem, linhas, args.repeticoes, args.semente)
+        tabela = pd.DataFrame(resultados[str(linhas)]).T
+        print(f'\n{linhas:,} linhas')
+        print(tabela.round(4).to_string())
+
+    if args.gravar_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as arquivo:
+                baseline = json.load(arquivo)
+        baseline.update(resultados)
+        with open(args.baseline, 'w') as arquivo:
+            json.dump(baseline, arquivo, indent=2)
+        print(f'\nBaseline gravado em {args.baseline}')
+        return
+
+    encontradas = regressoes(resultados, baseline, args.tolerancia)
+    for linhas, etapa, chave, base, atual in encontradas:
+        print(f'REGRESSÃO {linhas} linhas, {etapa}, {chave}: {base:.4f} -> {atual:.4f}')
+    if encontradas:
+        sys.exit(1)
+    print('\nSem regressões em relação ao baseline.')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#======================================================================================================================
+# BENCHMARK - LIMPEZA DO DATAFRAME
+#======================================================================================================================
+#
+# Compara a leitura + limpeza original (read_csv padrão + clean_code com applymap) com a versão vetorizada
+# (ler_csv + limpar_dados) em datasets de 1 milhão de linhas ou mais, conferindo que o resultado é idêntico.
+#
+# Uso (a partir da raiz do projeto):
+#     python -m benchmarks.benchmark_limpeza --linhas 1000000 2000000
+#     python -m benchmarks.benchmark_limpeza --linhas 10000000 --semente 42     # pedidos sintéticos
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.gerador_pedidos import gerar_csv
+from utils.dados import CAMINHO_DADOS, ler_csv, limpar_dados
+
+#======================================================================================================================
+# Implementação Original (referência)
+#======================================================================================================================
+
+def clean_code_original(df):
+
+    df = df.astype(str)
+    df = df.applymap(lambda x: x.strip() if isinstance(x, str) else x)
+
+    df['Weatherconditions'] = df['Weatherconditions'].str.replace('conditions ', '')
+    df['Time_taken(min)'] = df['Time_taken(min)'].apply(lambda x: x.replace('(min) ', '') if isinstance(x, str) and '(min) ' in x else x)
+
+    df = df.loc[(df['Delivery_person_Age'] != 'NaN'), :]
+    df = df.loc[(df['multiple_deliveries'] != 'NaN'), :]
+    df = df.loc[(df['Road_traffic_density'] != 'NaN'), :]
+    df = df.loc[(df['City'] != 'NaN'), :]
+    df = df.loc[(df['Festival'] != 'NaN'), :]
+
+    df['Delivery_person_Age'] = df['Delivery_person_Age'].astype( int )
+    df['Vehicle_condition'] = df['Vehicle_condition'].astype( int )
+    df['multiple_deliveries'] = df['multiple_deliveries'].astype( int )
+    df['Time_taken(min)'] = df['Time_taken(min)'].astype( int )
+
+    df['Delivery_person_Ratings'] = df['Delivery_person_Ratings'].astype( float )
+    df['Restaurant_latitude'] = df['Restaurant_latitude'].astype( float )
+    df['Restaurant_longitude'] = df['Restaurant_longitude'].astype( float )
+    df['Delivery_location_latitude'] = df['Delivery_location_latitude'].astype( float )
+    df['Delivery_location_longitude'] = df['Delivery_location_longitude'].astype( float )
+
+    df['Order_Date'] = pd.to_datetime( df['Order_Date'], format='%d-%m-%Y' )
+
+    return (df)
+
+#======================================================================================================================
+# Funções do Benchmark
+#======================================================================================================================
+
+# 1. Gera um CSV com 'linhas' linhas repetindo as linhas do arquivo de origem
+def ampliar_csv(origem, linhas, destino):
+    bruto = pd.read_csv(origem, dtype=str, keep_default_na=False)
+    posicoes = np.resize(np.arange(len(bruto)), linhas)
+    bruto.iloc[posicoes].to_csv(destino, index=False)
+
+# 2. Tempo de execução de uma função
+def cronometrar(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return resultado, time.perf_counter() - inicio
+
+# 3. Executa os dois caminhos, separando leitura e limpeza, e confere que os Dataframes são iguais
+def comparar(caminho):
+    bruto, leitura_original = cronometrar(lambda: pd.read_csv(caminho))
+    original, limpeza_original = cronometrar(lambda: clean_code_original(bruto))
+    del bruto
+
+    bruto, leitura_vetorizada = cronometrar(lambda: ler_csv(caminho))
+    (vetorizado, rejeitadas), limpeza_vetorizada = cronometrar(lambda: limpar_dados(bruto))
+    del bruto
+
+    pd.testing.assert_frame_equal(original, vetorizado)
+    tempos = pd.DataFrame({'leitura': [leitura_original, leitura_vetorizada],
+                           'limpeza': [limpeza_original, limpeza_vetorizada]}, index=['original', 'vetorizado'])
+    tempos['total'] = tempos.sum(axis=1)
+    return tempos, rejeitadas
+
+#======================================================================================================================
+# Execução
+#======================================================================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da limpeza do dataset de pedidos.')
+    parser.add_argument('--origem', default=CAMINHO_DADOS, help='CSV no formato do train.csv')
+    parser.add_argument('--linhas', type=int, nargs='+', default=[1_000_000, 2_000_000])
+    parser.add_argument('--semente', type=int, default=None,
+                        help='gera pedidos sintéticos com esta semente em vez de ampliar a origem')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in args.linhas:
+            caminho = os.path.join(pasta, f'pedidos_{linhas}.csv')
+            if args.semente is None:
+                ampliar_csv(args.origem, linhas, caminho)
+            else:
+                gerar_csv(caminho, linhas, args.semente)
+            tempos, rejeitadas = comparar(caminho)
+            ganho = tempos.loc['original'] / tempos.loc['vetorizado']
+            print(f'\n{linhas:,} linhas ({rejeitadas["Total"]:,} rejeitadas)')
+            print(pd.concat([tempos, ganho.to_frame('ganho').T]).round(2).to_string())
+            print('Rejeitadas por coluna:')
+            print(rejeitadas.drop('Total').to_string())
+
+if __name__ == '__main__':
+    main()
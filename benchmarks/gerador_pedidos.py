@@ -0,0 +1,232 @@
+#======================================================================================================================
+# GERADOR DE PEDIDOS SINTÉTICOS NO FORMATO DO TRAIN.CSV
+#======================================================================================================================
+#
+# Gera pedidos com as mesmas colunas e as mesmas imperfeições do dataset original (textos com espaço no final,
+# sentinela 'NaN ', prefixos 'conditions ' e '(min) ', datas dd-mm-aaaa), para que a saída passe sem alterações pela
+# leitura e pela limpeza do dashboard.
+#
+# As cidades, restaurantes e entregadores formam um universo fixo (22 cidades x 20 restaurantes x 3 entregadores,
+# como no dataset original), sorteado a partir da semente. Os pedidos são gerados em blocos de LINHAS_POR_BLOCO
+# linhas, cada bloco com seu próprio gerador aleatório derivado da semente e do número do bloco: a mesma semente gera
+# sempre o mesmo arquivo, e a memória usada não depende do total de linhas.
+#
+# Um lote de pedidos novos, para o acréscimo incremental (utils/lotes.py), tem datas depois das do dataset e
+# entregadores novos nos mesmos restaurantes (DEL04 a DEL06 no lote 1, DEL07 a DEL09 no lote 2...): o acréscimo cria
+# dias e entregadores nos agregados, como pedidos que chegam de fato, em vez de somar aos que já existem.
+#
+# Uso (a partir da raiz do projeto):
+#     python -m benchmarks.gerador_pedidos dataset/pedidos_10m.csv --linhas 10000000 --semente 42
+#     python -m benchmarks.gerador_pedidos lote.csv --linhas 1000 --lote 1 --data-inicial 2022-04-07 --dias 1
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+LINHAS_POR_BLOCO = 100_000
+
+COLUNAS = ['ID', 'Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings', 'Restaurant_latitude',
+           'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude', 'Order_Date',
+           'Time_Orderd', 'Time_Order_picked', 'Weatherconditions', 'Road_traffic_density', 'Vehicle_condition',
+           'Type_of_order', 'Type_of_vehicle', 'multiple_deliveries', 'Festival', 'City', 'Time_taken(min)']
+
+# Prefixo do ID do entregador -> centro da cidade (latitude, longitude)
+CIDADES = {
+    'INDO': (22.72, 75.86), 'BANG': (12.97, 77.59), 'COIMB': (11.02, 76.96), 'CHEN': (13.08, 80.27),
+    'HYD': (17.39, 78.49), 'RANCHI': (23.34, 85.31), 'MYS': (12.30, 76.64), 'DEH': (30.32, 78.03),
+    'KOC': (9.93, 76.27), 'PUNE': (18.52, 73.86), 'LUDH': (30.90, 75.85), 'KNP': (26.45, 80.33),
+    'MUM': (19.08, 72.88), 'KOL': (22.57, 88.36), 'JAP': (26.91, 75.79), 'SUR': (21.17, 72.83),
+    'GOA': (15.49, 73.83), 'AURG': (19.88, 75.34), 'AGR': (27.18, 78.01), 'VAD': (22.31, 73.18),
+    'ALH': (25.44, 81.85), 'BHP': (23.26, 77.41),
+}
+RESTAURANTES_POR_CIDADE = 20
+ENTREGADORES_POR_RESTAURANTE = 3
+
+# Valores categóricos (já com o espaço no final, como no CSV original) e suas probabilidades
+TIPOS_CIDADE = (['Metropolitian ', 'Urban ', 'Semi-Urban ', 'NaN '], [0.745, 0.223, 0.004, 0.028])
+TRAFEGO = (['Low ', 'Jam ', 'Medium ', 'High ', 'NaN '], [0.338, 0.311, 0.240, 0.098, 0.013])
+CLIMA = (['conditions Fog', 'conditions Stormy', 'conditions Cloudy', 'conditions Sandstorms', 'conditions Windy',
+          'conditions Sunny', 'conditions NaN'],
+         [0.169, 0.166, 0.166, 0.164, 0.164, 0.158, 0.013])
+PEDIDOS = (['Snack ', 'Meal ', 'Drinks ', 'Buffet '], [0.252, 0.250, 0.249, 0.249])
+VEICULOS = (['motorcycle ', 'scooter ', 'electric_scooter ', 'bicycle '], [0.584, 0.334, 0.080, 0.002])
+FESTIVAL = (['No ', 'Yes ', 'NaN '], [0.975, 0.020, 0.005])
+ENTREGAS_MULTIPLAS = ([0, 1, 2, 3], [0.31, 0.62, 0.05, 0.02])
+
+# Proporção de valores ausentes ('NaN ') nas colunas numéricas e de horários
+PROB_NA = {'Delivery_person_Age': 0.04, 'Delivery_person_Ratings': 0.04, 'multiple_deliveries': 0.02,
+           'Time_Orderd': 0.04}
+
+# Coordenadas de restaurante zeradas ou com o sinal trocado, como acontece no dataset original
+PROB_COORDENADA_ZERADA = 0.008
+PROB_COORDENADA_NEGATIVA = 0.004
+
+# Período dos pedidos e efeito de cada fator no tempo de entrega (min)
+DATA_INICIAL, DATA_FINAL = np.datetime64('2022-02-11'), np.datetime64('2022-04-06')
+EFEITO_TRAFEGO = {'Low ': 0, 'Medium ': 7, 'High ': 6, 'Jam ': 11, 'NaN ': 0}
+EFEITO_CLIMA = {'conditions Sunny': -5, 'conditions Cloudy': 4, 'conditions Fog': 4, 'conditions Stormy': 1,
+                'conditions Sandstorms': 1, 'conditions Windy': 0, 'conditions NaN': 0}
+EFEITO_CIDADE = {'Metropolitian ': 2, 'Urban ': -4, 'Semi-Urban ': 22, 'NaN ': 0}
+
+# Textos pré-formatados, indexados pelo valor numérico (formatar cada linha com strftime/astype(str) é o gargalo)
+TEXTOS_DATAS = np.array([f'{d.day:02d}-{d.month:02d}-{d.year}' for d in
+                         pd.date_range(str(DATA_INICIAL), str(DATA_FINAL))], dtype=object)
+TEXTOS_HORARIOS = np.array([f'{m // 60:02d}:{m % 60:02d}:00' for m in range(24 * 60)], dtype=object)
+TEXTOS_INTEIROS = np.array([str(i) for i in range(100)], dtype=object)
+TEXTOS_DECIMOS = np.array([str(i / 10) for i in range(51)], dtype=object)
+TEXTOS_TEMPOS = np.array([f'(min) {i}' for i in range(100)], dtype=object)
+
+#======================================================================================================================
+# Universo de Restaurantes e Entregadores
+#======================================================================================================================
+
+# 1. Restaurantes e entregadores fixos para a semente: ID, coordenadas do restaurante, idade e avaliação média.
+#    Os restaurantes são sempre os mesmos; o 'lote' escolhe outros entregadores para eles (0: os do dataset).
+def gerar_entregadores(semente=0, lote=0):
+    rng = np.random.default_rng([semente, 0])
+    rng_entregadores = rng if lote == 0 else np.random.default_rng([semente, 0, lote])
+    primeiro = lote * ENTREGADORES_POR_RESTAURANTE + 1
+    linhas = []
+    for prefixo, (lat, lng) in CIDADES.items():
+        for restaurante in range(1, RESTAURANTES_POR_CIDADE + 1):
+            rest_lat, rest_lng = lat + rng.normal(0, 0.04), lng + rng.normal(0, 0.04)
+            for entregador in range(primeiro, primeiro + ENTREGADORES_POR_RESTAURANTE):
+                linhas.append((f'{prefixo}RES{restaurante:02d}DEL{entregador:02d} ', rest_lat, rest_lng,
+                               rng_entregadores.integers(20, 40),
+                               np.clip(rng_entregadores.normal(4.65, 0.25), 2.5, 5.0)))
+    return pd.DataFrame(linhas, columns=['Delivery_person_ID', 'lat', 'lng', 'idade', 'avaliacao'])
+
+#======================================================================================================================
+# Geração dos Pedidos
+#======================================================================================================================
+
+# 1. Sorteio de 'n' valores de uma tabela (valores, probabilidades)
+def _sortear(rng, tabela, n):
+    valores, probabilidades = tabela
+    return np.asarray(valores, dtype=object)[rng.choice(len(valores), size=n, p=probabilidades)]
+
+# 2. Textos com 'NaN ' nas posições sorteadas como ausentes
+def _com_ausentes(rng, textos, coluna):
+    return np.where(rng.random(len(textos)) < PROB_NA[coluna], 'NaN ', textos)
+
+# 3. Um bloco de 'n' pedidos numerados a partir de 'inicio', gerado pelo gerador aleatório 'rng', com datas sorteadas
+#    entre as de 'textos_datas'
+def gerar_bloco(rng, entregadores, inicio, n, textos_datas=TEXTOS_DATAS):
+    e = entregadores.iloc[rng.integers(len(entregadores), size=n)]
+
+    # Restaurante (com os erros de coordenada do original) e local de entrega próximo a ele
+    rest_lat, rest_lng = e['lat'].to_numpy(), e['lng'].to_numpy()
+    entrega_lat = rest_lat + rng.choice([-1, 1], size=n) * rng.uniform(0.01, 0.14, size=n)
+    entrega_lng = rest_lng + rng.choice([-1, 1], size=n) * rng.uniform(0.01, 0.14, size=n)
+    sorteio = rng.random(n)
+    fator = np.where(sorteio < PROB_COORDENADA_ZERADA, 0.0,
+                     np.where(sorteio < PROB_COORDENADA_ZERADA + PROB_COORDENADA_NEGATIVA, -1.0, 1.0))
+
+    # Data e horários (o pedido é retirado 5, 10 ou 15 minutos depois)
+    datas = textos_datas[rng.integers(0, len(textos_datas), size=n)]
+    minuto_pedido = rng.integers(8 * 60, 24 * 60 - 15, size=n)
+    minuto_retirada = minuto_pedido + rng.choice([5, 10, 15], size=n)
+
+    # Categorias e números
+    trafego = _sortear(rng, TRAFEGO, n)
+    clima = _sortear(rng, CLIMA, n)
+    cidade = _sortear(rng, TIPOS_CIDADE, n)
+    festival = _sortear(rng, FESTIVAL, n)
+    multiplas = _sortear(rng, ENTREGAS_MULTIPLAS, n).astype(int)
+    condicao = rng.integers(0, 4, size=n)
+    idade = e['idade'].to_numpy()
+    decimos = np.rint(np.clip(e['avaliacao'].to_numpy() + rng.normal(0, 0.15, size=n), 1.0, 5.0) * 10).astype(int)
+
+    # Tempo de entrega a partir dos fatores que o dashboard analisa
+    tempo = 17 + pd.Series(trafego).map(EFEITO_TRAFEGO).to_numpy() + pd.Series(clima).map(EFEITO_CLIMA).to_numpy() \
+        + pd.Series(cidade).map(EFEITO_CIDADE).to_numpy() + 5 * multiplas + 20 * (festival == 'Yes ') \
+        + 4 * (condicao == 0) + 4 * (decimos < 40) + rng.normal(0, 5, size=n)
+    tempo = np.clip(np.rint(tempo), 10, 54).astype(int)
+
+    return pd.DataFrame({
+        'ID': [f'0x{i:x} ' for i in range(inicio, inicio + n)],
+        'Delivery_person_ID': e['Delivery_person_ID'].to_numpy(),
+        'Delivery_person_Age': _com_ausentes(rng, TEXTOS_INTEIROS[idade], 'Delivery_person_Age'),
+        'Delivery_person_Ratings': _com_ausentes(rng, TEXTOS_DECIMOS[decimos], 'Delivery_person_Ratings'),
+        'Restaurant_latitude': (rest_lat * fator).round(6),
+        'Restaurant_longitude': (rest_lng * fator).round(6),
+        'Delivery_location_latitude': entrega_lat.round(6),
+        'Delivery_location_longitude': entrega_lng.round(6),
+        'Order_Date': datas,
+        'Time_Orderd': _com_ausentes(rng, TEXTOS_HORARIOS[minuto_pedido], 'Time_Orderd'),
+        'Time_Order_picked': TEXTOS_HORARIOS[minuto_retirada],
+        'Weatherconditions': clima,
+        'Road_traffic_density': trafego,
+        'Vehicle_condition': condicao,
+        'Type_of_order': _sortear(rng, PEDIDOS, n),
+        'Type_of_vehicle': _sortear(rng, VEICULOS, n),
+        'multiple_deliveries': _com_ausentes(rng, TEXTOS_INTEIROS[multiplas], 'multiple_deliveries'),
+        'Festival': festival,
+        'City': cidade,
+        'Time_taken(min)': TEXTOS_TEMPOS[tempo],
+    }, columns=COLUNAS)
+
+# 4. Blocos de pedidos até completar 'linhas' linhas (no máximo LINHAS_POR_BLOCO linhas em memória por vez). Os pedidos
+#    de um lote têm os entregadores do lote, geradores aleatórios próprios e IDs a partir de lote * 2**32.
+def gerar_blocos(linhas, semente=0, lote=0, textos_datas=TEXTOS_DATAS):
+    entregadores = gerar_entregadores(semente, lote)
+    for numero, inicio in enumerate(range(0, linhas, LINHAS_POR_BLOCO), start=1):
+        rng = np.random.default_rng([semente, numero] if lote == 0 else [semente, numero, lote])
+        yield gerar_bloco(rng, entregadores, (lote << 32) + inicio, min(LINHAS_POR_BLOCO, linhas - inicio),
+                          textos_datas)
+
+# 5. CSV com os pedidos dos blocos, gravado bloco a bloco pelo escritor de CSV do Arrow (sem aspas, como o original).
+#    Difere do to_csv do pandas apenas nas coordenadas zeradas, escritas como '0' em vez de '0.0'.
+def _gravar_csv(caminho, blocos):
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    opcoes = pa_csv.WriteOptions(include_header=False, quoting_style='none')
+    with open(caminho, 'wb') as arquivo:
+        arquivo.write((','.join(COLUNAS) + '\n').encode())
+        for bloco in blocos:
+            pa_csv.write_csv(pa.Table.from_pandas(bloco, preserve_index=False), arquivo, opcoes)
+
+# 6. CSV com 'linhas' pedidos no período do dataset original
+def gerar_csv(caminho, linhas, semente=0):
+    _gravar_csv(caminho, gerar_blocos(linhas, semente))
+
+# 7. CSV de um lote (número 'lote', a partir de 1) com 'linhas' pedidos novos, nos 'dias' dias a partir de
+#    'data_inicial' e com os entregadores novos do lote
+def gerar_lote(caminho, linhas, lote, data_inicial, dias=1, semente=0):
+    textos_datas = np.array([f'{d.day:02d}-{d.month:02d}-{d.year}' for d in
+                             pd.date_range(data_inicial, periods=dias)], dtype=object)
+    _gravar_csv(caminho, gerar_blocos(linhas, semente, lote, textos_datas))
+
+#======================================================================================================================
+# Execução
+#======================================================================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera pedidos sintéticos no formato do train.csv.')
+    parser.add_argument('destino', help='caminho do CSV a ser gravado')
+    parser.add_argument('--linhas', type=int, default=1_000_000)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--lote', type=int, default=0,
+                        help='número do lote de pedidos novos (0: dataset no período original)')
+    parser.add_argument('--data-inicial', help='primeiro dia dos pedidos do lote (aaaa-mm-dd)')
+    parser.add_argument('--dias', type=int, default=1, help='dias cobertos pelos pedidos do lote')
+    args = parser.parse_args()
+    if args.lote:
+        if args.data_inicial is None:
+            parser.error('--lote exige --data-inicial')
+        gerar_lote(args.destino, args.linhas, args.lote, args.data_inicial, args.dias, args.semente)
+    else:
+        gerar_csv(args.destino, args.linhas, args.semente)
+
+if __name__ == '__main__':
+    main()
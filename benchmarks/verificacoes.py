@@ -0,0 +1,340 @@
+#======================================================================================================================
+# VERIFICAÇÕES - RESULTADOS IGUAIS AOS DO CÁLCULO ORIGINAL
+#======================================================================================================================
+#
+# Cada verificação compara uma parte do dashboard com o cálculo original (clean_code com applymap e os groupby do pandas
+# sobre o Dataframe limpo, como nas páginas antes das otimizações; para os indicadores materializados, o cálculo feito
+# pelas próprias páginas) e para no primeiro resultado diferente, com o AssertionError. O CSV é copiado para uma pasta
+# temporária por verificação, então o snapshot, o banco, os lotes e os indicadores materializados do dataset não são
+# alterados.
+#
+# Uso (a partir da raiz do projeto):
+#     python -m benchmarks.verificacoes                                      # todas as verificações, no train.csv
+#     python -m benchmarks.verificacoes esquema --origem pedidos.csv
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import argparse
+import json
+import os
+import runpy
+import shutil
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from benchmarks.benchmark_limpeza import clean_code_original
+from benchmarks.gerador_pedidos import gerar_lote
+from utils.banco import carregar_banco
+from utils.consultas import CONSULTAS
+from utils.cubo import construir_cubo, construir_entregadores
+from utils.dados import CAMINHO_DADOS, enriquecer_dados, ler_csv, limpar_dados
+from utils.esquema import para_float64, tipar_dados
+from utils.analises import CALCULOS_EMPRESA, calculos_paginas
+from utils.inicializacao import CAMINHO_LOGO, PAGINAS, RAIZ, contexto_streamlit
+from utils.lotes import acrescentar_lote, compactar
+from utils.mapa import MODOS_MAPA
+from utils.materializacao import _descompactar, chave_materializada, ler_materializacao, materializar
+from utils.paginacao import TabelaPaginada
+from utils.resultados import cache_resultados
+from utils.snapshot import AGREGADOS, construir_snapshot, ler_agregado, ler_snapshot
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+TODOS_TRAFEGOS = ['Low', 'Medium', 'High', 'Jam']
+
+# Filtros da barra lateral verificados: data limite (exclusiva) e tipos de tráfego. 'vazio' é a primeira data do
+# slider, sem nenhum pedido antes dela; 'nenhum_trafego' é a seleção de tráfego vazia; 'lote_novo' inclui o último dia
+# e o dia do lote gerado na verificação dos lotes.
+FILTROS = {
+    'completo': (pd.Timestamp(2022, 4, 6), TODOS_TRAFEGOS),
+    'lote_novo': (pd.Timestamp(2022, 4, 8), TODOS_TRAFEGOS),
+    'recorte': (pd.Timestamp(2022, 3, 15), ['Low', 'Jam']),
+    'um_trafego': (pd.Timestamp(2022, 2, 20), ['Jam']),
+    'vazio': (pd.Timestamp(2022, 2, 11), TODOS_TRAFEGOS),
+    'nenhum_trafego': (pd.Timestamp(2022, 4, 6), []),
+}
+
+# Colunas originais das medidas do cubo e dos agrupamentos das páginas
+COLUNAS_MEDIDAS = {'tempo': 'Time_taken(min)', 'avaliacao': 'Delivery_person_Ratings'}
+
+# Agrupamentos das três páginas (dimensões e medida) comparados em cada backend
+AGRUPAMENTOS = {
+    'pedidos_por_dia': (['Order_Date'], None),
+    'pedidos_por_trafego': (['Road_traffic_density'], None),
+    'pedidos_por_cidade_e_trafego': (['City', 'Road_traffic_density'], None),
+    'avaliacao_por_trafego': (['Road_traffic_density'], 'avaliacao'),
+    'avaliacao_por_clima': (['Weatherconditions'], 'avaliacao'),
+    'tempo_por_festival': (['Festival'], 'tempo'),
+    'tempo_por_cidade': (['City'], 'tempo'),
+    'tempo_por_cidade_e_pedido': (['City', 'Type_of_order'], 'tempo'),
+    'tempo_por_cidade_e_trafego': (['City', 'Road_traffic_density'], 'tempo'),
+}
+
+# Verificação dos lotes: frações do CSV onde começam os lotes sobre os dias já carregados (o restante antes da primeira
+# é o CSV principal) e o lote gerado num dia novo, com entregadores novos
+FRACOES_LOTES = [0.7, 0.8, 0.9]
+LINHAS_LOTE_NOVO = 1000
+DIA_LOTE_NOVO = '2022-04-07'
+
+# Tolerância relativa das médias e desvios: o cubo e o banco somam os valores em outra ordem (ou como inteiros)
+TOLERANCIA = 1e-9
+
+# Tolerância absoluta do desvio padrão por entregador: quando as avaliações são todas iguais (desvio zero), o resíduo
+# das somas dos quadrados acumuladas em float vira um desvio de até cerca de 1e-7 depois da raiz quadrada
+TOLERANCIA_DESVIO = 1e-6
+
+# Verificação dos indicadores materializados: filtros dentro do slider (a data de 'lote_novo' fica fora dele)
+FILTROS_MATERIALIZADOS = [nome for nome in FILTROS if nome != 'lote_novo']
+
+#======================================================================================================================
+# Cálculo Original
+#======================================================================================================================
+
+# 1. Pedidos dentro dos filtros da barra lateral, como nas páginas originais
+def filtrar_original(df, data_limite, trafego):
+    return df.loc[(df['Order_Date'] < data_limite) & df['Road_traffic_density'].isin(trafego), :]
+
+# 2. Quantidade de pedidos ou quantidade, média e desvio padrão de uma medida por dimensões, com o groupby do pandas
+def agregar_original(df, dimensoes, medida=None):
+    if medida is None:
+        return df.groupby(dimensoes)['ID'].count().reset_index(name='pedidos')
+    a = df.groupby(dimensoes)[COLUNAS_MEDIDAS[medida]].agg(['count', 'mean', 'std'])
+    return a.set_axis(['qtd', 'media', 'desvio'], axis=1).reset_index()
+
+# 3. Pedidos, média e desvio padrão da avaliação e menor e maior tempo de entrega de cada entregador
+def estatisticas_entregadores_original(df):
+    avaliacao, tempo = COLUNAS_MEDIDAS['avaliacao'], COLUNAS_MEDIDAS['tempo']
+    return df.groupby('Delivery_person_ID').agg(pedidos=('ID', 'count'), media=(avaliacao, 'mean'),
+                                                desvio=(avaliacao, 'std'), tempo_min=(tempo, 'min'),
+                                                tempo_max=(tempo, 'max')).reset_index()
+
+#======================================================================================================================
+# Funções Auxiliares
+#======================================================================================================================
+
+# 1. Colunas categóricas como texto e índice refeito, para comparar resultados de esquemas e backends diferentes
+def _como_texto(df):
+    colunas = {col: df[col].astype(object) for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)}
+    return df.assign(**colunas).reset_index(drop=True)
+
+# 2. Compara dois Dataframes pelos valores (categorias como texto), sem exigir os mesmos tipos numéricos
+def comparar_tabelas(esperado, obtido, **kwargs):
+    pd.testing.assert_frame_equal(_como_texto(esperado), _como_texto(obtido), check_dtype=False, **kwargs)
+
+# 3. Compara dois resultados de uma análise das páginas (figura, tabela, tupla de resultados ou número) e seus tipos
+def comparar_resultados(esperado, obtido, chave):
+    import plotly.graph_objects as go
+
+    if isinstance(esperado, (tuple, list)):
+        assert len(esperado) == len(obtido), f'{chave}: {len(obtido)} resultados em vez de {len(esperado)}'
+        for parte_esperada, parte_obtida in zip(esperado, obtido):
+            comparar_resultados(parte_esperada, parte_obtida, chave)
+    elif isinstance(esperado, go.Figure):
+        assert json.loads(esperado.to_json()) == json.loads(obtido.to_json()), f'{chave}: figuras diferentes'
+    elif isinstance(esperado, TabelaPaginada):
+        assert esperado.coluna_busca == obtido.coluna_busca, f'{chave}: colunas de busca diferentes'
+        pd.testing.assert_frame_equal(esperado.tabela, obtido.tabela, obj=str(chave))
+    elif isinstance(esperado, pd.DataFrame):
+        pd.testing.assert_frame_equal(esperado, obtido, obj=str(chave))
+    else:
+        np.testing.assert_equal(obtido, esperado, err_msg=str(chave))
+
+#======================================================================================================================
+# Verificações
+#======================================================================================================================
+
+# 1. Esquema compacto: cada coluna volta aos valores do Dataframe original (categorias como texto, inteiros reduzidos
+#    em int64 e avaliações em float32 com as casas decimais originais), e o cubo e as estatísticas por entregador
+#    montados nos dois esquemas são iguais
+def verificar_esquema(caminho, original):
+    limpo, _ = limpar_dados(ler_csv(caminho))
+    padrao = tipar_dados(enriquecer_dados(limpo.copy()), compacto=False)
+    compacto = tipar_dados(enriquecer_dados(limpo), compacto=True)
+
+    for col in original.columns:
+        serie = compacto[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype(object)
+        elif serie.dtype.kind == 'f':
+            serie = para_float64(serie)
+        elif serie.dtype.kind in 'iu':
+            serie = serie.astype('int64')
+        pd.testing.assert_series_equal(original[col], serie)
+
+    comparar_tabelas(construir_cubo(padrao), construir_cubo(compacto))
+    comparar_tabelas(construir_entregadores(padrao), construir_entregadores(compacto))
+    return len(original.columns) + 2
+
+# 2. Consultas dos dois backends (cubo em memória e SQLite): cada agrupamento das páginas e a maior e a menor idade e
+#    condição de veículo, com cada filtro
+def verificar_consultas(caminho, original):
+    comparados = 0
+    for backend, Consulta in CONSULTAS.items():
+        for data_limite, trafego in FILTROS.values():
+            consulta = Consulta(data_limite, trafego, caminho)
+            df = filtrar_original(original, data_limite, trafego)
+            for dimensoes, medida in AGRUPAMENTOS.values():
+                comparar_tabelas(agregar_original(df, dimensoes, medida), consulta.agregar(dimensoes, medida),
+                                 rtol=TOLERANCIA)
+            for coluna in ('Delivery_person_Age', 'Vehicle_condition'):
+                np.testing.assert_equal(consulta.extremos(coluna), (df[coluna].max(), df[coluna].min()),
+                                        err_msg=f'{backend}: extremos de {coluna}')
+            comparados += len(AGRUPAMENTOS) + 2
+    return comparados
+
+# 3. Estatísticas por entregador dos dois backends (somas acumuladas por par de tráfego e entregador em memória, e
+#    agrupamento no banco), com cada filtro. Na média arredondada para 2 casas, como na tabela da página, só pode haver
+#    diferença nos empates exatos no meio de dois centésimos (utils/cubo.py): com avaliações de uma casa decimal, a
+#    média exata em centésimos, 10 * soma / pedidos (soma das avaliações em décimos), termina em meio.
+def verificar_entregadores(caminho, original):
+    comparados = 0
+    for backend, Consulta in CONSULTAS.items():
+        for data_limite, trafego in FILTROS.values():
+            filtrado = filtrar_original(original, data_limite, trafego)
+            esperado = estatisticas_entregadores_original(filtrado)
+            obtido = Consulta(data_limite, trafego, caminho).estatisticas_entregadores()
+            comparar_tabelas(esperado, obtido, rtol=TOLERANCIA, atol=TOLERANCIA_DESVIO)
+
+            diferentes = esperado['media'].round(2).to_numpy() != obtido['media'].round(2).to_numpy()
+            diferentes &= esperado['media'].notna().to_numpy()
+            df = filtrado[filtrado['Delivery_person_ID'].isin(esperado.loc[diferentes, 'Delivery_person_ID'])]
+            decimos = np.rint(df['Delivery_person_Ratings'] * 10).groupby(df['Delivery_person_ID']) \
+                .agg(['sum', 'count'])
+            vinte_vezes = 20 * decimos['sum'].astype('int64')                     # 2 * média exata em centésimos
+            empates = (vinte_vezes % decimos['count'] == 0) & ((vinte_vezes // decimos['count']) % 2 == 1)
+            assert empates.all(), f'{backend}: média arredondada diferente fora de um empate ' \
+                                  f'({", ".join(empates.index[~empates])})'
+            comparados += 1
+    return comparados
+
+# 4. Acréscimo de lotes: o CSV é dividido num CSV principal e em lotes sobre os mesmos dias, mais um lote gerado num dia
+#    novo, acrescentados um a um com o snapshot e o banco do CSV principal já construídos. O snapshot e os agregados
+#    são comparados com os do CSV inteiro construído do zero, e as consultas dos dois backends com o cálculo original
+#    sobre o CSV inteiro: com os lotes ainda não compactados, depois da compactação e depois de uma reconstrução a
+#    partir dos CSVs guardados. Os caches compartilhados são esvaziados antes de cada comparação (a compactação e a
+#    reconstrução não mudam a versão dos dados).
+def verificar_lotes(caminho, original):
+    pasta = os.path.dirname(caminho)
+    bruto = pd.read_csv(caminho, dtype=str, keep_default_na=False)
+    partes = np.array_split(bruto, [int(len(bruto) * fracao) for fracao in FRACOES_LOTES])
+    novo = os.path.join(pasta, 'lote_novo.csv')
+    gerar_lote(novo, LINHAS_LOTE_NOVO, 1, DIA_LOTE_NOVO)
+    partes.append(pd.read_csv(novo, dtype=str, keep_default_na=False))
+
+    completo = os.path.join(pasta, 'completo', os.path.basename(caminho))
+    os.makedirs(os.path.dirname(completo))
+    pd.concat(partes).to_csv(completo, index=False)
+    construir_snapshot(completo)
+    referencia = clean_code_original(pd.read_csv(completo))
+
+    partes[0].to_csv(caminho, index=False)
+    carregar_banco(caminho)                             # snapshot e banco do CSV principal, atualizados a cada lote
+    for numero, parte in enumerate(partes[1:], 1):
+        lote = os.path.join(pasta, f'lote_{numero}.csv')
+        parte.to_csv(lote, index=False)
+        acrescentar_lote(lote, caminho)
+
+    comparados = 0
+    for preparar in (None, compactar, construir_snapshot):
+        if preparar is not None:
+            preparar(caminho)
+        st.cache_resource.clear()
+        comparar_tabelas(ler_snapshot(completo).reset_index(), ler_snapshot(caminho).reset_index())
+        for nome in AGREGADOS:
+            comparar_tabelas(ler_agregado(completo, nome), ler_agregado(caminho, nome))
+        comparados += 1 + len(AGREGADOS)
+        comparados += verificar_consultas(caminho, referencia) + verificar_entregadores(caminho, referencia)
+    return comparados
+
+# 5. Indicadores materializados: cada página é executada com cada filtro (a Visão Empresa com cada seção), antes de
+#    existir o arquivo, e os resultados calculados por ela, guardados no cache de resultados, são comparados com os
+#    materializados para o mesmo filtro. A materialização deve conter exatamente as análises das páginas, mais os
+#    mapas. As páginas leem o CSV e a logomarca por caminhos relativos, então a verificação roda dentro da pasta.
+def verificar_materializacao(caminho, original):
+    pasta = os.path.dirname(caminho)
+    os.makedirs(os.path.join(pasta, os.path.dirname(CAMINHO_DADOS)))
+    shutil.move(caminho, os.path.join(pasta, CAMINHO_DADOS))
+    shutil.copyfile(os.path.join(RAIZ, CAMINHO_LOGO), os.path.join(pasta, CAMINHO_LOGO))
+    execucoes = [(PAGINAS[0], secao) for secao in CALCULOS_EMPRESA] + [(pagina, None) for pagina in PAGINAS[1:]]
+
+    diretorio = os.getcwd()
+    os.chdir(pasta)
+    try:
+        comparados = 0
+        for nome in FILTROS_MATERIALIZADOS:
+            data_limite, trafego = FILTROS[nome]
+            cache_resultados().limpar()
+            contexto = contexto_streamlit('verificacoes')
+            for pagina, secao in execucoes:
+                contexto.reset()
+                st.session_state.update(data_limite=data_limite.to_pydatetime(), trafego=trafego,
+                                        secao_empresa=secao)
+                runpy.run_path(os.path.join(RAIZ, pagina), run_name='__main__')
+            paginas = {chave_materializada(analise, data, selecao): valor
+                       for (analise, _, data, selecao), valor in cache_resultados().itens.items()}
+
+            materializar(CAMINHO_DADOS, [data_limite], [trafego])
+            resultados = ler_materializacao(CAMINHO_DADOS)['resultados']
+            filtro = chave_materializada(None, data_limite, trafego)[1:]
+            materializados = {chave for chave in resultados if chave[1:] == filtro}
+            analises = [*calculos_paginas(), *(f'mapa_{modo}' for modo in MODOS_MAPA.values())]
+            esperadas = {chave_materializada(analise, data_limite, trafego) for analise in analises}
+            assert materializados == esperadas, f'{nome}: análises materializadas diferentes das páginas ' \
+                                                f'({sorted(materializados ^ esperadas)})'
+            faltando = set(paginas) - materializados
+            assert not faltando, f'{nome}: resultados das páginas não materializados ({sorted(faltando)})'
+            for chave, valor in paginas.items():
+                comparar_resultados(valor, _descompactar(resultados[chave]), chave)
+            comparados += len(paginas)
+        return comparados
+    finally:
+        os.chdir(diretorio)
+
+VERIFICACOES = {
+    'esquema': verificar_esquema,
+    'consultas': verificar_consultas,
+    'entregadores': verificar_entregadores,
+    'lotes': verificar_lotes,
+    'materializacao': verificar_materializacao,
+}
+
+#======================================================================================================================
+# Execução
+#======================================================================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Verificações dos resultados do dashboard contra o cálculo original.')
+    parser.add_argument('verificacoes', nargs='*', help=f'verificações executadas ({", ".join(VERIFICACOES)}; '
+                                                        'padrão: todas)')
+    parser.add_argument('--origem', default=CAMINHO_DADOS, help='CSV no formato do train.csv')
+    args = parser.parse_args()
+    desconhecidas = set(args.verificacoes) - set(VERIFICACOES)
+    if desconhecidas:
+        parser.error(f'verificações desconhecidas: {", ".join(sorted(desconhecidas))}')
+
+    from streamlit.logger import set_log_level
+    set_log_level('error')
+    warnings.simplefilter('ignore', FutureWarning)
+    warnings.simplefilter('ignore', RuntimeWarning)                     # médias dos filtros sem pedidos
+    contexto_streamlit('verificacoes')                                  # sem ele os caches do Streamlit não guardam
+
+    original = clean_code_original(pd.read_csv(args.origem))
+    for nome in args.verificacoes or VERIFICACOES:
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, os.path.basename(args.origem))
+            shutil.copyfile(args.origem, caminho)
+            inicio = time.perf_counter()
+            comparados = VERIFICACOES[nome](caminho, original)
+            print(f'{nome}: {comparados} resultados iguais ({time.perf_counter() - inicio:.1f} s)', flush=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+#======================================================================================================================
+# ANÁLISES DAS PÁGINAS
+#======================================================================================================================
+#
+# Cálculo de cada análise das três páginas (tabelas, figuras e métricas), sem desenho, a partir de uma consulta com os
+# filtros da barra lateral (utils/consultas.py). As páginas desenham os resultados guardados no cache de resultados; o
+# pool dos painéis (CURRY_PAINEIS_PARALELOS) e a materialização dos indicadores (utils/materializacao.py) chamam as
+# mesmas funções, pelos dicionários CALCULOS_* (análise -> função da consulta), sem executar as páginas.
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import numpy as np
+import pandas as pd
+
+from utils.config import MODO_APROXIMADO
+from utils.dados import calcular_calendario
+from utils.inicializacao import ModuloSobDemanda
+from utils.paginacao import TabelaPaginada
+from utils.sobreposicao import Sobreposicao
+
+# Bibliotecas de gráficos importadas no primeiro gráfico desenhado (os resultados em cache não as importam)
+px = ModuloSobDemanda('plotly.express')
+go = ModuloSobDemanda('plotly.graph_objects')
+
+#======================================================================================================================
+# Visão Empresa
+#======================================================================================================================
+
+# 1. Quantidade de pedidos por dia
+def grafico_pedidos_por_dia(consulta):
+    a = consulta.agregar(['Order_Date'])
+    a.columns = ['Data de Entrega', 'Qtd. de Pedidos']
+    fig = px.bar( a, x='Data de Entrega', y='Qtd. de Pedidos', category_orders={'Order_Date': a['Data de Entrega']} )
+    fig.update_traces(marker_color='#9B0000')
+    return fig
+
+# 2. Pedidos por tipo de tráfego
+def grafico_pedidos_por_trafego(consulta):
+    a = consulta.agregar(['Road_traffic_density']).rename(columns={'pedidos': 'ID'})
+    a['perc_ID'] = 100 * ( a['ID'] / a['ID'].sum() )
+    fig = px.pie(a, values='ID', names='Road_traffic_density', labels={'ID':'Quantidade de Pedidos', 'Road_traffic_density':'Tipo de Tráfego'}, hover_data={'perc_ID': ':.2f'})
+    fig.update_layout(width=700, height=500, legend=dict(font=dict(size=15), orientation='h',x=0.27))
+    fig.update_traces(textposition='inside', textinfo='percent+label', textfont=dict(size=16))
+    return fig
+
+# 3. Volume de pedidos por cidade e tipo de tráfego
+def grafico_volume_de_pedidos(consulta):
+    a = consulta.agregar(['City', 'Road_traffic_density'])
+    a.columns = ['Cidade', 'Tráfego', 'ID']
+    fig = px.bar(a, x='Cidade', y='ID', color='Tráfego', barmode='group')
+    fig.update_layout(xaxis_title='Cidade', yaxis_title='Qtd. de Pedidos', width=700, height=500, legend=dict(title='', font=dict(size=15), orientation='h', x=0.25, y=1.10))
+    return fig
+
+# Semana do ano de cada dia de uma tabela agregada por dia, numa sobreposição (a tabela não é copiada)
+def por_semana(a):
+    return Sobreposicao(a, Week_of_Year=calcular_calendario(a['Order_Date'])['Week_of_Year'])
+
+# 4. Pedidos por semana
+def grafico_pedidos_semana(consulta):
+    df_aux = por_semana(consulta.agregar(['Order_Date'])).agrupar(['Week_of_Year'], 'pedidos').sum().reset_index()
+    df_aux.columns = ['Semana do Ano', 'Número de Pedidos']
+    return px.line( df_aux, x='Semana do Ano', y='Número de Pedidos')
+
+# 5. Entregas por entregador (entregadores únicos por semana a partir dos entregadores distintos por dia e tráfego, ou
+#    estimados no modo aproximado)
+def grafico_entregas_por_entregador(consulta):
+    a = por_semana(consulta.agregar(['Order_Date'])).agrupar(['Week_of_Year'], 'pedidos').sum().reset_index(name='ID')
+    b = consulta.entregadores_distintos(por_semana=True).reset_index()
+    # Qtd. de pedidos por semana / Número único de entregadores por semana
+    c = pd.merge(a, b, how='inner')
+    c['order_by_deliver'] = c['ID'] / c['Delivery_person_ID']
+    c.columns = ['Semana do Ano', 'Pedidos', 'Entregadores', 'Pedidos por Entregador']
+    return px.line(c, x='Semana do Ano', y='Pedidos por Entregador')
+
+# Cálculo de cada análise das seções. O mapa tem cache próprio e é gerado ao ser desenhado.
+CALCULOS_EMPRESA = {
+    'Visão Gerencial': {
+        'pedidos_por_dia': grafico_pedidos_por_dia,
+        'pedidos_por_trafego': grafico_pedidos_por_trafego,
+        'volume_de_pedidos': grafico_volume_de_pedidos,
+    },
+    'Visão Tática': {
+        'pedidos_semana': grafico_pedidos_semana,
+        'entregas_por_entregador': grafico_entregas_por_entregador,
+    },
+    'Visão Geográfica': {},
+}
+
+# Análises da seção escolhida no modo sob demanda, ou de todas as seções (secao=None, como nas abas)
+def calculos_empresa(secao=None):
+    if secao is not None:
+        return CALCULOS_EMPRESA[secao]
+    return {analise: calcular for calculos in CALCULOS_EMPRESA.values() for analise, calcular in calculos.items()}
+
+#======================================================================================================================
+# Visão Entregadores
+#======================================================================================================================
+
+# 1. Maior Idade
+def calcular_idade(consulta):
+    return consulta.extremos('Delivery_person_Age')
+
+# 2. Melhor e Pior condição de veículo
+def calcular_condicao_veiculo(consulta):
+    return consulta.extremos('Vehicle_condition')
+
+# 3. A avaliação média por entregador, com pedidos, desvio padrão e menor e maior tempo (tabela paginada no servidor:
+#    apenas a página aberta é enviada ao navegador)
+def tabela_avaliacao_media_entregador(consulta):
+    a = consulta.estatisticas_entregadores().round({'media': 2, 'desvio': 2})
+    a.columns = ['ID Entregador', 'Pedidos', 'Avaliação Média', 'Desvio Padrão', 'Menor Tempo (min)',
+                 'Maior Tempo (min)']
+    return TabelaPaginada(a, 'ID Entregador')
+
+# 4. A avaliação média e o desvio padrão por tipo de tráfego ou condições climáticas (coluna e nome da coluna na tabela)
+def tabela_avaliacao_media_e_std(consulta, coluna, nome):
+    a = consulta.agregar([coluna], 'avaliacao').drop(columns='qtd')
+    a.columns = [coluna, 'Avaliação Média', 'Desvio Padrão']
+    a = a.rename(columns={coluna: nome})
+    a['Avaliação Média'] = a['Avaliação Média'].round(2)
+    return a
+
+# 5. Os percentis das avaliações por cidade e trânsito, apenas no modo aproximado (interpolados nos histogramas; no modo
+#    exato exigiriam percorrer as avaliações de todos os pedidos filtrados a cada execução)
+def tabela_percentis_avaliacao(consulta):
+    a = consulta.percentis(['City', 'Road_traffic_density'], 'avaliacao').round(2)
+    return a.rename(columns={'City': 'Cidade', 'Road_traffic_density': 'Trânsito'})
+
+# 6. Os entregadores mais rápidos e mais lentos por cidade (tabelas calculadas pelo RankingEntregadores)
+def calcular_top_entregadores(consulta):
+    return consulta.ranking().calcular()
+
+# Cálculo de cada análise da página
+CALCULOS_ENTREGADORES = {
+    'idade': calcular_idade,
+    'condicao_veiculo': calcular_condicao_veiculo,
+    'avaliacao_media_entregador': tabela_avaliacao_media_entregador,
+    'avaliacao_media_e_std_trafego': lambda consulta: tabela_avaliacao_media_e_std(consulta, 'Road_traffic_density',
+                                                                                   'Trânsito'),
+    'avaliacao_media_e_std_clima': lambda consulta: tabela_avaliacao_media_e_std(consulta, 'Weatherconditions',
+                                                                                 'Clima'),
+    'top_entregadores': calcular_top_entregadores,
+}
+if MODO_APROXIMADO:
+    CALCULOS_ENTREGADORES['percentis_avaliacao'] = tabela_percentis_avaliacao
+
+#======================================================================================================================
+# Visão Restaurantes
+#======================================================================================================================
+
+# 1. A quantidade de entregadores únicos (a partir dos entregadores distintos por dia e tráfego, ou estimada no modo
+#    aproximado)
+def calcular_entregadores_unicos(consulta):
+    return consulta.entregadores_distintos()
+
+# 2. A distância média dos resturantes e dos locais de entrega (coluna 'distance' calculada no carregamento). Sem
+#    pedidos na seleção a média é NaN (float do Python no backend em memória), como o tempo médio dos festivais.
+def calcular_distancia_media(consulta):
+    return np.round(consulta.media('distance'), 2)
+
+# 3. O tempo médio de entrega com e sem os Festivais
+def calcular_tempo_medio_festival(consulta):
+    return consulta.agregar(['Festival'], 'tempo').set_index('Festival')
+
+# 4. Tempo médio por cidade (min)
+def grafico_tempo_medio_por_cidade(consulta):
+    a = consulta.agregar(['City'], 'tempo').drop(columns='qtd').round(2)
+    a.columns = ['City', 'Tempo Médio', 'Desvio Padrão']
+    fig = go.Figure()
+    fig.add_trace( go.Bar( name='Control', x=a['City'], y=a['Tempo Médio'], error_y=dict(type='data', array=a['Desvio Padrão'])))
+    fig.update_traces(marker_color='#9B0000')
+    fig.update_layout(barmode='group', xaxis_title='Cidade', yaxis_title='Tempo Médio (min)')
+    return fig
+
+# 5. Tempo Médio Por Tipo de Pedido e Cidade
+def tabela_tempo_media_por_pedido_cidade(consulta):
+    a = consulta.agregar(['City', 'Type_of_order'], 'tempo').drop(columns='qtd').round(2)
+    a.columns = ['City', 'Type_of_order', 'Tempo Médio', 'Desvio Padrão']
+    return a.rename(columns={'City': 'Cidade', 'Type_of_order': 'Tipo de Pedido'})
+
+# 6. Tempo médio por cidade (%)
+def grafico_tempo_medio_cidade_perc(consulta):
+    a = consulta.media('distance', ['City'])
+    fig = go.Figure( data=[ go.Pie( labels=a['City'], values=a['distance'], pull=[0.01, 0.01, 0.01])])
+    fig.update_layout(title={'text': 'Tempo Médio Por Cidade', 'y':0.95,'x':0.48, 'xanchor': 'center', 'yanchor': 'top'}, width=700, height=500, legend=dict(font=dict(size=15), orientation='h',x=0.25))
+    fig.update_traces(textinfo='percent', textfont=dict(size=18), hovertemplate='%{label}<br>%{value:.2f} km<br>%{percent}')
+    return fig
+
+# 7. Desvio Padrão Por Cidade e Tráfego
+def grafico_std_cidade_trafego(consulta):
+    a = consulta.agregar(['City', 'Road_traffic_density'], 'tempo').drop(columns='qtd')
+    a.columns = ['City', 'Road_traffic_density', 'Tempo Médio', 'Desvio Padrão']
+    fig = px.sunburst(a, path=['City', 'Road_traffic_density'], values='Tempo Médio', color='Desvio Padrão', color_continuous_scale='RdBu', color_continuous_midpoint=np.average(a['Desvio Padrão']))
+    fig.update_layout(title={'text': 'Desvio Padrão Por Cidade e Tráfego', 'y':0.95,'x':0.4, 'xanchor': 'center', 'yanchor': 'top'}, width=700, height=500)
+    return fig
+
+# 8. Percentis do tempo de entrega por cidade e tráfego, apenas no modo aproximado (interpolados nos histogramas; no
+#    modo exato exigiriam percorrer os tempos de todos os pedidos filtrados a cada execução)
+def tabela_percentis_tempo_cidade_trafego(consulta):
+    a = consulta.percentis(['City', 'Road_traffic_density'], 'tempo').round(2)
+    a.columns = ['Cidade', 'Tráfego', *(f'{nome} (min)' for nome in a.columns[2:])]
+    return a
+
+# Cálculo de cada análise da página
+CALCULOS_RESTAURANTES = {
+    'entregadores_unicos': calcular_entregadores_unicos,
+    'distancia_media': calcular_distancia_media,
+    'tempo_medio_festival': calcular_tempo_medio_festival,
+    'tempo_medio_por_cidade': grafico_tempo_medio_por_cidade,
+    'tempo_media_por_pedido_cidade': tabela_tempo_media_por_pedido_cidade,
+    'tempo_medio_cidade_perc': grafico_tempo_medio_cidade_perc,
+    'std_cidade_trafego': grafico_std_cidade_trafego,
+}
+if MODO_APROXIMADO:
+    CALCULOS_RESTAURANTES['percentis_tempo_cidade_trafego'] = tabela_percentis_tempo_cidade_trafego
+
+#======================================================================================================================
+# Todas as Páginas
+#======================================================================================================================
+
+# Análises das três páginas, com todas as seções da Visão Empresa (o mapa é calculado à parte, por modo)
+def calculos_paginas():
+    return {**calculos_empresa(), **CALCULOS_ENTREGADORES, **CALCULOS_RESTAURANTES}
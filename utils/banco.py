@@ -0,0 +1,181 @@
+#======================================================================================================================
+# BANCO SQLITE DOS PEDIDOS
+#======================================================================================================================
+#
+# Backend opcional (CURRY_BACKEND=sqlite): os pedidos limpos ficam num arquivo SQLite ao lado do CSV, com índices nas
+# colunas usadas pelos filtros e pelos agrupamentos. Os filtros da barra lateral e os agrupamentos das páginas viram
+# consultas SQL e apenas os resultados (poucas linhas) voltam para o pandas, então os processos do servidor compartilham
+# o mesmo arquivo em disco em vez de manter, cada um, o Dataframe inteiro em memória.
+#
+# As datas são gravadas como dias desde 1970-01-01 (inteiros) e as avaliações em float64, com os valores decimais
+# originais. O banco é gerado a partir do snapshot, em lotes, e refeito quando o hash do CSV ou a versão do esquema
+# mudam; os lotes de pedidos acrescentados depois (utils/lotes.py) são inseridos no banco existente.
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import os
+import sqlite3
+from contextlib import closing
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import streamlit as st
+
+from utils.cubo import MEDIDAS, estatisticas
+from utils.dados import CAMINHO_DADOS, versao_dados
+from utils.desempenho import etapa
+from utils.esquema import para_float64
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+COLUNAS_BANCO = ['Order_Date', 'City', 'Road_traffic_density', 'Weatherconditions', 'Type_of_order', 'Festival',
+                 'Delivery_person_ID', 'Delivery_person_Age', 'Vehicle_condition', 'Delivery_person_Ratings',
+                 'Time_taken(min)', 'distance']
+
+COLUNAS_INDICES = ['Order_Date', 'City', 'Road_traffic_density', 'Delivery_person_ID']
+
+# Coluna de cada medida do cubo, para as estatísticas calculadas no banco
+MEDIDAS_SQL = {'tempo': '"Time_taken(min)"', 'avaliacao': 'Delivery_person_Ratings'}
+
+# Linhas do snapshot convertidas e inseridas por vez na construção do banco
+LINHAS_POR_LOTE = 100_000
+
+#======================================================================================================================
+# Funções do Banco
+#======================================================================================================================
+
+# 1. Caminho do banco e conexão (somente leitura nas consultas, para que vários processos leiam o mesmo arquivo)
+def caminho_banco(caminho_csv):
+    return os.path.splitext(caminho_csv)[0] + '.sqlite'
+
+def _conectar(caminho, somente_leitura=True):
+    if somente_leitura:
+        return sqlite3.connect(f'file:{quote(os.path.abspath(caminho))}?mode=ro', uri=True)
+    return sqlite3.connect(caminho)
+
+# 2. Dias desde 1970-01-01 de uma data (arredondados para cima, já que a data limite dos filtros é exclusiva)
+def _dias(datas):
+    return np.ceil((pd.to_datetime(datas) - pd.Timestamp(0)) / pd.Timedelta(days=1)).astype('int64')
+
+# 3. Metadados gravados no banco: versão do esquema, hash do CSV e quantidade de lotes acrescentados
+def _metadados_banco(meta, lotes=None):
+    return {'versao_esquema': str(meta['versao_esquema']), 'hash': meta['hash'],
+            'lotes': str(len(meta['lotes']) if lotes is None else lotes)}
+
+# 4. Confere se o banco foi gerado a partir do snapshot atual (mesmo hash do CSV, mesma versão do esquema e mesmos
+#    lotes)
+def banco_valido(caminho_csv, meta):
+    try:
+        with closing(_conectar(caminho_banco(caminho_csv))) as con:
+            gravado = dict(con.execute('SELECT chave, valor FROM metadados'))
+    except sqlite3.Error:
+        return False
+    return gravado == _metadados_banco(meta)
+
+# 5. Insere pedidos limpos (Dataframes próprios com as COLUNAS_BANCO, convertidos no lugar) na tabela de pedidos
+def _inserir_pedidos(con, partes):
+    for df in partes:
+        df['Order_Date'] = df['Order_Date'].to_numpy().astype('datetime64[D]').astype('int64')
+        df['Delivery_person_Ratings'] = para_float64(df['Delivery_person_Ratings'])
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype(object)
+        df.to_sql('pedidos', con, index=False, if_exists='append')
+
+# 6. Grava o banco a partir do snapshot (e dos lotes ainda não compactados nele), em lotes, num arquivo temporário
+#    renomeado ao final (gravação atômica)
+def construir_banco(caminho_csv, meta):
+    from utils.snapshot import arquivos_snapshot
+
+    destino = caminho_banco(caminho_csv)
+    temporario = f'{destino}.{os.getpid()}.tmp'
+    if os.path.exists(temporario):
+        os.remove(temporario)
+
+    with closing(_conectar(temporario, somente_leitura=False)) as con:
+        con.execute('PRAGMA journal_mode=OFF')
+        con.execute('PRAGMA synchronous=OFF')
+        for arquivo in arquivos_snapshot(caminho_csv):
+            tabela = feather.read_table(arquivo, columns=COLUNAS_BANCO, memory_map=True)
+            _inserir_pedidos(con, (lote.to_pandas() for lote in tabela.to_batches(max_chunksize=LINHAS_POR_LOTE)))
+        for col in COLUNAS_INDICES:
+            con.execute(f'CREATE INDEX "idx_{col}" ON pedidos ("{col}")')
+        con.execute('CREATE TABLE metadados (chave TEXT PRIMARY KEY, valor TEXT)')
+        con.executemany('INSERT INTO metadados VALUES (?, ?)', _metadados_banco(meta).items())
+        con.commit()
+    os.replace(temporario, destino)
+
+# 7. Insere os pedidos de um lote acrescentado ao dataset no banco existente, numa única transação com a nova
+#    quantidade de lotes (os processos do servidor continuam lendo o banco enquanto isso)
+def acrescentar_banco(caminho_csv, df, lotes):
+    with closing(_conectar(caminho_banco(caminho_csv), somente_leitura=False)) as con:
+        _inserir_pedidos(con, [df[COLUNAS_BANCO].copy()])
+        con.execute("UPDATE metadados SET valor = ? WHERE chave = 'lotes'", (str(lotes),))
+        con.commit()
+
+#======================================================================================================================
+# Consultas
+#======================================================================================================================
+
+class BancoPedidos:
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    # 1. Cláusula WHERE e parâmetros dos filtros da barra lateral: data limite exclusiva e tipos de tráfego selecionados
+    @staticmethod
+    def _filtro(data_limite, trafego):
+        marcadores = ', '.join('?' * len(trafego))
+        return f'WHERE Order_Date < ? AND Road_traffic_density IN ({marcadores})', [int(_dias(data_limite)), *trafego]
+
+    # 2. Executa um SELECT sobre os pedidos filtrados, opcionalmente agrupado (ou distinto) e ordenado pelas colunas
+    #    de 'agrupamento'. As datas voltam como datetime.
+    def consultar(self, selecao, data_limite, trafego, agrupamento=None, distinto=False):
+        where, parametros = self._filtro(data_limite, trafego)
+        sql = f'SELECT {"DISTINCT " if distinto else ""}{selecao} FROM pedidos {where}'
+        if agrupamento:
+            sql += f' {"" if distinto else f"GROUP BY {agrupamento} "}ORDER BY {agrupamento}'
+        with etapa('consulta_sql') as registro, closing(_conectar(self.caminho)) as con:
+            df = pd.read_sql_query(sql, con, params=parametros)
+            registro['linhas'] = len(df)
+        if 'Order_Date' in df.columns:
+            df['Order_Date'] = pd.to_datetime(df['Order_Date'].astype('int64'), unit='D')
+        return df
+
+    # 3. Quantidade de pedidos ou estatísticas de uma medida por dimensões, no mesmo formato do agregar_cubo.
+    #    TOTAL (e não SUM) devolve sempre float, sem estouro de inteiros na soma dos quadrados.
+    def agregar(self, data_limite, trafego, dimensoes, medida=None):
+        colunas = ', '.join(f'"{col}"' for col in dimensoes)
+        if medida is None:
+            return self.consultar(f'{colunas}, COUNT(*) AS pedidos', data_limite, trafego, colunas)
+
+        qtd, soma, soma_quad = MEDIDAS[medida]
+        x = MEDIDAS_SQL[medida]
+        a = self.consultar(f'{colunas}, COUNT({x}) AS {qtd}, TOTAL({x}) AS {soma}, TOTAL({x} * {x}) AS {soma_quad}',
+                           data_limite, trafego, colunas)
+        return estatisticas(a.set_index(dimensoes), medida)
+
+#======================================================================================================================
+# Carregamento do Banco
+#======================================================================================================================
+
+@st.cache_resource(max_entries=1, show_spinner='Preparando o banco de pedidos...')
+def _carregar_banco(caminho, versao):
+    from utils.snapshot import carregar_metadados
+
+    meta = carregar_metadados(caminho)
+    if not banco_valido(caminho, meta):
+        with etapa('construir_banco') as registro:
+            construir_banco(caminho, meta)
+            registro['linhas'] = meta['linhas']
+    return BancoPedidos(caminho_banco(caminho))
+
+# 1. Banco do dataset completo, compartilhado entre as sessões e refeito quando o arquivo de dados muda
+def carregar_banco(caminho=CAMINHO_DADOS):
+    return _carregar_banco(caminho, versao_dados(caminho))
@@ -0,0 +1,71 @@
+#======================================================================================================================
+# CONFIGURAÇÕES DO DASHBOARD
+#======================================================================================================================
+#
+# Lidas de variáveis de ambiente no início do processo, para que cada servidor possa ser ajustado sem alterar o código.
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import os
+
+#======================================================================================================================
+# Funções Auxiliares
+#======================================================================================================================
+
+def _ligado(nome, padrao):
+    return os.environ.get(nome, padrao).strip().lower() in ('1', 'true', 'sim', 'yes')
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+# Esquema compacto: categóricas para os textos repetidos, inteiros reduzidos e float32 (CURRY_ESQUEMA_COMPACTO=0 desliga)
+ESQUEMA_COMPACTO = _ligado('CURRY_ESQUEMA_COMPACTO', '1')
+
+# Quantidade de entregadores por cidade nos rankings de mais rápidos e mais lentos
+TOP_ENTREGADORES = int(os.environ.get('CURRY_TOP_ENTREGADORES', '10'))
+
+# Mapa de cidades: tamanho da célula da grade de densidade (graus) e máximo de células enviadas ao navegador
+MAPA_RESOLUCAO = float(os.environ.get('CURRY_MAPA_RESOLUCAO', '0.01'))
+MAPA_MAX_PONTOS = int(os.environ.get('CURRY_MAPA_MAX_PONTOS', '2000'))
+
+# Quantidade máxima de resultados de análises (tabelas e figuras) no cache compartilhado entre as sessões
+CACHE_RESULTADOS = int(os.environ.get('CURRY_CACHE_RESULTADOS', '512'))
+
+# Linhas do CSV lidas e limpas por vez na construção do snapshot (a memória de pico depende deste valor, e não do
+# tamanho do arquivo, para o texto bruto)
+LINHAS_POR_BLOCO = int(os.environ.get('CURRY_LINHAS_POR_BLOCO', '1000000'))
+
+# Processos usados na construção do snapshot: o CSV é dividido em partições de bytes, limpas e agregadas em paralelo
+# (1 = leitura serial)
+PROCESSOS = int(os.environ.get('CURRY_PROCESSOS', '1'))
+
+# Origem das consultas das páginas: 'memoria' (cubo pré-agregado e índice sobre o Dataframe compartilhado) ou 'sqlite'
+# (consultas SQL sobre um banco em disco gerado a partir do snapshot)
+BACKEND = os.environ.get('CURRY_BACKEND', 'memoria').strip().lower()
+
+# Painel de desempenho por etapa na barra lateral das páginas e arquivo (JSON lines) onde cada execução das páginas
+# é registrada (vazio = sem log)
+PAINEL_DESEMPENHO = _ligado('CURRY_PAINEL_DESEMPENHO', '0')
+LOG_DESEMPENHO = os.environ.get('CURRY_LOG_DESEMPENHO', '')
+
+# Visão Empresa: calcula e desenha apenas a seção escolhida (gerencial, tática ou geográfica) em vez de todas as abas
+# a cada execução (CURRY_SECOES_SOB_DEMANDA=0 volta às abas)
+SECOES_SOB_DEMANDA = _ligado('CURRY_SECOES_SOB_DEMANDA', '1')
+
+# Linhas por página das tabelas paginadas no servidor (estatísticas por entregador)
+LINHAS_POR_PAGINA = int(os.environ.get('CURRY_LINHAS_POR_PAGINA', '50'))
+
+# Modo aproximado: entregadores distintos e percentis calculados a partir dos esboços por dia (HyperLogLog e
+# histogramas, ver utils/esbocos.py), sem percorrer os pedidos
+MODO_APROXIMADO = _ligado('CURRY_MODO_APROXIMADO', '0')
+
+# Indicadores materializados: resultados das análises lidos do arquivo gerado por python -m utils.materializacao
+# (quando existe e corresponde aos dados e ao código atuais) antes de serem calculados
+KPIS_MATERIALIZADOS = _ligado('CURRY_KPIS_MATERIALIZADOS', '1')
+
+# Painéis em paralelo: threads que calculam as análises de uma página ao mesmo tempo, antes do desenho em ordem
+# (0 calcula cada painel quando ele é desenhado)
+PAINEIS_PARALELOS = int(os.environ.get('CURRY_PAINEIS_PARALELOS', '0'))
@@ -0,0 +1,251 @@
+#======================================================================================================================
+# CONSULTAS DAS PÁGINAS
+#======================================================================================================================
+#
+# As páginas pedem apenas os resultados de que precisam (pedidos ou estatísticas por dimensões, médias, percentis,
+# extremos, entregadores distintos e estatísticas e tempos por entregador), já com os filtros da barra lateral. Há duas
+# implementações com os mesmos resultados, escolhidas por CURRY_BACKEND: em memória (cubo pré-agregado e índice dos
+# filtros sobre o Dataframe compartilhado) e no banco SQLite (consultas SQL sobre o arquivo em disco).
+#
+# Com CURRY_MODO_APROXIMADO=1, as contagens de entregadores distintos e os percentis vêm dos esboços por dia
+# (utils/esbocos.py, com os limites de erro documentados lá) em qualquer um dos backends; as demais consultas não mudam.
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+from functools import cached_property
+
+import numpy as np
+
+from utils.config import BACKEND, MODO_APROXIMADO
+from utils.cubo import (ESCALAS, MEDIDAS, agregar_cubo, carregar_acumulados, carregar_cubo, carregar_entregadores,
+                        carregar_esbocos, fatiar_cubo, tabela_entregadores)
+from utils.dados import CAMINHO_DADOS, calcular_calendario
+from utils.desempenho import etapa
+from utils.esbocos import CLASSES, PERCENTIS, contar_distintos, nomes_percentis, percentis_histogramas
+from utils.esquema import para_float64
+from utils.filtros import carregar_indice
+from utils.ranking import CHAVES, RankingEntregadores
+from utils.sobreposicao import Sobreposicao
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+# Colunas somadas como inteiros (em milionésimos) nas médias calculadas no banco
+ESCALAS_COLUNAS = {'Delivery_person_Ratings': ESCALAS['avaliacao']}
+
+#======================================================================================================================
+# Resultados Comuns aos Backends
+#======================================================================================================================
+
+# 1. Entregadores distintos a partir dos pares distintos de dia, tráfego e entregador: no total ou por semana do ano
+#    (Series indexada pela semana)
+def _contar_entregadores(entregadores, por_semana=False):
+    if not por_semana:
+        return entregadores['Delivery_person_ID'].nunique()
+    semanas = calcular_calendario(entregadores['Order_Date'])['Week_of_Year']
+    return Sobreposicao(entregadores, Week_of_Year=semanas).agrupar(['Week_of_Year'], 'Delivery_person_ID').nunique()
+
+# 2. Percentis exatos de uma coluna por dimensões (dimensões e uma coluna por percentil, como os dos histogramas)
+def _percentis(df, dimensoes, coluna, percentis=PERCENTIS):
+    valores = para_float64(df[coluna])
+    a = Sobreposicao(df, **{coluna: valores}).agrupar(dimensoes, coluna).quantile(percentis).unstack()
+    a = a.reindex(columns=percentis)                        # seleção vazia: nenhum grupo e nenhuma coluna no unstack
+    a.columns = nomes_percentis(percentis)
+    return a.sort_index().reset_index()
+
+#======================================================================================================================
+# Consultas em Memória
+#======================================================================================================================
+
+class ConsultaMemoria:
+
+    def __init__(self, data_limite, trafego, caminho=CAMINHO_DADOS):
+        self.data_limite, self.trafego, self.caminho = data_limite, trafego, caminho
+
+    # Células do cubo dentro dos filtros, fatiadas uma vez por execução da página
+    @cached_property
+    def cubo(self):
+        cubo = carregar_cubo(self.caminho)
+        with etapa('filtro_cubo') as registro:
+            cubo = fatiar_cubo(cubo, self.data_limite, self.trafego)
+            registro['linhas'] = len(cubo)
+        return cubo
+
+    # 1. Pedidos filtrados, apenas com as colunas pedidas (o índice só é carregado quando uma análise precisa dele)
+    def pedidos(self, *colunas):
+        indice = carregar_indice(self.caminho)
+        with etapa('filtro_pedidos') as registro:
+            df = indice.filtrar(self.data_limite, self.trafego, list(colunas))
+            registro['linhas'] = len(df)
+        return df
+
+    # 2. Quantidade de pedidos ou estatísticas de uma medida ('tempo' ou 'avaliacao') por dimensões
+    def agregar(self, dimensoes, medida=None):
+        return agregar_cubo(self.cubo, dimensoes, medida)
+
+    # 3. Média de uma coluna: geral (sem dimensões) ou por dimensões. A coluna em float64 fica numa sobreposição sobre
+    #    os pedidos filtrados, que não são copiados para recebê-la.
+    def media(self, coluna, dimensoes=()):
+        df = self.pedidos(*dimensoes, coluna)
+        valores = para_float64(df[coluna])
+        if not dimensoes:
+            return valores.mean()
+        return Sobreposicao(df, **{coluna: valores}).agrupar(dimensoes, coluna).mean().sort_index().reset_index()
+
+    # 4. Maior e menor valor de uma coluna
+    def extremos(self, coluna):
+        valores = self.pedidos(coluna)[coluna]
+        return valores.max(), valores.min()
+
+    # 5. Pares distintos de dia, tráfego e entregador, para as contagens de entregadores únicos
+    def entregadores(self):
+        return fatiar_cubo(carregar_entregadores(self.caminho), self.data_limite, self.trafego)
+
+    # 6. Ranking com o menor e o maior tempo de entrega de cada entregador em cada cidade
+    def ranking(self):
+        return RankingEntregadores(self.pedidos(*CHAVES, 'Time_taken(min)'))
+
+    # 7. Pedidos, média e desvio padrão da avaliação e menor e maior tempo de cada entregador, a partir das
+    #    estatísticas acumuladas de cada par de tráfego e entregador (uma linha por par, sem percorrer os dias)
+    def estatisticas_entregadores(self):
+        return carregar_acumulados(self.caminho).estatisticas(self.data_limite, self.trafego)
+
+    # 8. Entregadores distintos no total ou por semana do ano
+    def entregadores_distintos(self, por_semana=False):
+        return _contar_entregadores(self.entregadores(), por_semana)
+
+    # 9. Percentis de uma medida ('tempo' ou 'avaliacao') por dimensões, a partir dos pedidos filtrados
+    def percentis(self, dimensoes, medida):
+        coluna = CLASSES[medida][0]
+        return _percentis(self.pedidos(*dimensoes, coluna), list(dimensoes), coluna)
+
+#======================================================================================================================
+# Consultas no Banco
+#======================================================================================================================
+
+class ConsultaBanco:
+
+    def __init__(self, data_limite, trafego, caminho=CAMINHO_DADOS):
+        from utils.banco import carregar_banco
+        self.data_limite, self.trafego = data_limite, trafego
+        self.banco = carregar_banco(caminho)
+
+    def _consultar(self, selecao, agrupamento=None, distinto=False):
+        return self.banco.consultar(selecao, self.data_limite, self.trafego, agrupamento, distinto)
+
+    # 1. Quantidade de pedidos ou estatísticas de uma medida ('tempo' ou 'avaliacao') por dimensões
+    def agregar(self, dimensoes, medida=None):
+        return self.banco.agregar(self.data_limite, self.trafego, dimensoes, medida)
+
+    # 2. Média de uma coluna: geral (sem dimensões) ou por dimensões. Colunas com escala (as avaliações) são somadas
+    #    como inteiros, como no cubo, para que a média não dependa da ordem da soma
+    def media(self, coluna, dimensoes=()):
+        if coluna in ESCALAS_COLUNAS:
+            escala = ESCALAS_COLUNAS[coluna]
+            expressao = f'SUM(CAST(ROUND("{coluna}" * {escala}) AS INTEGER)) * 1.0 / COUNT("{coluna}") / {escala}'
+        else:
+            expressao = f'AVG("{coluna}")'
+        if not dimensoes:
+            return self._consultar(f'{expressao} AS media')['media'].astype('float64').iloc[0]
+        colunas = ', '.join(f'"{col}"' for col in dimensoes)
+        a = self._consultar(f'{colunas}, {expressao} AS "{coluna}"', colunas)
+        return a.astype({coluna: 'float64'})
+
+    # 3. Maior e menor valor de uma coluna (NaN sem pedidos, como no pandas)
+    def extremos(self, coluna):
+        a = self._consultar(f'MAX("{coluna}") AS maior, MIN("{coluna}") AS menor').iloc[0]
+        return tuple(np.nan if valor is None else valor for valor in (a['maior'], a['menor']))
+
+    # 4. Pares distintos de dia, tráfego e entregador, para as contagens de entregadores únicos
+    def entregadores(self):
+        return self._consultar('Order_Date, Road_traffic_density, Delivery_person_ID',
+                               'Order_Date, Road_traffic_density, Delivery_person_ID', distinto=True)
+
+    # 5. Ranking com o menor e o maior tempo de entrega de cada entregador em cada cidade, agrupados no banco
+    def ranking(self):
+        colunas = ', '.join(CHAVES)
+        tempos = self._consultar(f'{colunas}, MIN("Time_taken(min)") AS "min", MAX("Time_taken(min)") AS "max"',
+                                 colunas)
+        ranking = RankingEntregadores()
+        ranking.combinar(tempos.set_index(CHAVES))
+        return ranking
+
+    # 6. Pedidos, média e desvio padrão da avaliação e menor e maior tempo de cada entregador, agrupados no banco (as
+    #    avaliações somadas como inteiros, como no cubo)
+    def estatisticas_entregadores(self):
+        qtd, soma, soma_quad = MEDIDAS['avaliacao']
+        escala = ESCALAS_COLUNAS['Delivery_person_Ratings']
+        a = self._consultar(
+            f'Delivery_person_ID, COUNT(*) AS pedidos, COUNT(Delivery_person_Ratings) AS {qtd}, '
+            f'SUM(CAST(ROUND(Delivery_person_Ratings * {escala}) AS INTEGER)) AS {soma}, '
+            f'TOTAL(Delivery_person_Ratings * Delivery_person_Ratings) AS {soma_quad}, '
+            'MIN("Time_taken(min)") AS tempo_min, MAX("Time_taken(min)") AS tempo_max', 'Delivery_person_ID')
+        a[soma] = a[soma] / escala
+        return tabela_entregadores(a.set_index('Delivery_person_ID'))
+
+    # 7. Entregadores distintos no total ou por semana do ano
+    def entregadores_distintos(self, por_semana=False):
+        return _contar_entregadores(self.entregadores(), por_semana)
+
+    # 8. Percentis de uma medida ('tempo' ou 'avaliacao') por dimensões, a partir das linhas filtradas no banco
+    def percentis(self, dimensoes, medida):
+        coluna = CLASSES[medida][0]
+        colunas = ', '.join(f'"{col}"' for col in dimensoes)
+        return _percentis(self._consultar(f'{colunas}, "{coluna}"'), list(dimensoes), coluna)
+
+#======================================================================================================================
+# Consultas Aproximadas
+#======================================================================================================================
+
+# Entregadores distintos e percentis a partir dos esboços por dia dentro dos filtros, no mesmo formato das consultas
+# exatas; as demais consultas são as do backend configurado
+class ConsultaAproximada:
+
+    def __init__(self, consulta, caminho=CAMINHO_DADOS):
+        self.consulta, self.caminho = consulta, caminho
+
+    def __getattr__(self, nome):
+        return getattr(self.consulta, nome)
+
+    # Cada esboço dentro dos filtros, fatiado uma vez por execução da página (e só se alguma análise o usar)
+    def _fatiar(self, posicao):
+        esboco = carregar_esbocos(self.caminho)[posicao]
+        with etapa('filtro_esbocos') as registro:
+            esboco = fatiar_cubo(esboco, self.data_limite, self.trafego)
+            registro['linhas'] = len(esboco)
+        return esboco
+
+    @cached_property
+    def distintos(self):
+        return self._fatiar(0)
+
+    @cached_property
+    def histogramas(self):
+        return self._fatiar(1)
+
+    # 1. Entregadores distintos estimados (HyperLogLog) no total ou por semana do ano
+    def entregadores_distintos(self, por_semana=False):
+        distintos = self.distintos
+        if not por_semana:
+            return int(round(contar_distintos(distintos)))
+        semanas = calcular_calendario(distintos['Order_Date'])['Week_of_Year']
+        estimativas = contar_distintos(distintos, semanas).round().astype('int64')
+        return estimativas.rename_axis('Week_of_Year').rename('Delivery_person_ID')
+
+    # 2. Percentis de uma medida por dimensões interpolados nos histogramas
+    def percentis(self, dimensoes, medida):
+        return percentis_histogramas(self.histogramas, list(dimensoes), medida)
+
+#======================================================================================================================
+# Seleção do Backend
+#======================================================================================================================
+
+CONSULTAS = {'memoria': ConsultaMemoria, 'sqlite': ConsultaBanco}
+
+# 1. Consultas das páginas com os filtros da barra lateral, no backend configurado (e no modo aproximado, se ligado)
+def criar_consulta(data_limite, trafego, caminho=CAMINHO_DADOS):
+    consulta = CONSULTAS[BACKEND](data_limite, trafego, caminho)
+    return ConsultaAproximada(consulta, caminho) if MODO_APROXIMADO else consulta
@@ -0,0 +1,230 @@
+#======================================================================================================================
+# CUBO DE INDICADORES PRÉ-AGREGADO
+#======================================================================================================================
+#
+# Uma célula por combinação de dia, cidade, tráfego, clima, tipo de pedido e festival, com a quantidade de pedidos e
+# as estatísticas suficientes (quantidade, soma e soma dos quadrados) do tempo de entrega e da avaliação. Células podem
+# ser somadas entre si, então qualquer recorte dos filtros da barra lateral é respondido somando poucas células em vez
+# de percorrer todos os pedidos.
+#
+# Ao lado do cubo ficam os entregadores por dia e tráfego, para as contagens de entregadores únicos e a tabela de
+# estatísticas por entregador: quantidade de pedidos, somas das avaliações e menor e maior tempo de entrega. Os dois
+# podem ser calculados por partes (por exemplo, bloco a bloco na leitura em blocos) e combinados.
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.dados import CAMINHO_DADOS, versao_dados
+from utils.desempenho import etapa
+from utils.esquema import DECIMAIS_FLOAT32, concatenar_tipados, para_float64
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+DIMENSOES_CUBO = ['Order_Date', 'City', 'Road_traffic_density', 'Weatherconditions', 'Type_of_order', 'Festival']
+
+DIMENSOES_ENTREGADORES = ['Order_Date', 'Road_traffic_density', 'Delivery_person_ID']
+
+# Estatísticas de cada entregador por dia e tráfego e como são combinadas entre partes (ou entre dias)
+AGREGACOES_ENTREGADORES = {'pedidos': 'sum', 'avaliacao_qtd': 'sum', 'avaliacao_soma': 'sum',
+                           'avaliacao_soma_quad': 'sum', 'tempo_min': 'min', 'tempo_max': 'max'}
+
+# Colunas das estatísticas de cada medida: (quantidade, soma, soma dos quadrados)
+MEDIDAS = {
+    'tempo': ('tempo_qtd', 'tempo_soma', 'tempo_soma_quad'),
+    'avaliacao': ('avaliacao_qtd', 'avaliacao_soma', 'avaliacao_soma_quad'),
+}
+
+# As avaliações entram no cubo como inteiros (em milionésimos), para que as somas de cada célula sejam exatas e não
+# dependam da ordem das linhas nem da divisão em blocos
+ESCALAS = {'avaliacao': 10 ** DECIMAIS_FLOAT32}
+
+#======================================================================================================================
+# Funções do Cubo
+#======================================================================================================================
+
+# Quantidade, soma e soma dos quadrados das avaliações de cada pedido, em inteiros escalados
+def _somas_avaliacao(df):
+    avaliacao = np.rint(para_float64(df['Delivery_person_Ratings']) * ESCALAS['avaliacao'])
+    return {'avaliacao_qtd': avaliacao.notna().astype('int64'), 'avaliacao_soma': avaliacao.fillna(0).astype('int64'),
+            'avaliacao_soma_quad': (avaliacao * avaliacao).fillna(0).astype('int64')}
+
+# 1. Construção do cubo diário a partir do Dataframe limpo
+def construir_cubo(df):
+    tempo = df['Time_taken(min)'].astype('int64')                                 # somas inteiras são exatas
+    aux = df[DIMENSOES_CUBO].assign(
+        pedidos=1,
+        tempo_qtd=1,
+        tempo_soma=tempo,
+        tempo_soma_quad=tempo * tempo,
+        **_somas_avaliacao(df))
+    return aux.groupby(DIMENSOES_CUBO, observed=True).sum().sort_index().reset_index()
+
+# 2. Estatísticas de cada entregador por dia e tráfego
+def construir_entregadores(df):
+    tempo = df['Time_taken(min)'].astype('int64')
+    aux = df[DIMENSOES_ENTREGADORES].assign(pedidos=1, **_somas_avaliacao(df), tempo_min=tempo, tempo_max=tempo)
+    return aux.groupby(DIMENSOES_ENTREGADORES, observed=True).agg(AGREGACOES_ENTREGADORES).sort_index().reset_index()
+
+# 3. Combinação de cubos e de estatísticas de entregadores calculados sobre partes disjuntas dos pedidos
+def combinar_cubos(partes):
+    return concatenar_tipados(partes).groupby(DIMENSOES_CUBO, observed=True).sum().sort_index().reset_index()
+
+def combinar_entregadores(partes):
+    return concatenar_tipados(partes).groupby(DIMENSOES_ENTREGADORES, observed=True) \
+        .agg(AGREGACOES_ENTREGADORES).sort_index().reset_index()
+
+# 4. Células (ou pares de entregadores) dentro dos filtros da barra lateral: data limite exclusiva e tipos de tráfego
+#    selecionados
+def fatiar_cubo(cubo, data_limite, trafego):
+    linhas_selecionadas = (cubo['Order_Date'] < data_limite) & cubo['Road_traffic_density'].isin(trafego)
+    return cubo.loc[linhas_selecionadas, :]
+
+# 5. Soma das células por dimensões. Sem medida, retorna a quantidade de pedidos; com medida ('tempo' ou 'avaliacao'),
+#    retorna quantidade, média e desvio padrão amostral (ddof=1, como no pandas).
+#    Somas escaladas voltam para float antes de somar as células (a soma dos quadrados em inteiros estouraria o int64).
+#    O sort_index é necessário porque, no pandas 1.5, observed=True mantém os grupos categóricos na ordem de aparição.
+def agregar_cubo(cubo, dimensoes, medida=None):
+    if medida is None:
+        return cubo.groupby(dimensoes, observed=True)['pedidos'].sum().sort_index().reset_index()
+
+    qtd, soma, soma_quad = MEDIDAS[medida]
+    aux = cubo[dimensoes + [qtd, soma, soma_quad]]
+    if medida in ESCALAS:
+        escala = ESCALAS[medida]
+        aux = aux.assign(**{soma: aux[soma] / escala, soma_quad: aux[soma_quad] / (escala * escala)})
+    return estatisticas(aux.groupby(dimensoes, observed=True).sum().sort_index(), medida)
+
+# 6. Quantidade, média e desvio padrão a partir das somas de uma medida já agrupadas (índice com as dimensões)
+def estatisticas(a, medida):
+    qtd, soma, soma_quad = MEDIDAS[medida]
+    n, s, q = (a[col].to_numpy() for col in (qtd, soma, soma_quad))
+    numerador = n * q - s * s                                                     # exato quando as somas são inteiras
+    n = n.astype('float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media = s / n
+        variancia = numerador / (n * (n - 1))
+    variancia = np.where(n > 1, np.maximum(variancia, 0), np.nan)
+    resultado = pd.DataFrame({'qtd': a[qtd].to_numpy(), 'media': np.where(n > 0, media, np.nan),
+                              'desvio': np.sqrt(variancia)}, index=a.index)
+    return resultado.reset_index()
+
+# 7. Estatísticas por entregador (pedidos, média e desvio padrão da avaliação, menor e maior tempo de entrega) a
+#    partir de estatísticas por entregador (uma ou mais linhas por entregador), com a soma dos quadrados das avaliações
+#    já em float, em ordem de entregador. A soma das avaliações é feita em inteiros (média exata, igual à do banco).
+#    Numa média exatamente no meio de dois centésimos (3,855), o arredondamento para 2 casas segue o float64 mais
+#    próximo da média exata; a média do pandas sobre as avaliações em float arredonda para um lado ou outro conforme o
+#    erro da soma, então pode diferir da tabela original em 0,01 nesses empates.
+def estatisticas_entregadores(entregadores):
+    escala = ESCALAS['avaliacao']
+    a = entregadores.groupby('Delivery_person_ID', observed=True).agg(AGREGACOES_ENTREGADORES)
+    return tabela_entregadores(a.assign(avaliacao_soma=a['avaliacao_soma'] / escala))
+
+# 8. Tabela por entregador a partir das somas já agrupadas por entregador (calculadas em memória ou no banco)
+def tabela_entregadores(a):
+    avaliacao = estatisticas(a, 'avaliacao')
+    return pd.DataFrame({'Delivery_person_ID': avaliacao['Delivery_person_ID'].astype(str).to_numpy(),
+                         'pedidos': a['pedidos'].to_numpy(), 'media': avaliacao['media'].to_numpy(),
+                         'desvio': avaliacao['desvio'].to_numpy(), 'tempo_min': a['tempo_min'].to_numpy(),
+                         'tempo_max': a['tempo_max'].to_numpy()}).sort_values('Delivery_person_ID', ignore_index=True)
+
+#======================================================================================================================
+# Estatísticas Acumuladas dos Entregadores
+#======================================================================================================================
+#
+# As estatísticas por dia, tráfego e entregador têm quase uma linha por pedido (38.807 linhas para 40.720 pedidos no
+# train.csv): um entregador raramente entrega duas vezes no mesmo dia e tráfego. Para a tabela por entregador, elas são
+# acumuladas por dia dentro de cada par de tráfego e entregador (somas acumuladas e menor e maior tempo até o dia). Como
+# a data limite é exclusiva, as estatísticas de cada par dentro do filtro são as da sua última linha anterior à data,
+# encontrada por busca binária: a tabela é montada a partir de uma linha por par selecionado (8.708 pares no
+# train.csv), e não reagrupando todas as linhas dos dias filtrados.
+
+class AcumuladosEntregadores:
+
+    def __init__(self, entregadores):
+        pares = ['Road_traffic_density', 'Delivery_person_ID']
+        a = entregadores.sort_values(pares + ['Order_Date'], kind='stable', ignore_index=True)
+
+        # Somas acumuladas (a dos quadrados das avaliações em float, sem estouro do int64) e extremos acumulados
+        escala = ESCALAS['avaliacao']
+        a = a.assign(avaliacao_soma_quad=a['avaliacao_soma_quad'] / (escala * escala))
+        grupos = a.groupby(pares, observed=True, sort=False)
+        somas = ['pedidos', 'avaliacao_qtd', 'avaliacao_soma', 'avaliacao_soma_quad']
+        self.acumulados = grupos[somas].cumsum().assign(
+            Delivery_person_ID=a['Delivery_person_ID'],
+            tempo_min=grupos['tempo_min'].cummin(),
+            tempo_max=grupos['tempo_max'].cummax())
+
+        # Chave ordenada de cada linha (par e dia, relativo ao primeiro dia dos dados) e o tráfego de cada par
+        self.grupo = grupos.ngroup().to_numpy()
+        dias = a['Order_Date'].to_numpy().astype('datetime64[D]').astype('int64')
+        self.dia_inicial = int(dias.min()) if len(dias) else 0
+        self.dias_por_grupo = int(dias.max()) - self.dia_inicial + 2 if len(dias) else 1
+        self.chaves = self.grupo * self.dias_por_grupo + (dias - self.dia_inicial)
+        primeiras = np.flatnonzero(np.diff(self.grupo, prepend=-1))
+        self.trafego_grupo = a['Road_traffic_density'].to_numpy()[primeiras]
+
+    # 1. Última linha de cada par (dentro dos tipos de tráfego selecionados) com data anterior à data limite
+    def linhas(self, data_limite, trafego):
+        limite = np.datetime64(pd.Timestamp(data_limite).ceil('D'), 'D').astype('int64') - self.dia_inicial
+        limite = min(max(limite, 0), self.dias_por_grupo - 1)
+        grupos = np.arange(len(self.trafego_grupo))
+        posicoes = np.searchsorted(self.chaves, grupos * self.dias_por_grupo + limite, side='left') - 1
+        validas = (posicoes >= 0) & (self.grupo[np.maximum(posicoes, 0)] == grupos)
+        validas &= np.isin(self.trafego_grupo, list(trafego))
+        return self.acumulados.take(posicoes[validas])
+
+    # 2. Estatísticas por entregador dentro dos filtros da barra lateral
+    def estatisticas(self, data_limite, trafego):
+        return estatisticas_entregadores(self.linhas(data_limite, trafego))
+
+#======================================================================================================================
+# Carregamento do Cubo
+#======================================================================================================================
+
+# O cubo, os entregadores por dia e tráfego e os esboços do modo aproximado são gravados no snapshot junto com o
+# Dataframe limpo
+@st.cache_resource(max_entries=1, show_spinner='Agregando indicadores...')
+def _carregar_agregados(caminho, versao):
+    from utils.snapshot import carregar_agregados
+    with etapa('carregar_agregados') as registro:
+        agregados = carregar_agregados(caminho)
+        registro['linhas'] = len(agregados['cubo'])
+    return agregados
+
+# 1. Cubo do dataset completo, compartilhado entre as sessões e refeito quando o arquivo de dados muda
+def carregar_cubo(caminho=CAMINHO_DADOS):
+    return _carregar_agregados(caminho, versao_dados(caminho))['cubo']
+
+# 2. Estatísticas dos entregadores por dia e tráfego do dataset completo
+def carregar_entregadores(caminho=CAMINHO_DADOS):
+    return _carregar_agregados(caminho, versao_dados(caminho))['entregadores']
+
+# 3. Estatísticas acumuladas por par de tráfego e entregador do dataset completo
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _carregar_acumulados(caminho, versao):
+    entregadores = carregar_entregadores(caminho)
+    with etapa('acumular_entregadores') as registro:
+        acumulados = AcumuladosEntregadores(entregadores)
+        registro['linhas'] = len(acumulados.trafego_grupo)
+    return acumulados
+
+def carregar_acumulados(caminho=CAMINHO_DADOS):
+    return _carregar_acumulados(caminho, versao_dados(caminho))
+
+# 4. Esboços do modo aproximado do dataset completo: registradores dos entregadores distintos e histogramas
+def carregar_esbocos(caminho=CAMINHO_DADOS):
+    agregados = _carregar_agregados(caminho, versao_dados(caminho))
+    return agregados['distintos'], agregados['histogramas']
+
+# 5. Primeira e última data dos pedidos (limites do filtro de datas da barra lateral, que acompanham os lotes
+#    acrescentados)
+def limites_datas(caminho=CAMINHO_DADOS):
+    datas = carregar_cubo(caminho)['Order_Date']
+    return datas.min().to_pydatetime(), datas.max().to_pydatetime()
@@ -0,0 +1,172 @@
+#======================================================================================================================
+# CAMADA DE DADOS COMPARTILHADA
+#======================================================================================================================
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import os
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.desempenho import etapa
+from utils.distancia import calcular_distancia
+from utils.esquema import tipar_dados
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+CAMINHO_DADOS = os.path.join('dataset', 'train.csv')
+
+#======================================================================================================================
+# Funções de Limpeza do Dataframe
+#======================================================================================================================
+
+# Tipos declarados na leitura do CSV: as coordenadas já são lidas como número, o ID (único por linha) como texto e
+# as demais colunas, com poucos valores distintos, como categóricas.
+COLUNAS_COORDENADAS = ['Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude']
+TIPOS_CSV = defaultdict(lambda: 'category', {'ID': str, **dict.fromkeys(COLUNAS_COORDENADAS, 'float64')})
+NA_CSV = dict.fromkeys(COLUNAS_COORDENADAS, ['NaN', 'NaN '])
+
+# Colunas convertidas para número ao final da limpeza
+COLUNAS_INT = ['Delivery_person_Age', 'Vehicle_condition', 'multiple_deliveries', 'Time_taken(min)']
+COLUNAS_FLOAT = ['Delivery_person_Ratings', *COLUNAS_COORDENADAS]
+
+# Linhas com o texto 'NaN' em alguma destas colunas são descartadas
+COLUNAS_OBRIGATORIAS = ['Delivery_person_Age', 'multiple_deliveries', 'Road_traffic_density', 'City', 'Festival']
+SENTINELA_NA = 'NaN'
+
+# Prefixos removidos do texto
+PREFIXOS = {'Weatherconditions': 'conditions ', 'Time_taken(min)': '(min) '}
+
+# 1. Leitura do CSV com os tipos e os marcadores de NA declarados
+def ler_csv(caminho, **kwargs):
+    return pd.read_csv(caminho, dtype=TIPOS_CSV, na_values=NA_CSV, **kwargs)
+
+# 2. Separa uma coluna em códigos (um por linha) e valores distintos já sem espaços nas pontas.
+#    Assim strip, remoção de prefixos e conversões são feitos uma vez por valor distinto, e não uma vez por linha.
+#    Valores ausentes viram o texto 'nan', assim como no astype(str) original.
+def _decompor(serie):
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        if serie.dtype != object:
+            serie = serie.astype(str)
+        serie = serie.astype('category')
+    codigos = serie.cat.codes.to_numpy()
+    valores = np.append(serie.cat.categories.astype(str).str.strip().to_numpy(dtype=object), 'nan')
+    if (codigos < 0).any():
+        codigos = np.where(codigos < 0, len(valores) - 1, codigos)
+    return codigos, valores
+
+# 3. Converte apenas os valores distintos usados pelas linhas mantidas e os expande para todas as linhas
+def _converter(codigos, valores, coluna):
+    if coluna in PREFIXOS:
+        valores = pd.Series(valores).str.replace(PREFIXOS[coluna], '', regex=False).to_numpy(dtype=object)
+
+    if coluna in COLUNAS_INT or coluna in COLUNAS_FLOAT or coluna == 'Order_Date':
+        usados = np.bincount(codigos, minlength=len(valores)) > 0
+        if coluna in COLUNAS_INT:
+            convertidos = np.zeros(len(valores), dtype=int)
+            convertidos[usados] = pd.Series(valores[usados]).astype(int)
+        elif coluna in COLUNAS_FLOAT:
+            convertidos = np.full(len(valores), np.nan)
+            convertidos[usados] = pd.Series(valores[usados]).astype(float)
+        else:
+            convertidos = np.full(len(valores), np.datetime64('NaT'), dtype='datetime64[ns]')
+            convertidos[usados] = pd.to_datetime(pd.Series(valores[usados]), format='%d-%m-%Y')
+        valores = convertidos
+
+    return valores.take(codigos)
+
+# 4. Limpeza vetorizada: uma única máscara de linhas válidas e conversões feitas apenas sobre as linhas mantidas.
+#    Retorna o Dataframe limpo e a quantidade de linhas rejeitadas por coluna (uma linha pode ter mais de um motivo).
+def limpar_dados(df):
+
+    decompostas = {col: _decompor(df[col]) for col in df.columns
+                   if col != 'ID' and not (col in COLUNAS_COORDENADAS and df[col].dtype == float)}
+
+    # Máscara combinada das linhas com 'NaN' nas colunas obrigatórias
+    invalidas = {}
+    for col in COLUNAS_OBRIGATORIAS:
+        codigos, valores = decompostas[col]
+        invalidas[col] = (valores == SENTINELA_NA).take(codigos)
+    validas = ~np.logical_or.reduce(list(invalidas.values()))
+
+    rejeitadas = pd.Series({col: int(mascara.sum()) for col, mascara in invalidas.items()})
+    rejeitadas['Total'] = int((~validas).sum())
+
+    # Conversões, apenas nas linhas válidas
+    colunas = {}
+    for col in df.columns:
+        if col in decompostas:
+            codigos, valores = decompostas[col]
+            colunas[col] = _converter(codigos[validas], valores, col)
+        elif col == 'ID':
+            colunas[col] = df[col][validas].astype(str).str.strip().to_numpy()
+        else:
+            colunas[col] = df[col].to_numpy()[validas]
+
+    return pd.DataFrame(colunas, index=df.index[validas]), rejeitadas
+
+# 5. Limpeza do Dataframe bruto
+def clean_code(df):
+    df, _ = limpar_dados(df)
+    return df
+
+#======================================================================================================================
+# Colunas Derivadas
+#======================================================================================================================
+
+# 1. Calendário ISO (ano, semana e dia da semana, de 1 a 7) e dia do mês de cada pedido, calculados uma vez por data
+#    distinta e expandidos para as linhas
+def calcular_calendario(datas):
+    codigos, unicas = pd.factorize(datas)
+    unicas = pd.Series(unicas)
+    calendario = unicas.dt.isocalendar().astype('int64')
+    calendario['Day_of_Month'] = unicas.dt.day
+    calendario = calendario.rename(columns={'year': 'ISO_Year', 'week': 'Week_of_Year', 'day': 'Weekday'})
+    return {col: calendario[col].to_numpy().take(codigos) for col in calendario.columns}
+
+# 2. Colunas calculadas uma única vez no carregamento e reaproveitadas por todas as páginas
+def enriquecer_dados(df):
+    df['distance'] = calcular_distancia(df)
+    for col, valores in calcular_calendario(df['Order_Date']).items():
+        df[col] = valores
+    return df
+
+# 3. Limpeza, colunas derivadas e tipos do esquema aplicados ao Dataframe bruto
+#    O resultado fica ordenado por data, como esperado pelo índice dos filtros.
+def preparar_dados(df):
+    df, rejeitadas = limpar_dados(df)
+    df = df.sort_values('Order_Date', kind='stable')
+    return tipar_dados(enriquecer_dados(df)), rejeitadas
+
+#======================================================================================================================
+# Carregamento do Dataframe
+#======================================================================================================================
+
+# 1. Versão dos dados (muda sempre que o CSV é alterado ou um lote de pedidos é acrescentado, ver utils/lotes.py)
+def versao_dados(caminho=CAMINHO_DADOS):
+    from utils.snapshot import versao_lotes
+    info = os.stat(caminho)
+    return f'{info.st_mtime_ns}-{info.st_size}-{versao_lotes(caminho)}'
+
+# 2. Leitura do snapshot colunar (ou leitura e limpeza do CSV, se o snapshot estiver desatualizado),
+#    executada uma única vez por processo e por versão do arquivo
+@st.cache_resource(max_entries=1, show_spinner='Carregando dados...')
+def _carregar_dados(caminho, versao):
+    from utils.snapshot import carregar_snapshot
+    with etapa('carregar_dados') as registro:
+        df = carregar_snapshot(caminho)
+        registro['linhas'] = len(df)
+    return df
+
+# 3. Dataframe limpo compartilhado entre todas as sessões.
+#    O objeto retornado é o mesmo para todos os usuários e as suas colunas apontam para o snapshot mapeado em memória
+#    (somente leitura): as páginas apenas o filtram, e colunas derivadas por uma sessão ficam numa Sobreposicao.
+def carregar_dados(caminho=CAMINHO_DADOS):
+    return _carregar_dados(caminho, versao_dados(caminho))
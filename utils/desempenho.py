@@ -0,0 +1,227 @@
+#======================================================================================================================
+# MEDIÇÃO DE DESEMPENHO POR ETAPA
+#======================================================================================================================
+#
+# Cada execução de uma página mede o tempo, as linhas e a variação de memória de cada etapa: carga dos dados, leitura
+# e limpeza do CSV, filtros, consultas e cada análise. As etapas podem ser aninhadas (uma análise inclui as consultas
+# que ela faz), e o cache de resultados anota na análise se o resultado foi reaproveitado. Ao final da página as
+# medições aparecem no painel de desempenho da barra lateral (CURRY_PAINEL_DESEMPENHO=1) e são acrescentadas como uma
+# linha JSON ao arquivo CURRY_LOG_DESEMPENHO, de onde saem os percentis por etapa:
+#     python -m utils.desempenho [arquivo de log]
+#
+# A medição fica numa variável de contexto da thread que executa a página (uma por sessão); fora de uma página
+# (benchmarks, processos de ingestão, etapas em cache) etapa() não registra nada. A memória é o RSS do processo, que é
+# compartilhado pelas sessões, então a variação de uma etapa inclui o que outras sessões alocaram no mesmo intervalo.
+#
+# Os painéis calculados antecipadamente (utils/resultados.py) medem as suas etapas em threads do pool, na medição da
+# página. A página espera por eles antes de encerrar a medição; uma etapa que termine depois disso é descartada.
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import datetime
+import json
+import os
+import threading
+import time
+from concurrent.futures import wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import pandas as pd
+
+from utils.config import LOG_DESEMPENHO, PAINEL_DESEMPENHO
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+PERCENTIS = [0.5, 0.95]
+
+_medicao = ContextVar('medicao', default=None)
+_abertas = ContextVar('etapas_abertas', default=())
+
+_trava_log = threading.Lock()
+
+#======================================================================================================================
+# Funções Auxiliares
+#======================================================================================================================
+
+# 1. Memória residente do processo (MB), ou None fora do Linux
+def _memoria_mb():
+    try:
+        with open('/proc/self/statm') as arquivo:
+            paginas = int(arquivo.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return paginas * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+# 2. Identificador da sessão do Streamlit que executa a página, se houver
+def _sessao():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    contexto = get_script_run_ctx()
+    return contexto.session_id if contexto is not None else None
+
+#======================================================================================================================
+# Medição
+#======================================================================================================================
+
+class MedicaoPagina:
+
+    def __init__(self, pagina):
+        self.pagina = pagina
+        self.sessao = _sessao()
+        self.momento = datetime.datetime.now().isoformat(timespec='seconds')
+        self.inicio = time.perf_counter()
+        self.etapas = []
+        self.total_s = None
+        self.memoria_mb = None
+        self.pendentes = []
+        self.encerrada = False
+        self.trava = threading.Lock()
+
+    # 1. Etapa concluída: nome, nível de aninhamento, início (em relação ao início da página), tempo, variação de
+    #    memória e campos anotados (linhas, cache...). Depois de encerrada, a medição não recebe mais etapas.
+    def registrar(self, nome, nivel, inicio, tempo_s, memoria_mb, **campos):
+        with self.trava:
+            if not self.encerrada:
+                self.etapas.append({'etapa': nome, 'nivel': nivel, 'inicio_s': inicio - self.inicio,
+                                    'tempo_s': tempo_s, 'memoria_mb': memoria_mb, **campos})
+
+    # 2. Etapas agrupadas por nome, na ordem em que começaram (etapas repetidas, como os blocos do CSV, somadas)
+    def tabela(self):
+        if not self.etapas:
+            return pd.DataFrame(columns=['etapa', 'chamadas', 'tempo_s', 'memoria_mb', 'linhas', 'cache'])
+        df = pd.DataFrame(self.etapas).sort_values('inicio_s', kind='stable')
+        for col in ('linhas', 'cache'):
+            if col not in df.columns:
+                df[col] = None
+        a = df.groupby('etapa', sort=False).agg(nivel=('nivel', 'min'), chamadas=('etapa', 'size'),
+                                                tempo_s=('tempo_s', 'sum'), memoria_mb=('memoria_mb', 'sum'),
+                                                linhas=('linhas', lambda linhas: linhas.sum(min_count=1)), cache=('cache', 'last'))
+        a.index = ['  ' * nivel + etapa for etapa, nivel in zip(a.index, a['nivel'])]
+        return a.drop(columns='nivel').rename_axis('etapa').reset_index()
+
+    # 3. Linha do log: página, sessão, momento, tempo total, memória do processo ao final e cada etapa
+    def registro(self):
+        return {'momento': self.momento, 'pagina': self.pagina, 'sessao': self.sessao, 'total_s': self.total_s,
+                'memoria_mb': self.memoria_mb, 'etapas': self.etapas}
+
+# 1. Inicia a medição de uma execução da página (chamada no início de cada página)
+def iniciar_medicao(pagina):
+    medicao = MedicaoPagina(pagina)
+    _medicao.set(medicao)
+    _abertas.set(())
+    return medicao
+
+# 2. Mede o bloco (ou a função, usada como decorador) como uma etapa. O dicionário retornado pelo 'with' recebe campos
+#    a registrar junto com o tempo, como a quantidade de linhas.
+@contextmanager
+def etapa(nome):
+    medicao = _medicao.get()
+    campos = {}
+    if medicao is None:
+        yield campos
+        return
+
+    abertas = _abertas.get()
+    token = _abertas.set(abertas + (campos,))
+    memoria = _memoria_mb()
+    inicio = time.perf_counter()
+    try:
+        yield campos
+    finally:
+        tempo_s = time.perf_counter() - inicio
+        fim = _memoria_mb()
+        _abertas.reset(token)
+        medicao.registrar(nome, len(abertas), inicio, tempo_s, None if memoria is None else fim - memoria, **campos)
+
+# 3. Anota campos na etapa aberta mais interna (por exemplo, se o resultado de uma análise veio do cache)
+def anotar(**campos):
+    abertas = _abertas.get()
+    if abertas:
+        abertas[-1].update(campos)
+
+# 4. Acompanha um cálculo da página em outra thread (um painel antecipado), para que a medição espere por ele
+def acompanhar(futuro):
+    medicao = _medicao.get()
+    if medicao is not None:
+        medicao.pendentes.append(futuro)
+
+# 5. Encerra a medição da página, depois dos cálculos acompanhados que ainda estiverem em andamento (painéis
+#    antecipados e não desenhados): acrescenta a linha ao log e mostra o painel na barra lateral, se configurados
+def finalizar_medicao():
+    medicao = _medicao.get()
+    if medicao is None:
+        return None
+    wait(medicao.pendentes)
+    with medicao.trava:
+        medicao.encerrada = True
+        medicao.total_s = time.perf_counter() - medicao.inicio
+    medicao.memoria_mb = _memoria_mb()
+    _medicao.set(None)
+
+    if LOG_DESEMPENHO:
+        gravar_log(medicao.registro())
+    if PAINEL_DESEMPENHO:
+        painel_desempenho(medicao)
+    return medicao
+
+#======================================================================================================================
+# Painel e Log
+#======================================================================================================================
+
+# 1. Painel da barra lateral: tempo total, etapas da execução atual e contadores do cache de resultados
+def painel_desempenho(medicao):
+    import streamlit as st
+    from utils.resultados import cache_resultados
+
+    with st.sidebar.expander('Desempenho', expanded=False):
+        st.markdown(f'**Execução:** {medicao.total_s:.3f} s')
+        if medicao.memoria_mb is not None:
+            st.markdown(f'**Memória do processo:** {medicao.memoria_mb:.0f} MB')
+        st.dataframe(medicao.tabela().round(4), use_container_width=True)
+        cache = cache_resultados().estatisticas()
+        st.markdown(f"**Cache de resultados:** {cache['acertos']} acertos, {cache['falhas']} falhas, "
+                    f"{cache['esperas']} esperas ({cache['taxa_acerto']:.0%}), "
+                    f"{cache['itens']}/{cache['max_itens']} itens")
+
+# 2. Acrescenta uma linha JSON ao log (uma escrita por linha, em modo append, para não intercalar processos)
+def gravar_log(registro, caminho=None):
+    caminho = caminho or LOG_DESEMPENHO
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    linha = json.dumps(registro, ensure_ascii=False, default=str) + '\n'
+    with _trava_log, open(caminho, 'a', encoding='utf-8') as arquivo:
+        arquivo.write(linha)
+
+# 3. Percentis de tempo por página e etapa (e do tempo total de cada página) a partir do log
+def resumir_log(caminho=None):
+    caminho = caminho or LOG_DESEMPENHO
+    etapas = []
+    with open(caminho, encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            registro = json.loads(linha)
+            etapas.append({'pagina': registro['pagina'], 'etapa': '(total)', 'tempo_s': registro['total_s']})
+            etapas.extend({'pagina': registro['pagina'], 'etapa': e['etapa'], 'tempo_s': e['tempo_s']}
+                          for e in registro['etapas'])
+    a = pd.DataFrame(etapas).groupby(['pagina', 'etapa'])['tempo_s']
+    resumo = a.quantile(PERCENTIS).unstack()
+    resumo.columns = [f'p{int(p * 100)}_s' for p in PERCENTIS]
+    return pd.concat([a.size().rename('execucoes'), resumo], axis=1).sort_values(['pagina', 'p95_s'],
+                                                                                ascending=[True, False])
+
+#======================================================================================================================
+# Execução
+#======================================================================================================================
+
+# Percentis do log:  python -m utils.desempenho [caminho do log]
+if __name__ == '__main__':
+    import sys
+
+    caminho = sys.argv[1] if len(sys.argv) > 1 else LOG_DESEMPENHO
+    if not caminho:
+        sys.exit('Informe o arquivo de log (ou defina CURRY_LOG_DESEMPENHO).')
+    print(resumir_log(caminho).round(4).to_string())
@@ -0,0 +1,27 @@
+#======================================================================================================================
+# DISTÂNCIA ENTRE RESTAURANTES E LOCAIS DE ENTREGA
+#======================================================================================================================
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import numpy as np
+
+#======================================================================================================================
+# Funções de Distância
+#======================================================================================================================
+
+# Mesmo raio médio da Terra usado pelo pacote haversine
+RAIO_MEDIO_TERRA_KM = 6371.0088
+
+# 1. Distância de grande círculo (km) entre pares de pontos, calculada de uma vez para vetores de coordenadas em graus
+def haversine_vetorizado(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lng1, lat2, lng2))
+    d = np.sin((lat2 - lat1) * 0.5) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) * 0.5) ** 2
+    return 2 * RAIO_MEDIO_TERRA_KM * np.arcsin(np.sqrt(d))
+
+# 2. Distância entre o restaurante e o local de entrega de cada pedido
+def calcular_distancia(df):
+    return haversine_vetorizado(df['Restaurant_latitude'], df['Restaurant_longitude'],
+                                df['Delivery_location_latitude'], df['Delivery_location_longitude'])
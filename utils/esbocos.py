@@ -0,0 +1,152 @@
+#======================================================================================================================
+# ESBOÇOS PARA O MODO APROXIMADO
+#======================================================================================================================
+#
+# Resumos combináveis calculados por dia junto com o cubo, para responder qualquer recorte dos filtros sem percorrer os
+# pedidos (CURRY_MODO_APROXIMADO=1):
+#
+# - Entregadores distintos: um HyperLogLog por dia e tráfego (2^PRECISAO_HLL registradores com a maior posição do
+#   primeiro bit 1 do hash de cada entregador). Registradores de dias diferentes são combinados pelo máximo, então a
+#   contagem de qualquer período (ou de cada semana) sai dos registradores dos dias filtrados. O erro relativo padrão é
+#   1,04 / sqrt(2^PRECISAO_HLL), 1,6% com 4096 registradores: cerca de 95% das estimativas ficam a até 3,3% do valor
+#   exato. Abaixo de 2,5 x 4096 entregadores a estimativa usa a contagem linear dos registradores vazios, mais
+#   precisa (erro padrão em torno de 1,1% nessa faixa).
+#
+# - Tempo de entrega e avaliação: histogramas de classes fixas por dia, cidade e tráfego, combinados pela soma. Os
+#   percentis (p50, p90 e p99) são interpolados entre as observações vizinhas da posição do percentil, como no pandas,
+#   com cada observação representada pelo centro da sua classe. O erro é de no máximo meia largura de classe (0,5 min e
+#   0,05 ponto); como os tempos são minutos inteiros e as avaliações têm uma casa decimal, os valores caem exatamente
+#   nos centros e os percentis aproximados são iguais aos exatos. Valores fora da faixa das classes entram na primeira
+#   ou na última classe.
+#
+# Os esboços ficam em formato longo (uma linha por registrador ou classe não vazia), como o cubo, e são guardados no
+# snapshot.
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from utils.esquema import concatenar_tipados, para_float64
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+DIMENSOES_DISTINTOS = ['Order_Date', 'Road_traffic_density']
+
+DIMENSOES_HISTOGRAMAS = ['Order_Date', 'City', 'Road_traffic_density']
+
+# HyperLogLog: bits do hash que escolhem o registrador (4096 registradores) e erro relativo padrão da estimativa
+PRECISAO_HLL = 12
+REGISTRADORES_HLL = 1 << PRECISAO_HLL
+ERRO_HLL = 1.04 / math.sqrt(REGISTRADORES_HLL)
+
+# Histogramas de cada medida: coluna, centro da primeira classe, largura e quantidade de classes
+CLASSES = {
+    'tempo': ('Time_taken(min)', 0.0, 1.0, 241),
+    'avaliacao': ('Delivery_person_Ratings', 0.0, 0.1, 101),
+}
+
+PERCENTIS = [0.5, 0.9, 0.99]
+
+#======================================================================================================================
+# HyperLogLog
+#======================================================================================================================
+
+# 1. Registrador e posição do primeiro bit 1 (contada a partir de 1) do hash de 64 bits de cada valor. Os bits após o
+#    registrador (52) cabem exatamente num float64, então o frexp dá a quantidade de bits significativos sem erro.
+def _posicoes_hll(valores):
+    h = pd.util.hash_pandas_object(valores, index=False).to_numpy()
+    bits_restantes = 64 - PRECISAO_HLL
+    registrador = (h >> np.uint64(bits_restantes)).astype('int16')
+    _, bits = np.frexp((h & np.uint64((1 << bits_restantes) - 1)).astype('float64'))
+    return registrador, (bits_restantes - bits + 1).astype('int8')
+
+# 2. Registradores não vazios de cada dia e tráfego
+def construir_distintos(df):
+    registrador, posicao = _posicoes_hll(df['Delivery_person_ID'])
+    return _maximos(df[DIMENSOES_DISTINTOS].assign(registrador=registrador, posicao=posicao))
+
+def combinar_distintos(partes):
+    return _maximos(concatenar_tipados(partes))
+
+def _maximos(a):
+    a = a.groupby(DIMENSOES_DISTINTOS + ['registrador'], observed=True)['posicao'].max().sort_index().reset_index()
+    return a.astype({'registrador': 'int16'})
+
+# 3. Estimativa da quantidade de distintos a partir dos registradores (uma linha por grupo)
+def estimar_hll(registradores):
+    m = REGISTRADORES_HLL
+    alfa = 0.7213 / (1 + 1.079 / m)
+    estimativa = alfa * m * m / np.sum(np.exp2(-registradores.astype('float64')), axis=1)
+    vazios = np.sum(registradores == 0, axis=1)
+    with np.errstate(divide='ignore'):
+        linear = m * np.log(m / vazios)
+    return np.where((estimativa <= 2.5 * m) & (vazios > 0), linear, estimativa)
+
+# 4. Entregadores distintos estimados a partir dos registradores já filtrados: no total ou por 'grupos' (uma chave
+#    por linha dos registradores, por exemplo a semana do ano de cada dia), em ordem de grupo
+def contar_distintos(distintos, grupos=None):
+    if grupos is None:
+        chaves, codigos = [None], np.zeros(len(distintos), dtype='int64')
+    else:
+        chaves, codigos = np.unique(np.asarray(grupos), return_inverse=True)
+
+    # Maior posição de cada registrador de cada grupo: grupo, registrador e posição (menor que 64) ordenados numa
+    # chave só, ficando a última chave de cada par de grupo e registrador
+    celulas = codigos * REGISTRADORES_HLL + distintos['registrador'].to_numpy()
+    ordenadas = np.sort(celulas * 64 + distintos['posicao'].to_numpy())
+    ultimas = ordenadas[np.diff(ordenadas // 64, append=-1) != 0]
+    registradores = np.zeros((len(chaves), REGISTRADORES_HLL), dtype='int8')
+    registradores.flat[ultimas // 64] = ultimas % 64
+    estimativas = estimar_hll(registradores)
+    return estimativas[0] if grupos is None else pd.Series(estimativas, index=chaves)
+
+#======================================================================================================================
+# Histogramas
+#======================================================================================================================
+
+# 1. Quantidade de pedidos em cada classe não vazia, por dia, cidade, tráfego e medida
+def construir_histogramas(df):
+    partes = []
+    for medida, (coluna, inicio, largura, classes) in CLASSES.items():
+        classe = np.clip(np.rint((para_float64(df[coluna]).to_numpy() - inicio) / largura), 0, classes - 1)
+        aux = df[DIMENSOES_HISTOGRAMAS].assign(classe=classe, qtd=1)[~np.isnan(classe)]
+        a = aux.astype({'classe': 'int16'}).groupby(DIMENSOES_HISTOGRAMAS + ['classe'], observed=True)['qtd'].sum()
+        partes.append(a.reset_index().assign(medida=medida))
+    return _ordenar_histogramas(concatenar_tipados(partes))
+
+def combinar_histogramas(partes):
+    a = concatenar_tipados(partes).groupby(DIMENSOES_HISTOGRAMAS + ['medida', 'classe'], observed=True)['qtd'].sum()
+    return _ordenar_histogramas(a.reset_index())
+
+def _ordenar_histogramas(a):
+    a = a.astype({'medida': 'category'})
+    return a[DIMENSOES_HISTOGRAMAS + ['medida', 'classe', 'qtd']] \
+        .sort_values(DIMENSOES_HISTOGRAMAS + ['medida', 'classe'], kind='stable', ignore_index=True)
+
+# 2. Percentis de uma medida por dimensões, a partir dos histogramas já filtrados, no formato dos percentis exatos
+#    (dimensões e uma coluna por percentil)
+def percentis_histogramas(histogramas, dimensoes, medida, percentis=PERCENTIS):
+    _, inicio, largura, _ = CLASSES[medida]
+    a = histogramas.loc[histogramas['medida'] == medida]
+    contagens = a.groupby(dimensoes + ['classe'], observed=True)['qtd'].sum().sort_index()
+
+    linhas = []
+    for chave, grupo in contagens.groupby(level=list(range(len(dimensoes))), observed=True, sort=False):
+        valores = inicio + largura * grupo.index.get_level_values('classe').to_numpy()
+        acumulado = np.cumsum(grupo.to_numpy())
+        posicoes = np.array(percentis) * (acumulado[-1] - 1)
+        abaixo = valores[np.searchsorted(acumulado, np.floor(posicoes), side='right')]
+        acima = valores[np.searchsorted(acumulado, np.ceil(posicoes), side='right')]
+        linhas.append((*np.atleast_1d(chave), *(abaixo + (posicoes - np.floor(posicoes)) * (acima - abaixo))))
+    return pd.DataFrame(linhas, columns=dimensoes + nomes_percentis(percentis))
+
+# 3. Nomes das colunas dos percentis (p50, p90, p99)
+def nomes_percentis(percentis=PERCENTIS):
+    return [f'p{round(p * 100)}' for p in percentis]
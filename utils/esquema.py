@@ -0,0 +1,101 @@
+#======================================================================================================================
+# ESQUEMA DO DATAFRAME LIMPO
+#======================================================================================================================
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from utils.config import ESQUEMA_COMPACTO
+
+#======================================================================================================================
+# Tipos das Colunas
+#======================================================================================================================
+
+COLUNAS_CATEGORICAS = ['City', 'Road_traffic_density', 'Weatherconditions']
+COLUNAS_FLOAT32 = ['Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude']
+
+# Esquema compacto: demais textos repetidos como categóricas (IDs dos entregadores codificados por dicionário),
+# inteiros no menor tipo que comporta os valores e avaliações em float32
+COLUNAS_CATEGORICAS_COMPACTAS = ['Delivery_person_ID', 'Time_Orderd', 'Time_Order_picked', 'Type_of_order',
+                                 'Type_of_vehicle', 'Festival']
+COLUNAS_INT_COMPACTAS = ['Delivery_person_Age', 'Vehicle_condition', 'multiple_deliveries', 'Time_taken(min)',
+                         'ISO_Year', 'Week_of_Year', 'Weekday', 'Day_of_Month']
+COLUNAS_FLOAT32_COMPACTAS = ['Delivery_person_Ratings']
+
+# Casas decimais recuperadas ao voltar de float32 para float64 (float32 guarda cerca de 7 dígitos significativos)
+DECIMAIS_FLOAT32 = 6
+
+# 1. Aplica os tipos do esquema ao Dataframe limpo (categóricas para as dimensões e float32 para as coordenadas).
+#    Agrupamentos sobre colunas categóricas devem usar observed=True para não gerar combinações sem pedidos.
+def tipar_dados(df, compacto=ESQUEMA_COMPACTO):
+    categoricas, floats32 = COLUNAS_CATEGORICAS, COLUNAS_FLOAT32
+    if compacto:
+        categoricas = categoricas + COLUNAS_CATEGORICAS_COMPACTAS
+        floats32 = floats32 + COLUNAS_FLOAT32_COMPACTAS
+
+    tipos = {**dict.fromkeys(categoricas, 'category'), **dict.fromkeys(floats32, 'float32')}
+    tipos = {col: tipo for col, tipo in tipos.items() if col in df.columns and df[col].dtype != tipo}
+    df = df.astype(tipos) if tipos else df
+
+    if compacto:
+        for col in COLUNAS_INT_COMPACTAS:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+# 2. Concatena partes já tipadas (por exemplo, blocos da leitura em blocos) unindo as categorias de cada coluna, em
+#    ordem alfabética como no astype('category'); sem isso colunas com categorias diferentes virariam texto
+def concatenar_tipados(partes):
+    partes = list(partes)
+    if len(partes) == 1:
+        return partes[0]
+    colunas = {}
+    for col in partes[0].columns:
+        if isinstance(partes[0][col].dtype, pd.CategoricalDtype):
+            colunas[col] = union_categoricals([parte[col] for parte in partes], sort_categories=True)
+        else:
+            colunas[col] = pd.concat([parte[col] for parte in partes], ignore_index=True).array     # mantém o tipo
+    indice = partes[0].index.append([parte.index for parte in partes[1:]])
+    return pd.DataFrame(colunas, index=indice)
+
+# 3. Coluna float32 de volta em float64 com os valores decimais originais (4.9 e não 4.900000095...), para que médias
+#    e arredondamentos exibidos no dashboard não mudem com o esquema compacto
+def para_float64(serie):
+    if serie.dtype == np.float32:
+        return serie.astype('float64').round(DECIMAIS_FLOAT32)
+    return serie.astype('float64')
+
+#======================================================================================================================
+# Relatório de Memória
+#======================================================================================================================
+
+# 1. Memória de cada coluna (em bytes, incluindo o conteúdo dos textos) nos dois esquemas
+def relatorio_memoria(padrao, compacto):
+    relatorio = pd.DataFrame({
+        'tipo_padrao': padrao.dtypes.astype(str),
+        'bytes_padrao': padrao.memory_usage(deep=True, index=False),
+        'tipo_compacto': compacto.dtypes.astype(str),
+        'bytes_compacto': compacto.memory_usage(deep=True, index=False),
+    })
+    relatorio.loc['Total'] = ['', relatorio['bytes_padrao'].sum(), '', relatorio['bytes_compacto'].sum()]
+    relatorio['reducao'] = (relatorio['bytes_padrao'] / relatorio['bytes_compacto']).astype(float).round(1)
+    return relatorio
+
+#======================================================================================================================
+# Execução
+#======================================================================================================================
+
+# Relatório do dataset atual:  python -m utils.esquema [caminho do CSV]
+if __name__ == '__main__':
+    import sys
+
+    from utils.dados import CAMINHO_DADOS, enriquecer_dados, ler_csv, limpar_dados
+
+    limpo, _ = limpar_dados(ler_csv(sys.argv[1] if len(sys.argv) > 1 else CAMINHO_DADOS))
+    limpo = enriquecer_dados(limpo)
+    print(relatorio_memoria(limpo, tipar_dados(limpo.copy(), compacto=True)).to_string())
@@ -0,0 +1,78 @@
+#======================================================================================================================
+# ÍNDICE PARA OS FILTROS DA BARRA LATERAL
+#======================================================================================================================
+#
+# Os pedidos ficam ordenados por data, então o filtro "até a data" vira uma busca binária seguida de um fatiamento
+# sem cópia. Cada valor das colunas categóricas filtráveis tem uma máscara pré-calculada, e a seleção de vários valores
+# no multiselect é o OU entre as máscaras desses valores.
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import numpy as np
+import streamlit as st
+
+from utils.dados import CAMINHO_DADOS, carregar_dados, versao_dados
+from utils.desempenho import etapa
+
+#======================================================================================================================
+# Índice
+#======================================================================================================================
+
+class IndiceFiltros:
+
+    def __init__(self, df, colunas_mascaras=('Road_traffic_density',)):
+        if not df['Order_Date'].is_monotonic_increasing:
+            df = df.take(np.argsort(df['Order_Date'].to_numpy(), kind='stable'))
+        self.df = df
+        self.datas = df['Order_Date'].to_numpy()
+
+        # Uma máscara booleana por valor de cada coluna
+        self.mascaras = {}
+        for col in colunas_mascaras:
+            valores = df[col].to_numpy()
+            self.mascaras[col] = {valor: valores == valor for valor in df[col].unique()}
+
+    # 1. Quantidade de linhas com data anterior à data limite (busca binária)
+    def fim_data(self, data_limite):
+        return int(np.searchsorted(self.datas, np.datetime64(data_limite, 'ns'), side='left'))
+
+    # 2. Máscara das linhas cujo valor da coluna está entre os selecionados, ou None se todos os valores foram escolhidos
+    def mascara(self, coluna, selecionados):
+        mascaras = self.mascaras[coluna]
+        selecionados = [valor for valor in selecionados if valor in mascaras]
+        if len(selecionados) == len(mascaras):
+            return None
+        if not selecionados:
+            return np.zeros(len(self.df), dtype=bool)
+        return np.logical_or.reduce([mascaras[valor] for valor in selecionados])
+
+    # 3. Pedidos anteriores à data limite e com o tráfego selecionado.
+    #    Com todos os tipos de tráfego selecionados o resultado é uma fatia do Dataframe compartilhado, sem cópia, e não
+    #    deve ser alterado. Passar 'colunas' limita a cópia feita pelo filtro de tráfego às colunas necessárias.
+    def filtrar(self, data_limite, trafego, colunas=None):
+        fim = self.fim_data(data_limite)
+        df = self.df.iloc[:fim]
+        if colunas is not None:
+            df = df[colunas]
+        mascara = self.mascara('Road_traffic_density', trafego)
+        if mascara is None:
+            return df
+        return df.loc[mascara[:fim]]
+
+#======================================================================================================================
+# Carregamento do Índice
+#======================================================================================================================
+
+@st.cache_resource(max_entries=1, show_spinner='Indexando pedidos...')
+def _carregar_indice(caminho, versao):
+    df = carregar_dados(caminho)
+    with etapa('carregar_indice') as registro:
+        indice = IndiceFiltros(df)
+        registro['linhas'] = len(df)
+    return indice
+
+# 1. Índice do dataset completo, compartilhado entre as sessões e refeito quando o arquivo de dados muda
+def carregar_indice(caminho=CAMINHO_DADOS):
+    return _carregar_indice(caminho, versao_dados(caminho))
@@ -0,0 +1,163 @@
+#======================================================================================================================
+# LEITURA EM BLOCOS DO CSV DE PEDIDOS
+#======================================================================================================================
+#
+# O CSV é lido LINHAS_POR_BLOCO linhas por vez. Cada bloco passa pela mesma limpeza, pelas mesmas colunas derivadas e
+# pelo mesmo esquema do caminho em memória e só então o texto bruto é descartado; apenas os blocos já tipados (bem
+# menores) ficam em memória até a concatenação. O cubo de indicadores, os entregadores por dia, os esboços do modo
+# aproximado e as linhas rejeitadas são acumulados bloco a bloco e combinados ao final.
+#
+# Com PROCESSOS > 1, o arquivo é dividido em partições de bytes terminadas em quebra de linha (o CSV não tem campos
+# com quebras de linha entre aspas), e cada partição é lida, limpa e agregada por um processo. As partições são
+# combinadas na ordem do arquivo, com os rótulos das linhas deslocados pela quantidade de linhas das partições
+# anteriores, então o resultado é idêntico ao da leitura serial.
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.config import LINHAS_POR_BLOCO, PROCESSOS
+from utils.cubo import combinar_cubos, combinar_entregadores, construir_cubo, construir_entregadores
+from utils.dados import enriquecer_dados, ler_csv, limpar_dados
+from utils.desempenho import etapa
+from utils.esbocos import combinar_distintos, combinar_histogramas, construir_distintos, construir_histogramas
+from utils.esquema import concatenar_tipados, tipar_dados
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+# Tamanho mínimo de cada partição: arquivos pequenos não compensam o custo de iniciar os processos
+BYTES_MINIMOS_POR_PARTICAO = 32 << 20
+
+# Agregados calculados em cada bloco: função de construção e de combinação de partes disjuntas dos pedidos
+TABELAS = {
+    'cubo': (construir_cubo, combinar_cubos),
+    'entregadores': (construir_entregadores, combinar_entregadores),
+    'distintos': (construir_distintos, combinar_distintos),
+    'histogramas': (construir_histogramas, combinar_histogramas),
+}
+
+#======================================================================================================================
+# Agregados Combináveis
+#======================================================================================================================
+
+class Agregados:
+
+    def __init__(self):
+        self.tabelas = None                         # {nome: Dataframe}, com os nomes de TABELAS
+        self.rejeitadas = None
+        self.linhas = 0
+
+    # 1. Acumula um bloco limpo e as linhas rejeitadas na sua limpeza
+    def adicionar(self, bloco, rejeitadas):
+        self.combinar_com({nome: construir(bloco) for nome, (construir, _) in TABELAS.items()}, rejeitadas,
+                          len(bloco))
+
+    # 2. Soma agregados calculados sobre outra parte dos pedidos
+    def combinar_com(self, tabelas, rejeitadas, linhas):
+        if self.tabelas is None:
+            self.tabelas, self.rejeitadas = tabelas, rejeitadas
+        else:
+            self.tabelas = {nome: combinar([self.tabelas[nome], tabelas[nome]])
+                            for nome, (_, combinar) in TABELAS.items()}
+            self.rejeitadas = self.rejeitadas.add(rejeitadas, fill_value=0).astype('int64')
+        self.linhas += linhas
+
+#======================================================================================================================
+# Leitura em Blocos
+#======================================================================================================================
+
+# 1. Blocos do CSV (caminho ou arquivo aberto) limpos, com as colunas derivadas e os tipos do esquema, e as linhas
+#    rejeitadas em cada um
+#    A leitura e a limpeza de cada bloco são medidas como etapas separadas.
+def ler_blocos(origem, linhas_por_bloco=LINHAS_POR_BLOCO, **kwargs):
+    leitor = iter(ler_csv(origem, chunksize=linhas_por_bloco, **kwargs))
+    while True:
+        with etapa('leitura_csv') as registro:
+            bruto = next(leitor, None)
+            registro['linhas'] = 0 if bruto is None else len(bruto)
+        if bruto is None:
+            return
+        with etapa('limpeza') as registro:
+            df, rejeitadas = limpar_dados(bruto)
+            del bruto
+            df = tipar_dados(enriquecer_dados(df))
+            registro['linhas'] = len(df)
+        yield df, rejeitadas
+
+# 2. Blocos limpos e agregados de um CSV (ou de uma partição dele), sem ordenar
+def _ingerir_blocos(origem, linhas_por_bloco, **kwargs):
+    blocos, agregados = [], Agregados()
+    for bloco, rejeitadas in ler_blocos(origem, linhas_por_bloco, **kwargs):
+        agregados.adicionar(bloco, rejeitadas)
+        blocos.append(bloco)
+    return concatenar_tipados(blocos), agregados
+
+# 3. Partições de bytes [inicio, fim) das linhas de dados, cada uma terminando numa quebra de linha
+def particionar(caminho, particoes):
+    tamanho = os.path.getsize(caminho)
+    with open(caminho, 'rb') as arquivo:
+        arquivo.readline()
+        limites = [arquivo.tell()]
+        for i in range(1, particoes):
+            arquivo.seek(max(limites[-1], tamanho * i // particoes))
+            arquivo.readline()
+            limites.append(min(arquivo.tell(), tamanho))
+    limites.append(tamanho)
+    return [(inicio, fim) for inicio, fim in zip(limites, limites[1:]) if fim > inicio]
+
+# 4. Arquivo aberto que só enxerga os bytes até 'fim', para ler uma partição em blocos sem carregá-la inteira
+class _Intervalo(io.RawIOBase):
+
+    def __init__(self, arquivo, fim):
+        self.arquivo = arquivo
+        self.fim = fim
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        dados = self.arquivo.read(max(min(len(destino), self.fim - self.arquivo.tell()), 0))
+        destino[:len(dados)] = dados
+        return len(dados)
+
+# 5. Executada em outro processo: lê, limpa e agrega uma partição
+def _processar_particao(caminho, inicio, fim, linhas_por_bloco):
+    with open(caminho, 'rb') as arquivo:
+        colunas = arquivo.readline().decode().rstrip('\r\n').split(',')
+        arquivo.seek(inicio)
+        return _ingerir_blocos(io.BufferedReader(_Intervalo(arquivo, fim)), linhas_por_bloco,
+                               header=None, names=colunas)
+
+# 6. Leitura das partições em paralelo e combinação na ordem do arquivo. As linhas brutas de cada partição (mantidas
+#    mais rejeitadas) deslocam os rótulos das linhas das partições seguintes.
+def _ingerir_em_paralelo(caminho, linhas_por_bloco, processos):
+    intervalos = particionar(caminho, processos)
+    contexto = multiprocessing.get_context('spawn')               # sem fork de um servidor com várias threads
+    with ProcessPoolExecutor(max_workers=len(intervalos), mp_context=contexto) as executor:
+        futuros = [executor.submit(_processar_particao, caminho, inicio, fim, linhas_por_bloco)
+                   for inicio, fim in intervalos]
+        partes, agregados, deslocamento = [], Agregados(), 0
+        for futuro in futuros:
+            df, parcial = futuro.result()
+            df.index = df.index + deslocamento
+            deslocamento += parcial.linhas + int(parcial.rejeitadas['Total'])
+            partes.append(df)
+            agregados.combinar_com(parcial.tabelas, parcial.rejeitadas, parcial.linhas)
+    return concatenar_tipados(partes), agregados
+
+# 7. Dataframe limpo e ordenado por data (igual ao de preparar_dados) e agregados do CSV inteiro, lido por
+#    'processos' processos quando o arquivo é grande o bastante
+def ingerir(caminho, linhas_por_bloco=LINHAS_POR_BLOCO, processos=PROCESSOS):
+    processos = min(processos, os.path.getsize(caminho) // BYTES_MINIMOS_POR_PARTICAO)
+    if processos > 1:
+        df, agregados = _ingerir_em_paralelo(caminho, linhas_por_bloco, processos)
+    else:
+        df, agregados = _ingerir_blocos(caminho, linhas_por_bloco)
+    return df.sort_values('Order_Date', kind='stable'), agregados
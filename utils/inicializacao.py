@@ -0,0 +1,192 @@
+#======================================================================================================================
+# INICIALIZAÇÃO DO SERVIDOR
+#======================================================================================================================
+#
+# Reduz o tempo até a primeira página: as bibliotecas de gráficos são importadas no primeiro uso, a logomarca é lida e
+# redimensionada uma vez por processo e os caches compartilhados (dados, cubo, índice, camada geográfica e os
+# resultados das páginas com os filtros padrão) podem ser aquecidos antes de o servidor aceitar a primeira sessão.
+#
+# O aquecimento roda no mesmo processo do servidor, numa thread com um contexto de execução do Streamlit (sem ele os
+# caches do Streamlit não guardam nada). Os caches de recursos e o cache de resultados continuam valendo depois que o
+# servidor inicia; o HTML do mapa (cache de dados) é refeito na primeira visita à seção geográfica.
+#
+# Uso (a partir da raiz do projeto):
+#     python -m utils.inicializacao servidor [-- opções do streamlit run]     # aquece os caches e inicia o servidor
+#     python -m utils.inicializacao perfil                                    # tempo de importação de cada página
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import importlib
+import io
+import os
+import re
+import runpy
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from utils.config import BACKEND
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CAMINHO_LOGO = 'logo.png'
+LARGURA_LOGO = 250
+
+PAGINA_INICIAL = 'Home.py'
+PAGINAS = [os.path.join('pages', pagina) for pagina in
+           ('1_visao_empresa.py', '2_visao_entregadores.py', '3_visao_restaurantes.py')]
+
+# Pacotes listados no perfil de importação de cada página
+MODULOS_PERFIL = 15
+
+#======================================================================================================================
+# Importações Sob Demanda
+#======================================================================================================================
+
+# Módulo importado apenas no primeiro acesso a um atributo (por exemplo px.bar), para que páginas ou seções que não
+# desenham gráficos não paguem a importação
+class ModuloSobDemanda:
+
+    def __init__(self, nome):
+        self._nome = nome
+        self._modulo = None
+
+    def __getattr__(self, atributo):
+        if self._modulo is None:
+            self._modulo = importlib.import_module(self._nome)
+        return getattr(self._modulo, atributo)
+
+#======================================================================================================================
+# Logomarca
+#======================================================================================================================
+
+# PNG da logomarca já na largura da barra lateral, gerado uma vez por processo. Sem isso o st.image decodifica,
+# redimensiona e codifica de novo a imagem original (1000 px) a cada execução de cada página.
+@st.cache_resource(show_spinner=False)
+def carregar_logo(caminho=CAMINHO_LOGO, largura=LARGURA_LOGO):
+    from PIL import Image
+
+    imagem = Image.open(caminho)
+    if imagem.width > largura:                                          # mesmo redimensionamento feito pelo st.image
+        imagem = imagem.resize((largura, int(1.0 * imagem.height * largura / imagem.width)), resample=Image.BILINEAR)
+    saida = io.BytesIO()
+    imagem.save(saida, format='PNG')
+    return saida.getvalue()
+
+#======================================================================================================================
+# Aquecimento
+#======================================================================================================================
+
+# 1. Contexto de execução de script para a thread atual, como o criado pelo servidor para cada sessão, que descarta as
+#    mensagens enviadas ao navegador
+def contexto_streamlit(sessao='local'):
+    from streamlit.runtime.scriptrunner import ScriptRunContext, add_script_run_ctx
+    from streamlit.runtime.state import SafeSessionState, SessionState
+    from streamlit.runtime.uploaded_file_manager import UploadedFileManager
+
+    contexto = ScriptRunContext(session_id=sessao, _enqueue=lambda mensagem: None, query_string='',
+                                session_state=SafeSessionState(SessionState()),
+                                uploaded_file_mgr=UploadedFileManager(), page_script_hash='',
+                                user_info={'email': f'{sessao}@localhost'})
+    add_script_run_ctx(threading.current_thread(), contexto)
+    return contexto
+
+# 2. Carrega os dados e os agregados compartilhados e executa cada página com os filtros padrão, preenchendo o cache
+#    de resultados. Roda numa thread própria, para que o contexto de execução não fique na thread do servidor.
+def aquecer(paginas=PAGINAS, caminho=None):
+    from utils.cubo import carregar_cubo
+    from utils.dados import CAMINHO_DADOS
+    from utils.mapa import carregar_geo
+
+    caminho = caminho or CAMINHO_DADOS
+
+    def executar():
+        contexto = contexto_streamlit('aquecimento')
+        carregar_logo()
+        if BACKEND == 'sqlite':
+            from utils.banco import carregar_banco
+            carregar_banco(caminho)
+        else:
+            from utils.filtros import carregar_indice
+            carregar_indice(caminho)                                    # carrega também o Dataframe limpo
+        carregar_cubo(caminho)
+        carregar_geo(caminho)
+        for pagina in paginas:
+            contexto.reset()
+            runpy.run_path(pagina, run_name='__main__')
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(executar).result()
+
+# 3. Aquece os caches (opcional) e inicia o servidor do Streamlit no mesmo processo
+def iniciar_servidor(argumentos=(), aquecimento=True):
+    if aquecimento:
+        print('Aquecendo os caches...', flush=True)
+        aquecer()
+    from streamlit.web import cli
+    cli.main(['run', PAGINA_INICIAL, *argumentos], prog_name='streamlit')
+
+#======================================================================================================================
+# Perfil de Importação
+#======================================================================================================================
+
+LINHA_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# 1. Executa a página num processo novo com -X importtime e retorna o tempo acumulado (s) das importações feitas
+#    diretamente por ela (as de primeiro nível, inclusive as feitas sob demanda durante a execução), somado por pacote,
+#    do maior para o menor
+def perfil_importacao(pagina):
+    ambiente = {**os.environ, 'PYTHONPATH': RAIZ}
+    processo = subprocess.run([sys.executable, '-X', 'importtime', pagina], cwd=RAIZ, env=ambiente,
+                              capture_output=True, text=True)
+    pacotes = {}
+    for linha in processo.stderr.splitlines():
+        encontrado = LINHA_IMPORTTIME.match(linha)
+        if encontrado and len(encontrado.group(3)) == 1:
+            pacote = encontrado.group(4).split('.')[0]
+            pacotes[pacote] = pacotes.get(pacote, 0) + int(encontrado.group(2)) / 1e6
+    return sorted(pacotes.items(), key=lambda pacote: pacote[1], reverse=True)
+
+# 2. Relatório do perfil de importação de cada página
+def relatorio_importacao(paginas=(PAGINA_INICIAL, *PAGINAS), quantidade=MODULOS_PERFIL):
+    for pagina in paginas:
+        modulos = perfil_importacao(pagina)
+        print(f'\n{pagina}: {sum(tempo for _, tempo in modulos):.3f} s em importações')
+        for nome, tempo in modulos[:quantidade]:
+            print(f'    {tempo:8.3f} s  {nome}')
+
+#======================================================================================================================
+# Execução
+#======================================================================================================================
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Inicialização do dashboard.')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    servidor = comandos.add_parser('servidor', help='aquece os caches e inicia o servidor do Streamlit')
+    servidor.add_argument('--sem-aquecimento', action='store_true', help='inicia o servidor sem aquecer os caches')
+    servidor.add_argument('argumentos', nargs=argparse.REMAINDER, help='opções repassadas ao streamlit run')
+    perfil = comandos.add_parser('perfil', help='tempo de importação dos pacotes de cada página')
+    perfil.add_argument('paginas', nargs='*', default=[PAGINA_INICIAL, *PAGINAS])
+    perfil.add_argument('--quantidade', type=int, default=MODULOS_PERFIL, help='pacotes listados por página')
+    args = parser.parse_args()
+
+    os.chdir(RAIZ)
+    if args.comando == 'servidor':
+        argumentos = [argumento for argumento in args.argumentos if argumento != '--']
+        iniciar_servidor(argumentos, aquecimento=not args.sem_aquecimento)
+    else:
+        relatorio_importacao(args.paginas, args.quantidade)
+
+if __name__ == '__main__':
+    main()
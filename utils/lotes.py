@@ -0,0 +1,221 @@
+#======================================================================================================================
+# ACRÉSCIMO INCREMENTAL DE LOTES DE PEDIDOS
+#======================================================================================================================
+#
+# Novos pedidos chegam em lotes no formato do train.csv. Cada lote passa pela mesma leitura em blocos, limpeza, colunas
+# derivadas e esquema do CSV principal, mas sozinho: o custo do acréscimo depende do tamanho do lote e dos agregados
+# (por dia), e não da quantidade de pedidos já carregados.
+#
+# - O CSV bruto do lote é guardado em dataset/train.lotes/ (lote_000001.csv, lote_000002.csv...), para que uma
+#   reconstrução completa do snapshot (CSV principal alterado, nova versão do esquema) refaça os mesmos pedidos.
+# - Os pedidos limpos do lote são gravados ao lado (lote_000001.feather) e unidos ao Dataframe do snapshot na leitura.
+# - O cubo, as estatísticas por entregador e os esboços do lote são gravados à parte (lote_000001.cubo.feather...), sem
+#   ler nem tocar nos agregados em uso, e combinados com os do snapshot na leitura, como os blocos da ingestão.
+# - No backend SQLite, os pedidos do lote são inseridos no banco existente, numa transação que também registra a
+#   quantidade de lotes; um banco à frente dos metadados deixa de ser válido e é refeito.
+# - Os metadados do snapshot, com a lista de lotes, são gravados por último, com uma única troca de arquivo
+#   (os.replace): é o ponto em que o lote passa a existir. Uma interrupção antes disso deixa o dataset
+#   como estava; os arquivos já gravados do lote são sobrescritos no próximo acréscimo. O CSV bruto fica com um nome
+#   provisório (lote_000001.csv.pendente) até depois dos metadados, e a movimentação para o nome definitivo é concluída
+#   por quem encontrar o lote nos metadados sem ele (utils.snapshot.snapshot_valido).
+# - A quantidade de lotes faz parte da versão dos dados (utils.dados.versao_dados), então os caches de dados,
+#   agregados, índice, banco e resultados são refeitos apenas quando um lote entra.
+#
+# Um processo por vez deve acrescentar lotes. O acréscimo custa o mesmo com qualquer histórico, mas cada processo do
+# servidor recarrega os dados na nova versão: os lotes unidos na leitura custam uma cópia das colunas, e os seus
+# agregados, um reagrupamento dos agregados do snapshot. A compactação regrava o snapshot e os agregados com eles
+# (custo proporcional ao dataset inteiro, fora do horário de uso), numa nova geração (compactacao_000002.feather,
+# compactacao_000002.cubo.feather...) indicada nos metadados, e volta à leitura sem cópia nem reagrupamento.
+#
+# Uso (a partir da raiz do projeto):
+#     python -m utils.lotes acrescentar novos_pedidos.csv       # limpa o lote e o acrescenta ao dataset
+#     python -m utils.lotes compactar                           # regrava o snapshot com os lotes acrescentados
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import os
+import re
+import shutil
+
+from utils.config import LINHAS_POR_BLOCO
+from utils.dados import CAMINHO_DADOS
+from utils.desempenho import etapa
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+PADRAO_LOTE = re.compile(r'^(lote_\d{6})\.csv$')
+PADRAO_GERACAO = re.compile(r'^(compactacao_\d{6})\.(\w+)\.feather$')
+PADRAO_LIMPO = re.compile(r'^(lote_\d{6})\.(?:\w+\.)?feather$')
+
+#======================================================================================================================
+# Arquivos dos Lotes
+#======================================================================================================================
+
+# 1. Pasta dos lotes do CSV e caminho de um arquivo de um lote ('.csv' bruto, '.feather' limpo ou '.cubo.feather' e
+#    demais agregados)
+def caminho_lotes(caminho_csv):
+    return os.path.splitext(caminho_csv)[0] + '.lotes'
+
+def caminho_lote(caminho_csv, lote, extensao):
+    return os.path.join(caminho_lotes(caminho_csv), lote + extensao)
+
+# 2. Lotes com o CSV bruto gravado, em ordem de chegada
+def lotes_gravados(caminho_csv):
+    try:
+        arquivos = os.listdir(caminho_lotes(caminho_csv))
+    except FileNotFoundError:
+        return []
+    return sorted(encontrado.group(1) for encontrado in map(PADRAO_LOTE.match, arquivos) if encontrado)
+
+# 3. Move para o nome definitivo o CSV bruto dos lotes registrados nos metadados que ainda estiverem com o nome
+#    provisório (acréscimo interrompido, ou em andamento, depois da gravação dos metadados)
+def concluir_lotes(caminho_csv, lotes):
+    for lote in lotes:
+        bruto = caminho_lote(caminho_csv, lote, '.csv')
+        try:
+            os.replace(bruto + '.pendente', bruto)
+        except FileNotFoundError:
+            pass
+
+# 4. Arquivo de uma geração do snapshot ('snapshot') ou de um agregado, gravada pela compactação e nomeada pela
+#    quantidade de lotes que contém
+def nome_geracao(lotes):
+    return f'compactacao_{lotes:06d}'
+
+def caminho_geracao(caminho_csv, geracao, nome):
+    return caminho_lote(caminho_csv, geracao, f'.{nome}.feather')
+
+# 5. Remove os arquivos que os metadados não indicam mais: gerações substituídas (ou gravadas por uma compactação
+#    interrompida) e os pedidos limpos e agregados dos lotes já contidos no snapshot. Quem já abriu um deles continua
+#    lendo o arquivo mapeado em memória.
+def remover_arquivos_antigos(caminho_csv):
+    from utils.snapshot import ler_metadados
+
+    meta = ler_metadados(caminho_csv)
+    try:
+        arquivos = os.listdir(caminho_lotes(caminho_csv))
+    except FileNotFoundError:
+        return
+    compactados = set(meta['lotes'][:meta['compactados']])
+    for arquivo in arquivos:
+        geracao, limpo = PADRAO_GERACAO.match(arquivo), PADRAO_LIMPO.match(arquivo)
+        if (geracao and geracao.group(1) != meta.get('geracao')) or (limpo and limpo.group(1) in compactados):
+            os.remove(os.path.join(caminho_lotes(caminho_csv), arquivo))
+
+#======================================================================================================================
+# Ingestão dos Lotes
+#======================================================================================================================
+
+# 1. Pedidos limpos e agregados de um lote. Os rótulos das linhas continuam a partir das 'deslocamento' linhas brutas
+#    já carregadas, como se o lote estivesse no final do CSV.
+def _ingerir_lote(caminho, deslocamento, linhas_por_bloco):
+    from utils.ingestao import ingerir
+
+    df, agregados = ingerir(caminho, linhas_por_bloco)
+    df.index = df.index + deslocamento
+    return df, agregados
+
+# 2. Refaz todos os lotes gravados sobre o Dataframe e os agregados do CSV principal (reconstrução do snapshot).
+#    Retorna o Dataframe com os lotes, na ordem por data, e os nomes dos lotes.
+def ingerir_lotes(caminho_csv, df, agregados, linhas_por_bloco=LINHAS_POR_BLOCO):
+    from utils.esquema import concatenar_tipados
+
+    lotes, partes = lotes_gravados(caminho_csv), [df]
+    for lote in lotes:
+        deslocamento = agregados.linhas + int(agregados.rejeitadas['Total'])
+        parte, parcial = _ingerir_lote(caminho_lote(caminho_csv, lote, '.csv'), deslocamento, linhas_por_bloco)
+        agregados.combinar_com(parcial.tabelas, parcial.rejeitadas, parcial.linhas)
+        partes.append(parte)
+    if lotes:
+        df = concatenar_tipados(partes).sort_values('Order_Date', kind='stable')
+    return df, lotes
+
+# 3. Limpa um lote de pedidos brutos (caminho ou arquivo aberto, no formato do train.csv) e o acrescenta ao dataset:
+#    pedidos limpos e agregados do lote, banco (se já estiver atualizado), metadados e, por último, o CSV bruto no nome
+#    definitivo. Retorna o nome do lote, as linhas mantidas e as rejeitadas por coluna.
+def acrescentar_lote(origem, caminho_csv=CAMINHO_DADOS, linhas_por_bloco=LINHAS_POR_BLOCO):
+    from utils.banco import acrescentar_banco, banco_valido
+    from utils.snapshot import carregar_metadados, gravar_feather, gravar_metadados
+
+    with etapa('acrescentar_lote') as registro:
+        meta = carregar_metadados(caminho_csv)                  # reconstrói o snapshot antes, se estiver desatualizado
+        lote = f'lote_{len(meta["lotes"]) + 1:06d}'
+        pendente = caminho_lote(caminho_csv, lote, '.csv.pendente')
+        os.makedirs(caminho_lotes(caminho_csv), exist_ok=True)
+        if isinstance(origem, (str, os.PathLike)):
+            shutil.copyfile(origem, pendente)
+        else:
+            with open(pendente, 'wb') as arquivo:
+                shutil.copyfileobj(origem, arquivo)
+
+        deslocamento = meta['linhas'] + meta.get('rejeitadas', {}).get('Total', 0)
+        df, agregados = _ingerir_lote(pendente, deslocamento, linhas_por_bloco)
+        gravar_feather(df, caminho_lote(caminho_csv, lote, '.feather'), preserve_index=True)
+        for nome, tabela in agregados.tabelas.items():
+            gravar_feather(tabela, caminho_lote(caminho_csv, lote, f'.{nome}.feather'), preserve_index=False)
+        if banco_valido(caminho_csv, meta):
+            acrescentar_banco(caminho_csv, df, len(meta['lotes']) + 1)
+
+        # O lote passa a existir quando os metadados o incluem na versão dos dados
+        rejeitadas = agregados.rejeitadas.to_dict()
+        meta['rejeitadas'] = {coluna: meta.get('rejeitadas', {}).get(coluna, 0) + quantidade
+                              for coluna, quantidade in rejeitadas.items()}
+        meta.update(linhas=meta['linhas'] + len(df), lotes=[*meta['lotes'], lote])
+        gravar_metadados(meta, caminho_csv)
+        concluir_lotes(caminho_csv, [lote])
+        registro['linhas'] = len(df)
+    return {'lote': lote, 'linhas': len(df), 'rejeitadas': rejeitadas}
+
+# 4. Regrava o snapshot e os agregados com os lotes ainda não compactados, para que o Dataframe volte a ser lido sem
+#    cópia e os agregados sem reagrupamento. Os dados (e a versão dos dados) não mudam; os CSVs brutos dos lotes
+#    continuam guardados. Os arquivos regravados são uma nova geração, que passa a ser lida quando os metadados a
+#    indicam; só então os pedidos limpos e os agregados dos lotes são removidos.
+def compactar(caminho_csv=CAMINHO_DADOS):
+    from utils.snapshot import (AGREGADOS, caminho_agregado, caminho_snapshot, carregar_metadados, gravar_feather,
+                                gravar_metadados, ler_agregado, ler_snapshot)
+
+    with etapa('compactar_lotes') as registro:
+        meta = carregar_metadados(caminho_csv)
+        pendentes = meta['lotes'][meta['compactados']:]
+        if pendentes:
+            geracao = nome_geracao(len(meta['lotes']))
+            gravar_feather(ler_snapshot(caminho_csv), caminho_snapshot(caminho_csv, geracao), preserve_index=True)
+            for nome in AGREGADOS:
+                gravar_feather(ler_agregado(caminho_csv, nome, meta), caminho_agregado(caminho_csv, nome, geracao),
+                               preserve_index=False)
+            meta.update(compactados=len(meta['lotes']), geracao=geracao)
+            gravar_metadados(meta, caminho_csv)
+            remover_arquivos_antigos(caminho_csv)
+        registro['linhas'] = meta['linhas']
+    return pendentes
+
+#======================================================================================================================
+# Execução
+#======================================================================================================================
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Acréscimo incremental de lotes de pedidos.')
+    parser.add_argument('--dados', default=CAMINHO_DADOS, help='CSV principal do dataset')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    acrescentar = comandos.add_parser('acrescentar', help='limpa um lote de pedidos e o acrescenta ao dataset')
+    acrescentar.add_argument('lotes', nargs='+', help='CSVs no formato do train.csv, acrescentados em ordem')
+    comandos.add_parser('compactar', help='regrava o snapshot com os lotes acrescentados')
+    args = parser.parse_args()
+
+    if args.comando == 'acrescentar':
+        for origem in args.lotes:
+            resumo = acrescentar_lote(origem, args.dados)
+            print(f'{origem}: {resumo["lote"]} com {resumo["linhas"]:,} pedidos '
+                  f'({resumo["rejeitadas"]["Total"]:,} linhas rejeitadas)')
+    else:
+        pendentes = compactar(args.dados)
+        print(f'{len(pendentes)} lote(s) compactado(s) no snapshot')
+
+if __name__ == '__main__':
+    main()
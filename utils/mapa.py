@@ -0,0 +1,137 @@
+#======================================================================================================================
+# CAMADA GEOGRÁFICA DO MAPA DE CIDADES
+#======================================================================================================================
+#
+# Os pontos de entrega são pré-agregados no carregamento: somas de latitude e longitude por dia, cidade e tráfego (para
+# os centróides) e contagens por dia, tráfego e célula de uma grade regular (para o mapa de calor e o agrupamento).
+# O HTML do mapa é guardado em cache pelo estado dos filtros, e os modos de densidade enviam no máximo
+# MAPA_MAX_PONTOS células ao navegador, então o tamanho do mapa não cresce com a quantidade de pedidos.
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import numpy as np
+import streamlit as st
+
+from utils.config import BACKEND, MAPA_MAX_PONTOS, MAPA_RESOLUCAO
+from utils.dados import CAMINHO_DADOS, carregar_dados, versao_dados
+from utils.desempenho import etapa
+from utils.materializacao import AUSENTE, procurar
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+# Colunas usadas pela camada geográfica
+COLUNAS_GEO = ['Order_Date', 'City', 'Road_traffic_density', 'Delivery_location_latitude', 'Delivery_location_longitude']
+
+# Modos do mapa: rótulo exibido na página -> modo
+MODOS_MAPA = {'Centro por cidade e tráfego': 'centroides', 'Mapa de calor': 'calor', 'Agrupamento': 'agrupamento'}
+
+#======================================================================================================================
+# Camada Geográfica
+#======================================================================================================================
+
+class CamadaGeo:
+
+    def __init__(self, df, resolucao=MAPA_RESOLUCAO):
+        self.resolucao = resolucao
+        lat = df['Delivery_location_latitude'].to_numpy(dtype='float64')
+        lng = df['Delivery_location_longitude'].to_numpy(dtype='float64')
+
+        # Somas das coordenadas por dia, cidade e tráfego
+        chaves = ['Order_Date', 'City', 'Road_traffic_density']
+        self.somas = df[chaves].assign(pedidos=1, lat_soma=lat, lng_soma=lng) \
+            .groupby(chaves, observed=True).sum().reset_index()
+
+        # Pedidos por dia, tráfego e célula da grade
+        chaves = ['Order_Date', 'Road_traffic_density', 'celula_lat', 'celula_lng']
+        self.grade = df[chaves[:2]].assign(celula_lat=np.floor(lat / resolucao).astype('int32'),
+                                          celula_lng=np.floor(lng / resolucao).astype('int32'), pedidos=1) \
+            .groupby(chaves, observed=True)['pedidos'].sum().reset_index()
+
+    # 1. Linhas de uma tabela pré-agregada dentro dos filtros da barra lateral
+    @staticmethod
+    def _fatiar(tabela, data_limite, trafego):
+        return tabela.loc[(tabela['Order_Date'] < data_limite) & tabela['Road_traffic_density'].isin(trafego), :]
+
+    # 2. Localização média das entregas por cidade e tráfego
+    def centroides(self, data_limite, trafego):
+        a = self._fatiar(self.somas, data_limite, trafego) \
+            .groupby(['City', 'Road_traffic_density'], observed=True)[['pedidos', 'lat_soma', 'lng_soma']].sum() \
+            .sort_index().reset_index()
+        a['lat'] = a['lat_soma'] / a['pedidos']
+        a['lng'] = a['lng_soma'] / a['pedidos']
+        return a[['City', 'Road_traffic_density', 'pedidos', 'lat', 'lng']]
+
+    # 3. As células da grade com mais pedidos (no máximo max_pontos), com o centro de cada célula
+    def densidade(self, data_limite, trafego, max_pontos=MAPA_MAX_PONTOS):
+        a = self._fatiar(self.grade, data_limite, trafego) \
+            .groupby(['celula_lat', 'celula_lng'])['pedidos'].sum().nlargest(max_pontos).reset_index()
+        a['lat'] = (a['celula_lat'] + 0.5) * self.resolucao
+        a['lng'] = (a['celula_lng'] + 0.5) * self.resolucao
+        return a[['lat', 'lng', 'pedidos']]
+
+#======================================================================================================================
+# Desenho do Mapa
+#======================================================================================================================
+
+# 1. HTML do mapa no modo escolhido, no mesmo formato enviado pelo folium_static
+def desenhar_mapa(geo, data_limite, trafego, modo='centroides'):
+    import folium
+    from folium import plugins
+
+    mapa = folium.Map(zoom_start=11)
+
+    if modo == 'centroides':
+        for linha in geo.centroides(data_limite, trafego).itertuples(index=False):
+            popup_text = f"City: {linha.City}, Road traffic density: {linha.Road_traffic_density}"
+            folium.Marker([linha.lat, linha.lng], popup=popup_text).add_to(mapa)
+    else:
+        pontos = geo.densidade(data_limite, trafego)
+        if modo == 'calor':
+            plugins.HeatMap(pontos[['lat', 'lng', 'pedidos']].to_numpy().tolist()).add_to(mapa)
+        else:
+            plugins.FastMarkerCluster(pontos[['lat', 'lng']].to_numpy().tolist()).add_to(mapa)
+        if len(pontos):
+            mapa.fit_bounds([[pontos['lat'].min(), pontos['lng'].min()], [pontos['lat'].max(), pontos['lng'].max()]])
+
+    return folium.Figure().add_child(mapa).render()
+
+#======================================================================================================================
+# Carregamento e Cache
+#======================================================================================================================
+
+@st.cache_resource(max_entries=1, show_spinner='Agregando localizações...')
+def _carregar_geo(caminho, versao):
+    if BACKEND == 'sqlite':                   # sem o Dataframe compartilhado: apenas as colunas da camada, do snapshot
+        from utils.snapshot import carregar_snapshot
+        df = carregar_snapshot(caminho, COLUNAS_GEO)
+    else:
+        df = carregar_dados(caminho)
+    with etapa('carregar_geo') as registro:
+        geo = CamadaGeo(df)
+        registro['linhas'] = len(df)
+    return geo
+
+# 1. Camada geográfica do dataset completo, refeita quando o arquivo de dados muda
+def carregar_geo(caminho=CAMINHO_DADOS):
+    return _carregar_geo(caminho, versao_dados(caminho))
+
+@st.cache_data(max_entries=256, show_spinner='Desenhando o mapa...')
+def _mapa_html(caminho, versao, data_limite, trafego, modo):
+    return desenhar_mapa(carregar_geo(caminho), data_limite, list(trafego), modo)
+
+# 2. HTML do mapa em cache por versão dos dados e estado dos filtros, compartilhado entre as sessões (calculado sem
+#    consultar os indicadores materializados, como na materialização)
+def calcular_mapa_html(data_limite, trafego, modo='centroides', caminho=CAMINHO_DADOS):
+    return _mapa_html(caminho, versao_dados(caminho), data_limite, tuple(sorted(trafego)), modo)
+
+# 3. HTML do mapa dos indicadores materializados ou calculado
+@etapa('mapa_html')
+def mapa_html(data_limite, trafego, modo='centroides', caminho=CAMINHO_DADOS):
+    html = procurar(f'mapa_{modo}', data_limite, trafego, caminho)
+    if html is not AUSENTE:
+        return html
+    return calcular_mapa_html(data_limite, trafego, modo, caminho)
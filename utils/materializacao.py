@@ -0,0 +1,251 @@
+#======================================================================================================================
+# MATERIALIZAÇÃO DOS INDICADORES DAS PÁGINAS
+#======================================================================================================================
+#
+# Um processo em lote, fora do servidor, calcula de antemão os resultados das análises das três páginas (tabelas,
+# figuras e o HTML do mapa em cada modo) para cada data limite e combinação de tráfego da barra lateral (ou para um
+# recorte escolhido) e os grava num único arquivo ao lado do snapshot (dataset/train.kpis.pkl). Com o arquivo, uma
+# seleção da barra lateral que ainda não está no cache de resultados é atendida por uma consulta ao arquivo
+# (descompactar o resultado guardado) em vez de um cálculo sobre os dados.
+#
+# - As páginas não são executadas: cada análise das três páginas (utils/analises.py, todas as seções da Visão Empresa)
+#   é calculada diretamente sobre a consulta com os filtros (utils/consultas.py), e o HTML do mapa sobre a camada
+#   geográfica, num contexto de execução sem servidor (sem ele os caches do Streamlit não guardam nada). Cada resultado
+#   vai para o arquivo com a chave (análise, data limite, tráfego selecionado), compactado.
+# - O arquivo guarda a identidade do que foi calculado: o código das páginas e dos módulos utils, o snapshot (hash do
+#   CSV, lotes acrescentados e esquema) e as configurações que mudam os resultados. Um arquivo de outra identidade é
+#   ignorado, então um lote novo, uma alteração no código ou outra configuração voltam ao cálculo até a próxima
+#   materialização.
+# - O arquivo é regravado ao final de cada data limite: uma materialização interrompida mantém as datas já concluídas, e
+#   uma nova execução com a mesma identidade calcula apenas as combinações que faltam.
+# - As análises devem funcionar com qualquer seleção da barra lateral (inclusive a primeira data, sem pedidos antes
+#   dela). Uma análise que falha interrompe a materialização com o erro, indicando a análise e os filtros; as datas já
+#   concluídas ficam no arquivo.
+#
+# Uso (a partir da raiz do projeto):
+#     python -m utils.materializacao                                        # todas as datas e combinações de tráfego
+#     python -m utils.materializacao --datas 2022-03-15 2022-04-06 --trafegos Low,Medium,High,Jam Low,Jam
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import glob
+import hashlib
+import itertools
+import os
+import pickle
+import zlib
+
+import pandas as pd
+import streamlit as st
+
+from utils.config import KPIS_MATERIALIZADOS, MAPA_MAX_PONTOS, MAPA_RESOLUCAO, MODO_APROXIMADO, TOP_ENTREGADORES
+from utils.dados import CAMINHO_DADOS, versao_dados
+from utils.desempenho import etapa
+from utils.inicializacao import PAGINAS, RAIZ, contexto_streamlit
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+TODOS_TRAFEGOS = ['Low', 'Medium', 'High', 'Jam']
+
+NIVEL_COMPRESSAO = 6
+
+# Resultado que não está no arquivo (None pode ser um resultado)
+AUSENTE = object()
+
+#======================================================================================================================
+# Arquivo dos Indicadores
+#======================================================================================================================
+
+# 1. Caminho do arquivo ao lado do CSV, combinação de filtros e chave de um resultado
+def caminho_materializacao(caminho_csv):
+    return os.path.splitext(caminho_csv)[0] + '.kpis.pkl'
+
+def _filtros(data_limite, trafego):
+    return (pd.Timestamp(data_limite), tuple(sorted(trafego)))
+
+def chave_materializada(analise, data_limite, trafego):
+    return (analise, *_filtros(data_limite, trafego))
+
+# 2. Identidade dos resultados: código das páginas e dos módulos, snapshot e configurações que mudam os resultados
+def _hash_codigo():
+    arquivos = [os.path.join(RAIZ, pagina) for pagina in PAGINAS]
+    arquivos += sorted(glob.glob(os.path.join(RAIZ, 'utils', '*.py')))
+    h = hashlib.blake2b(digest_size=16)
+    for caminho in arquivos:
+        with open(caminho, 'rb') as arquivo:
+            h.update(arquivo.read())
+    return h.hexdigest()
+
+def identidade(caminho_csv=CAMINHO_DADOS):
+    from utils.snapshot import carregar_metadados
+
+    meta = carregar_metadados(caminho_csv)
+    return {'codigo': _hash_codigo(),
+            'dados': {campo: meta[campo] for campo in ('hash', 'lotes', 'versao_esquema', 'compacto')},
+            'configuracao': {'modo_aproximado': MODO_APROXIMADO, 'top_entregadores': TOP_ENTREGADORES,
+                             'mapa_resolucao': MAPA_RESOLUCAO, 'mapa_max_pontos': MAPA_MAX_PONTOS}}
+
+# 3. Leitura e gravação atômica (arquivo temporário + rename) do arquivo: identidade, combinações de filtros já
+#    materializadas e resultados compactados
+def ler_materializacao(caminho_csv=CAMINHO_DADOS):
+    try:
+        with open(caminho_materializacao(caminho_csv), 'rb') as arquivo:
+            return pickle.load(arquivo)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+def _gravar_materializacao(conteudo, caminho_csv):
+    destino = caminho_materializacao(caminho_csv)
+    temporario = f'{destino}.{os.getpid()}.tmp'
+    with open(temporario, 'wb') as arquivo:
+        pickle.dump(conteudo, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporario, destino)
+
+# 4. Resultado compactado e de volta. Figuras do Plotly são guardadas como dicionário e remontadas sem validar cada
+#    propriedade (já validadas quando a figura foi criada): o unpickle da figura valida tudo de novo e custa o dobro.
+def _compactar(valor):
+    import plotly.graph_objects as go
+
+    conteudo = ('figura', valor.to_dict()) if isinstance(valor, go.Figure) else ('valor', valor)
+    return zlib.compress(pickle.dumps(conteudo, protocol=pickle.HIGHEST_PROTOCOL), NIVEL_COMPRESSAO)
+
+def _descompactar(compactado):
+    tipo, conteudo = pickle.loads(zlib.decompress(compactado))
+    if tipo == 'figura':
+        import plotly.graph_objects as go
+        return go.Figure(conteudo, _validate=False)
+    return conteudo
+
+#======================================================================================================================
+# Consulta no Servidor
+#======================================================================================================================
+
+# Data de modificação do arquivo (None sem arquivo), para que uma nova materialização seja lida sem reiniciar o servidor
+def _versao_arquivo(caminho_csv):
+    try:
+        return os.stat(caminho_materializacao(caminho_csv)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+# 1. Resultados compactados do arquivo, se a identidade for a dos dados e do código atuais ({} caso contrário),
+#    compartilhados entre as sessões
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _carregar_materializacao(caminho, versao, versao_arquivo):
+    if versao_arquivo is None:
+        return {}
+    with etapa('carregar_materializacao') as registro:
+        conteudo = ler_materializacao(caminho)
+        valido = conteudo is not None and conteudo['identidade'] == identidade(caminho)
+        resultados = conteudo['resultados'] if valido else {}
+        registro['linhas'] = len(resultados)
+    return resultados
+
+# 2. Resultado materializado da análise com os filtros da barra lateral, ou AUSENTE
+def procurar(analise, data_limite, trafego, caminho=CAMINHO_DADOS):
+    if not KPIS_MATERIALIZADOS:
+        return AUSENTE
+    resultados = _carregar_materializacao(caminho, versao_dados(caminho), _versao_arquivo(caminho))
+    compactado = resultados.get(chave_materializada(analise, data_limite, trafego))
+    return AUSENTE if compactado is None else _descompactar(compactado)
+
+#======================================================================================================================
+# Materialização
+#======================================================================================================================
+
+# 1. Datas limite do filtro de datas (um dia por posição do slider) e combinações não vazias de tráfego
+def datas_limite(caminho=CAMINHO_DADOS):
+    from utils.cubo import limites_datas
+
+    inicio, fim = limites_datas(caminho)
+    return list(pd.date_range(inicio, fim, freq='D').to_pydatetime())
+
+def combinacoes_trafego(tipos=TODOS_TRAFEGOS):
+    return [list(combinacao) for quantidade in range(len(tipos), 0, -1)
+            for combinacao in itertools.combinations(tipos, quantidade)]
+
+# 2. Calcula cada análise das páginas ('calculos', análise -> função da consulta) sobre a consulta com uma combinação
+#    de filtros, e o HTML do mapa em cada modo, e os retorna pelas chaves do arquivo. O erro de uma análise é repassado
+#    com a análise e os filtros em que ocorreu.
+def _calcular_combinacao(calculos, data_limite, trafego, caminho):
+    from utils.consultas import criar_consulta
+    from utils.mapa import MODOS_MAPA, calcular_mapa_html
+
+    consulta = criar_consulta(data_limite, trafego, caminho)
+    calculos = dict(calculos)
+    for modo in MODOS_MAPA.values():               # o mapa é gerado da camada geográfica, com os mesmos filtros
+        calculos[f'mapa_{modo}'] = lambda consulta, modo=modo: calcular_mapa_html(data_limite, trafego, modo, caminho)
+    resultados = {}
+    for analise, calcular in calculos.items():
+        try:
+            resultados[chave_materializada(analise, data_limite, trafego)] = calcular(consulta)
+        except Exception as erro:
+            raise RuntimeError(f'{analise} falhou com a data limite {data_limite:%d-%m-%Y} e o tráfego '
+                               f'{",".join(trafego) or "(nenhum)"}') from erro
+    return resultados
+
+# 3. Materializa as combinações de 'datas' e 'trafegos' que ainda não estão no arquivo (todas as datas do slider e
+#    todas as combinações de tráfego, por padrão), somando-as às já materializadas com a mesma identidade. O arquivo é
+#    regravado ao final de cada data. Retorna as combinações calculadas, os resultados no arquivo e o tamanho do
+#    arquivo.
+def materializar(caminho=CAMINHO_DADOS, datas=None, trafegos=None):
+    from utils.analises import calculos_paginas
+
+    atual = identidade(caminho)
+    conteudo = ler_materializacao(caminho)
+    if conteudo is None or conteudo['identidade'] != atual:
+        conteudo = {'identidade': atual, 'filtros': set(), 'resultados': {}}
+    datas = datas or datas_limite(caminho)
+    trafegos = trafegos or combinacoes_trafego()
+
+    contexto_streamlit('materializacao')
+    calculos = calculos_paginas()
+    calculadas = 0
+    with etapa('materializar') as registro:
+        for data_limite in datas:
+            pendentes = [trafego for trafego in trafegos if _filtros(data_limite, trafego) not in conteudo['filtros']]
+            for trafego in pendentes:
+                resultados = _calcular_combinacao(calculos, data_limite, trafego, caminho)
+                conteudo['resultados'].update((chave, _compactar(valor)) for chave, valor in resultados.items())
+                conteudo['filtros'].add(_filtros(data_limite, trafego))
+                calculadas += 1
+            if pendentes:
+                _gravar_materializacao(conteudo, caminho)
+        registro['linhas'] = len(conteudo['resultados'])
+
+    destino = caminho_materializacao(caminho)
+    return {'combinacoes': calculadas, 'resultados': len(conteudo['resultados']),
+            'tamanho': os.path.getsize(destino) if os.path.exists(destino) else 0}
+
+#======================================================================================================================
+# Execução
+#======================================================================================================================
+
+def main():
+    import argparse
+    import warnings
+
+    parser = argparse.ArgumentParser(description='Materialização dos indicadores das páginas.')
+    parser.add_argument('--dados', default=CAMINHO_DADOS, help='CSV principal do dataset')
+    parser.add_argument('--datas', nargs='+', help='datas limite (AAAA-MM-DD); padrão: todas as datas do slider')
+    parser.add_argument('--trafegos', nargs='+',
+                        help='combinações de tráfego separadas por vírgula (Low,Jam); padrão: todas as combinações')
+    args = parser.parse_args()
+
+    from streamlit.logger import set_log_level
+    set_log_level('error')
+    warnings.simplefilter('ignore', FutureWarning)
+    os.chdir(RAIZ)
+
+    datas = [pd.Timestamp(data).to_pydatetime() for data in args.datas] if args.datas else datas_limite(args.dados)
+    trafegos = [trafego.split(',') for trafego in args.trafegos] if args.trafegos else combinacoes_trafego()
+    for data_limite in datas:
+        resumo = materializar(args.dados, [data_limite], trafegos)
+        print(f'{data_limite:%d-%m-%Y}: {resumo["combinacoes"]} combinação(ões) calculada(s), '
+              f'{resumo["resultados"]:,} resultados ({resumo["tamanho"] / 2 ** 20:.1f} MB)', flush=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#======================================================================================================================
+# TABELAS PAGINADAS NO SERVIDOR
+#======================================================================================================================
+#
+# Tabelas grandes (como as estatísticas por entregador) ficam no servidor: a busca, a ordenação e a paginação são
+# feitas aqui e o navegador recebe apenas as linhas da página aberta. A tabela fica no cache de resultados,
+# compartilhada entre as sessões, e a ordem das linhas de cada coluna é calculada uma vez e reaproveitada nas páginas
+# seguintes.
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import math
+
+import numpy as np
+import streamlit as st
+
+from utils.config import LINHAS_POR_PAGINA
+
+#======================================================================================================================
+# Tabela Paginada
+#======================================================================================================================
+
+class TabelaPaginada:
+
+    def __init__(self, tabela, coluna_busca):
+        self.tabela = tabela.reset_index(drop=True)
+        self.coluna_busca = coluna_busca
+        self._ordens = {}
+
+    # 1. Posições das linhas ordenadas por uma coluna (valores ausentes no final), calculadas uma vez por coluna e
+    #    sentido. A tabela é compartilhada entre as sessões, então as ordens são apenas acrescentadas, nunca alteradas.
+    def ordem(self, coluna=None, crescente=True):
+        if coluna is None:
+            return np.arange(len(self.tabela))
+        chave = (coluna, crescente)
+        if chave not in self._ordens:
+            valores = self.tabela[coluna].sort_values(ascending=crescente, kind='stable', na_position='last')
+            self._ordens[chave] = valores.index.to_numpy()
+        return self._ordens[chave]
+
+    # 2. Posições das linhas cujo valor da coluna de busca contém o texto (sem diferenciar maiúsculas), na ordem pedida
+    def selecionar(self, busca='', ordenar_por=None, crescente=True):
+        posicoes = self.ordem(ordenar_por, crescente)
+        busca = busca.strip()
+        if not busca:
+            return posicoes
+        encontradas = self.tabela[self.coluna_busca].astype(str).str.contains(busca, case=False, regex=False)
+        return posicoes[encontradas.to_numpy()[posicoes]]
+
+    # 3. Linhas da página 'numero' (a partir de 1) entre as posições selecionadas
+    def pagina(self, posicoes, numero, linhas_por_pagina=LINHAS_POR_PAGINA):
+        inicio = (numero - 1) * linhas_por_pagina
+        return self.tabela.iloc[posicoes[inicio:inicio + linhas_por_pagina]].reset_index(drop=True)
+
+#======================================================================================================================
+# Componente Streamlit
+#======================================================================================================================
+
+# 1. Busca, ordenação e paginação da tabela com controles do Streamlit ('chave' distingue os widgets de cada tabela).
+#    Apenas a página aberta é enviada ao navegador.
+def mostrar_tabela_paginada(tabela, chave, linhas_por_pagina=LINHAS_POR_PAGINA, **kwargs):
+    colunas = list(tabela.tabela.columns)
+    col1, col2, col3 = st.columns([2, 2, 1])
+    busca = col1.text_input('Buscar', key=f'{chave}_busca', placeholder=tabela.coluna_busca)
+    ordenar_por = col2.selectbox('Ordenar por', colunas, key=f'{chave}_ordem')
+    crescente = col3.radio('Sentido', ['Crescente', 'Decrescente'], key=f'{chave}_sentido',
+                           label_visibility='hidden') == 'Crescente'
+
+    posicoes = tabela.selecionar(busca, ordenar_por, crescente)
+    paginas = max(1, math.ceil(len(posicoes) / linhas_por_pagina))
+    if st.session_state.get(f'{chave}_pagina', 1) > paginas:            # a busca pode reduzir a quantidade de páginas
+        st.session_state[f'{chave}_pagina'] = paginas
+    numero = int(st.number_input('Página', min_value=1, max_value=paginas, step=1, key=f'{chave}_pagina'))
+
+    st.dataframe(tabela.pagina(posicoes, numero, linhas_por_pagina), **kwargs)
+    st.caption(f'Página {numero} de {paginas} · {len(posicoes)} de {len(tabela.tabela)} linhas')
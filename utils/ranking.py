@@ -0,0 +1,67 @@
+#======================================================================================================================
+# RANKING DOS ENTREGADORES POR CIDADE
+#======================================================================================================================
+#
+# Guarda o menor e o maior tempo de entrega de cada entregador em cada cidade. Os mais rápidos são os de menor tempo
+# mínimo e os mais lentos os de maior tempo máximo; os dois rankings saem do mesmo agrupamento, e os k primeiros de
+# cada cidade são escolhidos por ordenação parcial (np.argpartition) em vez de ordenar todos os entregadores.
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import numpy as np
+import pandas as pd
+
+from utils.config import TOP_ENTREGADORES
+
+#======================================================================================================================
+# Ranking
+#======================================================================================================================
+
+CHAVES = ['City', 'Delivery_person_ID']
+
+class RankingEntregadores:
+
+    def __init__(self, df=None):
+        self.tempos = pd.DataFrame({'min': pd.Series(dtype='int64'), 'max': pd.Series(dtype='int64')},
+                                   index=pd.MultiIndex.from_arrays([[], []], names=CHAVES))
+        if df is not None:
+            self.atualizar(df)
+
+    # 1. Incorpora novos pedidos: o mínimo e o máximo de cada entregador são combinados com os já conhecidos
+    def atualizar(self, df):
+        self.combinar(df.groupby(CHAVES, observed=True)['Time_taken(min)'].agg(['min', 'max']))
+
+    # 2. Incorpora tempos já agrupados por cidade e entregador (colunas 'min' e 'max'), por exemplo calculados no banco
+    def combinar(self, novos):
+        novos.index = pd.MultiIndex.from_arrays(
+            [novos.index.get_level_values(nivel).astype(str) for nivel in CHAVES], names=CHAVES)
+        if len(self.tempos):
+            novos = pd.concat([self.tempos, novos]).groupby(level=CHAVES).agg({'min': 'min', 'max': 'max'})
+        self.tempos = novos.sort_index()
+
+    # 3. Os k entregadores de cada cidade com os menores valores, em ordem crescente. Empates ficam na ordem do ID do
+    #    entregador, como no nsmallest(keep='first') sobre a tabela ordenada.
+    def _top_k(self, valores, k):
+        cidades = self.tempos.index.codes[0]
+        inicio = np.searchsorted(cidades, np.arange(len(self.tempos.index.levels[0])), side='left')
+        fim = np.searchsorted(cidades, np.arange(len(self.tempos.index.levels[0])), side='right')
+
+        posicoes = []
+        for a, b in zip(inicio, fim):
+            v = valores[a:b]
+            if len(v) > k:
+                limite = np.partition(v, k - 1)[k - 1]
+                candidatos = np.flatnonzero(v <= limite)                           # inclui os empates com o k-ésimo
+            else:
+                candidatos = np.arange(len(v))
+            posicoes.append(a + candidatos[np.argsort(v[candidatos], kind='stable')][:k])
+        return np.concatenate(posicoes) if posicoes else np.array([], dtype=int)
+
+    # 4. Os k mais rápidos e os k mais lentos de cada cidade
+    def calcular(self, k=TOP_ENTREGADORES):
+        rapidos = self._top_k(self.tempos['min'].to_numpy(), k)
+        lentos = self._top_k(-self.tempos['max'].to_numpy(), k)
+        return (self.tempos['min'].iloc[rapidos].reset_index(name='Time_taken(min)'),
+                self.tempos['max'].iloc[lentos].reset_index(name='Time_taken(min)'))
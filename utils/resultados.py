@@ -0,0 +1,157 @@
+#======================================================================================================================
+# CACHE DE RESULTADOS DAS ANÁLISES
+#======================================================================================================================
+#
+# Um único cache no processo, compartilhado entre as sessões, guarda o resultado de cada análise (tabela agregada ou
+# figura do Plotly já montada) pela chave (análise, versão dos dados, data limite, tráfego selecionado). Com a mesma
+# seleção na barra lateral, apenas a primeira sessão calcula; as demais reutilizam o resultado (ou esperam o cálculo
+# em andamento, em vez de repeti-lo). Os itens menos usados recentemente são descartados quando o cache passa de
+# CACHE_RESULTADOS itens. Os resultados são compartilhados e não devem ser alterados por quem os recebe.
+#
+# Um resultado que não está no cache é procurado primeiro nos indicadores materializados (utils/materializacao.py) e
+# calculado apenas se não estiver lá.
+#
+# Com CURRY_PAINEIS_PARALELOS, as páginas separam o cálculo dos painéis do desenho: as análises da página são
+# entregues de uma vez a um pool de threads (antecipar) e o desenho segue na ordem do layout, esperando o resultado de
+# cada painel. O tempo da página se aproxima do painel mais lento em vez da soma de todos, na medida em que as consultas
+# liberam o GIL (SQLite, operações do numpy e do pandas sobre arrays grandes).
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import contextvars
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+
+from utils.config import CACHE_RESULTADOS, PAINEIS_PARALELOS
+from utils.dados import CAMINHO_DADOS, versao_dados
+from utils.desempenho import acompanhar, anotar, etapa
+from utils.materializacao import AUSENTE, procurar
+
+#======================================================================================================================
+# Cache
+#======================================================================================================================
+
+class CacheResultados:
+
+    def __init__(self, max_itens=CACHE_RESULTADOS):
+        self.max_itens = max_itens
+        self.itens = OrderedDict()
+        self.em_andamento = {}
+        self.trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.esperas = 0
+
+    # 1. Resultado guardado para a chave, ou calculado (fora da trava, sem bloquear as outras sessões) e guardado.
+    #    Quem pede uma chave em cálculo espera o resultado (ou a exceção) de quem a calcula.
+    def obter(self, chave, calcular):
+        with self.trava:
+            if chave in self.itens:
+                self.itens.move_to_end(chave)
+                self.acertos += 1
+                return self.itens[chave]
+            if chave in self.em_andamento:
+                self.esperas += 1
+                andamento, calculando = self.em_andamento[chave], False
+            else:
+                andamento, calculando = Future(), True
+                self.em_andamento[chave] = andamento
+                self.falhas += 1
+
+        if not calculando:
+            return andamento.result()
+
+        try:
+            valor = calcular()
+        except BaseException as erro:
+            with self.trava:
+                del self.em_andamento[chave]
+            andamento.set_exception(erro)
+            raise
+
+        with self.trava:
+            self.itens[chave] = valor
+            self.itens.move_to_end(chave)
+            while len(self.itens) > self.max_itens:
+                self.itens.popitem(last=False)
+            del self.em_andamento[chave]
+        andamento.set_result(valor)
+        return valor
+
+    # 2. Contadores de acertos, falhas e esperas por cálculos em andamento
+    def estatisticas(self):
+        with self.trava:
+            consultas = self.acertos + self.falhas + self.esperas
+            return {'itens': len(self.itens), 'max_itens': self.max_itens, 'acertos': self.acertos,
+                    'falhas': self.falhas, 'esperas': self.esperas,
+                    'taxa_acerto': self.acertos / consultas if consultas else 0.0}
+
+    # 3. Esvaziar o cache e zerar os contadores
+    def limpar(self):
+        with self.trava:
+            self.itens.clear()
+            self.acertos = 0
+            self.falhas = 0
+            self.esperas = 0
+
+#======================================================================================================================
+# Cache do Processo
+#======================================================================================================================
+
+# 1. Instância única, compartilhada entre as sessões
+@st.cache_resource
+def cache_resultados():
+    return CacheResultados()
+
+# 2. Chave de uma análise para a versão atual dos dados e o estado dos filtros
+def chave_resultado(analise, data_limite, trafego, caminho=CAMINHO_DADOS):
+    return (analise, versao_dados(caminho), pd.Timestamp(data_limite), tuple(sorted(trafego)))
+
+# 3. Resultado da análise com os filtros da barra lateral, lido dos indicadores materializados ou calculado por
+#    'calcular' apenas na primeira consulta. A etapa da análise em medição é anotada com o acerto no cache, a leitura
+#    dos materializados ou a falha.
+def resultado(analise, data_limite, trafego, calcular, caminho=CAMINHO_DADOS):
+    origem = []
+    def procurar_ou_calcular():
+        valor = procurar(analise, data_limite, trafego, caminho)
+        origem.append('falha' if valor is AUSENTE else 'materializado')
+        return calcular() if valor is AUSENTE else valor
+    valor = cache_resultados().obter(chave_resultado(analise, data_limite, trafego, caminho), procurar_ou_calcular)
+    anotar(cache=origem[0] if origem else 'acerto')
+    return valor
+
+#======================================================================================================================
+# Cálculo Antecipado dos Painéis
+#======================================================================================================================
+
+# 1. Pool de threads dos painéis, compartilhado entre as sessões. Cada thread tem um contexto de execução próprio, que
+#    descarta as mensagens: os caches do Streamlit funcionam nas threads e nada que as análises mostrem (como o aviso
+#    de carregamento de um cache) entra no layout fora de ordem.
+@st.cache_resource
+def pool_paineis(threads=PAINEIS_PARALELOS):
+    from utils.inicializacao import contexto_streamlit
+    return ThreadPoolExecutor(max_workers=threads, thread_name_prefix='paineis', initializer=contexto_streamlit,
+                              initargs=('paineis',))
+
+# 2. Calcula no pool as análises da página ({análise: função da consulta}) com os filtros da barra lateral, sem esperar.
+#    Cada cálculo roda numa cópia do contexto de quem antecipa, então é medido na execução da página, como a etapa
+#    '<análise>.calculo'. O desenho pede o resultado de cada análise com resultado(), que espera o cálculo em
+#    andamento. Os cálculos são acompanhados pela medição da página, que espera os que não foram desenhados. Sem
+#    CURRY_PAINEIS_PARALELOS, nada é antecipado e cada análise é calculada quando desenhada.
+def antecipar(data_limite, trafego, consulta, calculos, caminho=CAMINHO_DADOS):
+    if not PAINEIS_PARALELOS:
+        return
+    pool = pool_paineis()
+    for analise, calcular in calculos.items():
+        acompanhar(pool.submit(contextvars.copy_context().run, _calcular_antecipado, analise, data_limite, trafego,
+                               lambda calcular=calcular: calcular(consulta), caminho))
+
+def _calcular_antecipado(analise, data_limite, trafego, calcular, caminho):
+    with etapa(f'{analise}.calculo'):
+        resultado(analise, data_limite, trafego, calcular, caminho)
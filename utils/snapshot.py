@@ -0,0 +1,233 @@
+#======================================================================================================================
+# SNAPSHOT COLUNAR DO DATAFRAME LIMPO
+#======================================================================================================================
+#
+# O Dataframe limpo e os seus agregados (cubo de indicadores, entregadores por dia e esboços do modo aproximado) são
+# gravados em Feather (Arrow IPC) sem compressão ao lado do CSV. Na leitura o arquivo é mapeado em memória, então
+# processos diferentes compartilham o mesmo cache de páginas do sistema operacional e a inicialização não precisa
+# interpretar o CSV novamente. O snapshot é refeito quando o conteúdo do CSV ou a versão do esquema mudam.
+#
+# Cada coluna é gravada num único bloco contíguo e sem nulos nos floats (NaN no lugar), para que a conversão para o
+# pandas não copie nada: as colunas do Dataframe apontam diretamente para o arquivo mapeado (somente leitura) e os
+# textos ficam em arrays do Arrow. Assim todas as sessões e todos os processos do servidor leem os mesmos bytes, e a
+# memória própria de cada processo não cresce com o tamanho do dataset.
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from utils.config import ESQUEMA_COMPACTO, LINHAS_POR_BLOCO
+from utils.desempenho import etapa
+
+#======================================================================================================================
+# Configurações
+#======================================================================================================================
+
+# Incrementar sempre que a limpeza ou o esquema do Dataframe mudarem, para invalidar os snapshots existentes
+VERSAO_ESQUEMA = 10
+
+# Agregados gravados junto com o Dataframe limpo
+AGREGADOS = ('cubo', 'entregadores', 'distintos', 'histogramas')
+
+# Tipos do pandas para colunas do Arrow que não têm equivalente numpy sem cópia (os textos, que virariam objetos Python)
+TIPOS_PANDAS = {pa.string(): pd.StringDtype('pyarrow')}
+
+#======================================================================================================================
+# Funções do Snapshot
+#======================================================================================================================
+
+# 1. Caminhos do snapshot e dos seus metadados. O snapshot e os agregados regravados pela compactação dos lotes ficam
+#    em arquivos de uma geração (utils/lotes.py), e os metadados indicam a geração em uso ('geracao'; None para os
+#    arquivos da construção). Assim a gravação dos metadados é o único passo que troca os arquivos lidos.
+def caminho_snapshot(caminho_csv, geracao=None):
+    if geracao is not None:
+        from utils.lotes import caminho_geracao
+        return caminho_geracao(caminho_csv, geracao, 'snapshot')
+    return os.path.splitext(caminho_csv)[0] + '.feather'
+
+def _caminho_metadados(caminho_csv):
+    return caminho_snapshot(caminho_csv) + '.json'
+
+def caminho_agregado(caminho_csv, nome, geracao=None):
+    if geracao is not None:
+        from utils.lotes import caminho_geracao
+        return caminho_geracao(caminho_csv, geracao, nome)
+    return os.path.splitext(caminho_csv)[0] + f'.{nome}.feather'
+
+# 2. Hash do conteúdo do CSV, lido em blocos para não carregar o arquivo inteiro
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+# 3. Confere se o snapshot corresponde ao CSV atual, aos lotes acrescentados e ao esquema configurado.
+#    Se apenas a data de modificação ou o tamanho mudaram, o hash decide: conteúdo igual mantém o snapshot.
+#    Um lote já registrado nos metadados cujo CSV bruto ainda não foi movido para o nome definitivo (acréscimo em
+#    andamento ou interrompido logo depois dos metadados) tem a movimentação concluída aqui.
+def snapshot_valido(caminho_csv):
+    from utils.lotes import caminho_lote, concluir_lotes, lotes_gravados
+
+    try:
+        meta = ler_metadados(caminho_csv)
+    except (OSError, ValueError):
+        return False
+    lotes = meta.get('lotes', [])
+    if lotes != lotes_gravados(caminho_csv):
+        concluir_lotes(caminho_csv, lotes)
+    if (meta.get('versao_esquema'), meta.get('compacto')) != (VERSAO_ESQUEMA, ESQUEMA_COMPACTO) \
+            or not os.path.exists(caminho_snapshot(caminho_csv, meta.get('geracao'))) \
+            or not all(os.path.exists(caminho_agregado(caminho_csv, nome, meta.get('geracao')))
+                       for nome in AGREGADOS) \
+            or lotes != lotes_gravados(caminho_csv) \
+            or not all(os.path.exists(caminho_lote(caminho_csv, lote, extensao))
+                       for lote in lotes[meta['compactados']:]
+                       for extensao in ('.feather', *(f'.{nome}.feather' for nome in AGREGADOS))):
+        return False
+
+    info = os.stat(caminho_csv)
+    if (meta['mtime_ns'], meta['tamanho']) == (info.st_mtime_ns, info.st_size):
+        return True
+    if meta['hash'] != hash_arquivo(caminho_csv):
+        return False
+
+    meta.update(mtime_ns=info.st_mtime_ns, tamanho=info.st_size)
+    _gravar_json(meta, _caminho_metadados(caminho_csv))
+    return True
+
+# 4. Gravação atômica (arquivo temporário + rename), para que outro processo nunca leia um arquivo pela metade
+def _gravar_json(conteudo, caminho):
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    with open(temporario, 'w') as arquivo:
+        json.dump(conteudo, arquivo, indent=2)
+    os.replace(temporario, caminho)
+
+# Floats sem nulos (o pandas representa ausentes como NaN; com nulos o Arrow precisaria copiar a coluna para o pandas)
+def _nulos_como_nan(tabela):
+    for i, campo in enumerate(tabela.schema):
+        if pa.types.is_floating(campo.type) and tabela.column(i).null_count:
+            coluna = pc.fill_null(tabela.column(i), pa.scalar(float('nan'), campo.type))
+            tabela = tabela.set_column(i, campo, coluna)
+    return tabela
+
+# 5. Gravação de um Dataframe em Feather sem compressão (para permitir o mmap) e num único lote, para que cada coluna
+#    seja um bloco contíguo no arquivo
+def gravar_feather(df, destino, preserve_index):
+    temporario = f'{destino}.{os.getpid()}.tmp'
+    tabela = _nulos_como_nan(pa.Table.from_pandas(df, preserve_index=preserve_index)).combine_chunks()
+    feather.write_feather(tabela, temporario, compression='uncompressed', chunksize=max(tabela.num_rows, 1))
+    os.replace(temporario, destino)
+
+# 6. Grava o snapshot. Sem 'agregados' ({nome: Dataframe}), o cubo, os entregadores por dia e os esboços são
+#    calculados a partir de df. Os metadados são gravados por último: enquanto não existirem, o snapshot é considerado
+#    inválido. Os arquivos de gerações anteriores e dos lotes, agora no snapshot, deixam de ser usados e são removidos.
+def gravar_snapshot(df, caminho_csv, agregados=None, **meta):
+    from utils.ingestao import TABELAS
+
+    if agregados is None:
+        agregados = {nome: construir(df) for nome, (construir, _) in TABELAS.items()}
+    info = os.stat(caminho_csv)
+    gravar_feather(df, caminho_snapshot(caminho_csv), preserve_index=True)
+    for nome in AGREGADOS:
+        gravar_feather(agregados[nome], caminho_agregado(caminho_csv, nome), preserve_index=False)
+    _gravar_json({'versao_esquema': VERSAO_ESQUEMA, 'compacto': ESQUEMA_COMPACTO, 'mtime_ns': info.st_mtime_ns, 'tamanho': info.st_size,
+                  'hash': hash_arquivo(caminho_csv), 'linhas': len(df), 'lotes': [], 'compactados': 0,
+                  'geracao': None, **meta},
+                 _caminho_metadados(caminho_csv))
+    from utils.lotes import remover_arquivos_antigos
+    remover_arquivos_antigos(caminho_csv)
+
+def gravar_metadados(meta, caminho_csv):
+    _gravar_json(meta, _caminho_metadados(caminho_csv))
+
+# 7. Reconstrói o snapshot a partir do CSV, lido em blocos de 'linhas_por_bloco' linhas, e dos lotes acrescentados
+#    depois dele (utils/lotes.py), que passam a fazer parte do Dataframe gravado
+def construir_snapshot(caminho_csv, linhas_por_bloco=LINHAS_POR_BLOCO):
+    from utils.ingestao import ingerir
+    from utils.lotes import ingerir_lotes
+
+    with etapa('construir_snapshot') as registro:
+        df, agregados = ingerir(caminho_csv, linhas_por_bloco)
+        df, lotes = ingerir_lotes(caminho_csv, df, agregados, linhas_por_bloco)
+        gravar_snapshot(df, caminho_csv, agregados.tabelas, rejeitadas=agregados.rejeitadas.to_dict(), lotes=lotes,
+                        compactados=len(lotes))
+        registro['linhas'] = len(df)
+    return df
+
+# 8. Lê o snapshot (ou um agregado) mapeado em memória; 'colunas' limita a leitura às colunas informadas.
+#    O Dataframe do snapshot não tem cópia própria dos dados: as colunas apontam para o arquivo mapeado (split_blocks
+#    mantém uma coluna por bloco) e são somente leitura. Os lotes ainda não compactados são lidos da mesma forma e
+#    unidos ao Dataframe (o que copia as colunas, até a próxima compactação), na ordem por data. Os agregados desses
+#    lotes, gravados à parte, são combinados com os do snapshot.
+def ler_snapshot(caminho_csv, colunas=None):
+    from utils.esquema import concatenar_tipados
+
+    partes = [_ler_feather(caminho, colunas) for caminho in arquivos_snapshot(caminho_csv)]
+    if len(partes) == 1:
+        return partes[0]
+    df = concatenar_tipados(partes)
+    return df.sort_values('Order_Date', kind='stable') if 'Order_Date' in df.columns else df
+
+def _ler_feather(caminho, colunas=None):
+    tabela = feather.read_table(caminho, columns=colunas, memory_map=True)
+    return tabela.to_pandas(split_blocks=True, types_mapper=TIPOS_PANDAS.get)
+
+# Arquivos com os pedidos limpos: o snapshot e os lotes acrescentados e ainda não compactados nele
+def arquivos_snapshot(caminho_csv):
+    from utils.lotes import caminho_lote
+
+    meta = ler_metadados(caminho_csv)
+    return [caminho_snapshot(caminho_csv, meta.get('geracao')),
+            *(caminho_lote(caminho_csv, lote, '.feather') for lote in meta['lotes'][meta['compactados']:])]
+
+def ler_agregado(caminho_csv, nome, meta=None):
+    from utils.ingestao import TABELAS
+    from utils.lotes import caminho_lote
+
+    meta = meta or ler_metadados(caminho_csv)
+    caminhos = [caminho_agregado(caminho_csv, nome, meta.get('geracao')),
+                *(caminho_lote(caminho_csv, lote, f'.{nome}.feather') for lote in meta['lotes'][meta['compactados']:])]
+    partes = [feather.read_table(caminho, memory_map=True).to_pandas() for caminho in caminhos]
+    return partes[0] if len(partes) == 1 else TABELAS[nome][1](partes)
+
+# 9. Dataframe limpo a partir do snapshot, reconstruindo-o antes se o CSV mudou. Depois da reconstrução o Dataframe
+#    também é lido do arquivo, para que o processo que o construiu compartilhe os mesmos bytes que os demais.
+def carregar_snapshot(caminho_csv, colunas=None):
+    if not snapshot_valido(caminho_csv):
+        construir_snapshot(caminho_csv)
+    return ler_snapshot(caminho_csv, colunas)
+
+# 10. Agregados do snapshot ({nome: Dataframe}), reconstruindo-o antes se o CSV mudou
+def carregar_agregados(caminho_csv):
+    if not snapshot_valido(caminho_csv):
+        construir_snapshot(caminho_csv)
+    meta = ler_metadados(caminho_csv)
+    return {nome: ler_agregado(caminho_csv, nome, meta) for nome in AGREGADOS}
+
+# 11. Metadados do snapshot (hash do CSV, versão do esquema, linhas rejeitadas, lotes...), reconstruindo-o antes se o
+#     CSV mudou
+def carregar_metadados(caminho_csv):
+    if not snapshot_valido(caminho_csv):
+        construir_snapshot(caminho_csv)
+    return ler_metadados(caminho_csv)
+
+def ler_metadados(caminho_csv):
+    with open(_caminho_metadados(caminho_csv)) as arquivo:
+        return json.load(arquivo)
+
+# 12. Quantidade de lotes acrescentados ao CSV (0 sem snapshot): parte da versão dos dados, que invalida os caches
+def versao_lotes(caminho_csv):
+    try:
+        return len(ler_metadados(caminho_csv).get('lotes', []))
+    except (OSError, ValueError):
+        return 0
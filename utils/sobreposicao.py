@@ -0,0 +1,44 @@
+#======================================================================================================================
+# SOBREPOSIÇÃO DE COLUNAS DERIVADAS
+#======================================================================================================================
+#
+# O Dataframe compartilhado entre as sessões (e os resultados guardados em cache) são somente leitura. Colunas que uma
+# sessão calcula para uma análise (a semana do ano de uma tabela por dia, uma coluna convertida para float64...) ficam
+# numa sobreposição: um objeto leve com a referência para a base e apenas as colunas novas. A base não é copiada para
+# receber as colunas, então a memória de cada sessão é a das colunas derivadas, e não a de uma cópia dos dados.
+
+#======================================================================================================================
+# Bibliotecas Necessárias
+#======================================================================================================================
+
+import pandas as pd
+
+#======================================================================================================================
+# Sobreposição
+#======================================================================================================================
+
+class Sobreposicao:
+
+    def __init__(self, base, **colunas):
+        self.base = base
+        self.colunas = {nome: pd.Series(valores, index=base.index, name=nome, copy=False)
+                        for nome, valores in colunas.items()}
+
+    # 1. Coluna da sobreposição ou, se não houver, da base (sem cópia)
+    def __getitem__(self, nome):
+        if nome in self.colunas:
+            return self.colunas[nome]
+        return self.base[nome]
+
+    def __len__(self):
+        return len(self.base)
+
+    # 2. Nova sobreposição com mais colunas, sobre a mesma base e as mesmas colunas já calculadas
+    def com(self, **colunas):
+        nova = Sobreposicao(self.base, **colunas)
+        nova.colunas = {**self.colunas, **nova.colunas}
+        return nova
+
+    # 3. Coluna agrupada pelas chaves (da base ou da sobreposição), sem montar um Dataframe com as colunas
+    def agrupar(self, chaves, coluna, observed=True):
+        return self[coluna].groupby([self[chave] for chave in chaves], observed=observed)